@@ -10,6 +10,13 @@ import requests
 import yt_dlp
 import json
 import platform
+import hashlib
+import queue
+from collections import deque, OrderedDict
+
+# Benchmarks take their own command-line arguments; keep Kivy from parsing them
+if '--bench' in sys.argv:
+    os.environ.setdefault('KIVY_NO_ARGS', '1')
 
 from mutagen.easyid3 import EasyID3
 from mutagen.id3 import ID3, APIC
@@ -27,10 +34,14 @@ from kivy.uix.image import Image
 from kivy.uix.button import Button
 from kivy.uix.textinput import TextInput
 from kivy.uix.scrollview import ScrollView
-from kivy.uix.gridlayout import GridLayout
 from kivy.uix.floatlayout import FloatLayout
 from kivy.metrics import dp
-from kivy.graphics import Color, RoundedRectangle
+from kivy.graphics import Color, RoundedRectangle, Mesh
+from kivy.uix.widget import Widget
+from kivy.properties import NumericProperty
+from kivy.uix.recycleview import RecycleView
+from kivy.uix.recycleview.views import RecycleDataViewBehavior
+from kivy.uix.recycleboxlayout import RecycleBoxLayout
 
 from kivymd.app import MDApp
 from kivymd.uix.button import MDIconButton, MDFillRoundFlatButton, MDRaisedButton
@@ -49,6 +60,25 @@ except ImportError:
     pygame = None
     PYGAME_AVAILABLE = False
 
+# Offset from pygame.USEREVENT used for mixer.music end-of-track notifications
+PYGAME_END_EVENT_OFFSET = 1
+
+# NumPy is optional - library analysis (loudness etc.) is skipped without it
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+# Pillow is optional - cover art is then decoded at full size on the UI thread
+try:
+    from PIL import Image as PILImage
+    PIL_AVAILABLE = True
+except ImportError:
+    PILImage = None
+    PIL_AVAILABLE = False
+
 
 # ------------------- Environment Detection & Debugging -------------------
 class EnvironmentDetector:
@@ -287,14 +317,30 @@ class EnvironmentDetector:
         return " | ".join(status)
 
 # ------------------- Wake Lock Manager (for Background Playback on Android) -------------------
+# Seconds the wake lock outlives its last holder, so pause/resume and track
+# changes don't each cost a JNI round trip
+WAKE_LOCK_RELEASE_DELAY = 30.0
+
+
 class WakeLockManager:
-    """Manages Android wake locks to enable background audio playback on mobile devices"""
+    """Manages Android wake locks to enable background audio playback on mobile devices
+
+    One lock is shared by every player. Callers acquire and release it under a
+    holder name; after the last holder lets go the JNI lock stays held for
+    WAKE_LOCK_RELEASE_DELAY seconds, so a quick re-acquire (next track, seek)
+    doesn't cost a JNI release/acquire pair.
+    """
 
     def __init__(self, is_android=False):
         self.is_android = is_android
         self.wake_lock = None
         self.wake_lock_held = False
         self.pyjnius_available = False
+        self.holders = set()
+        self.jni_acquires = 0
+        self.jni_releases = 0
+        self._release_timer = None
+        self._lock = threading.RLock()
 
         if self.is_android:
             self._setup_wake_lock()
@@ -333,38 +379,108 @@ class WakeLockManager:
         except Exception as e:
             print(f"⚠️ Failed to setup wake lock: {e}")
 
-    def acquire(self):
-        """Acquire wake lock to keep CPU running during playback"""
-        if not self.is_android or not self.wake_lock:
-            return False
+    def acquire(self, holder="playback"):
+        """Acquire wake lock to keep CPU running during playback
 
-        try:
-            if not self.wake_lock_held and not self.wake_lock.isHeld():
-                self.wake_lock.acquire()
+        Args:
+            holder: Name of the player holding the lock
+
+        Returns:
+            True if the JNI lock was taken by this call
+        """
+        with self._lock:
+            self.holders.add(holder)
+            self._cancel_release_timer()
+            if not self.is_android or not self.wake_lock or self.wake_lock_held:
+                return False
+
+            try:
+                if not self.wake_lock.isHeld():
+                    self.wake_lock.acquire()
+                    self.jni_acquires += 1
                 self.wake_lock_held = True
                 print("🔒 Wake lock acquired - music will play in background")
                 return True
-        except Exception as e:
-            print(f"⚠️ Failed to acquire wake lock: {e}")
+            except Exception as e:
+                print(f"⚠️ Failed to acquire wake lock: {e}")
 
         return False
 
-    def release(self):
-        """Release wake lock to save battery"""
+    def release(self, holder="playback", delay=WAKE_LOCK_RELEASE_DELAY):
+        """Drop a holder and release the wake lock once no holder is left
+
+        Args:
+            holder: Name the lock was acquired under
+            delay: Seconds to keep the lock before releasing it; 0 releases now
+
+        Returns:
+            True if the JNI lock was released by this call
+        """
+        with self._lock:
+            self.holders.discard(holder)
+            if self.holders or not self.wake_lock_held:
+                return False
+            if delay and delay > 0:
+                if self._release_timer is None:
+                    self._release_timer = threading.Timer(delay, self._release_after_delay)
+                    self._release_timer.daemon = True
+                    self._release_timer.start()
+                return False
+            self._cancel_release_timer()
+            return self._release_now()
+
+    def _release_now(self):
+        """Release the JNI lock; caller holds self._lock"""
         if not self.is_android or not self.wake_lock:
             return False
 
         try:
             if self.wake_lock_held and self.wake_lock.isHeld():
                 self.wake_lock.release()
+                self.jni_releases += 1
                 self.wake_lock_held = False
                 print("🔓 Wake lock released - battery saver active")
                 return True
+            self.wake_lock_held = False
         except Exception as e:
             print(f"⚠️ Failed to release wake lock: {e}")
 
         return False
 
+    def _release_after_delay(self):
+        """Timer thread: release the lock if nobody re-acquired it meanwhile"""
+        try:
+            with self._lock:
+                if self._release_timer is not threading.current_thread():
+                    return
+                self._release_timer = None
+                if not self.holders:
+                    self._release_now()
+        finally:
+            # pyjnius attaches this thread to the JVM; detach before it exits
+            try:
+                from jnius import detach
+                detach()
+            except Exception:
+                pass
+
+    def _cancel_release_timer(self):
+        """Cancel a pending delayed release; caller holds self._lock"""
+        if self._release_timer is not None:
+            self._release_timer.cancel()
+            self._release_timer = None
+
+    def stats(self):
+        """Return JNI call counts and current holders for battery profiling"""
+        with self._lock:
+            return {
+                'held': self.wake_lock_held,
+                'holders': sorted(self.holders),
+                'jni_acquires': self.jni_acquires,
+                'jni_releases': self.jni_releases,
+                'release_pending': self._release_timer is not None,
+            }
+
     def is_held(self):
         """Check if wake lock is currently held"""
         if not self.is_android or not self.wake_lock:
@@ -377,7 +493,156 @@ class WakeLockManager:
 
     def __del__(self):
         """Cleanup: release wake lock on object destruction"""
-        self.release()
+        try:
+            with self._lock:
+                self.holders.clear()
+                self._cancel_release_timer()
+                self._release_now()
+        except Exception:
+            pass
+
+
+_shared_wake_lock_manager = None
+_shared_pygame_player = None
+_shared_backend_lock = threading.Lock()
+
+
+def get_wake_lock_manager(is_android=False):
+    """Return the process-wide wake lock manager, so the JNI lookups happen once"""
+    global _shared_wake_lock_manager
+    with _shared_backend_lock:
+        if _shared_wake_lock_manager is None:
+            _shared_wake_lock_manager = WakeLockManager(is_android=is_android)
+        return _shared_wake_lock_manager
+
+# ------------------- Power-Aware Scheduler -------------------
+class ScheduledTimer:
+    """Handle for a callback registered with PowerScheduler"""
+
+    def __init__(self, scheduler, callback, interval):
+        self.scheduler = scheduler
+        self.callback = callback
+        self.interval = interval
+
+    def cancel(self):
+        self.scheduler.unschedule(self)
+
+
+class PowerScheduler:
+    """Runs UI timers on as few Clock events as possible
+
+    Timers with the same interval share one Clock event, so several 0.5 s
+    progress updates wake the main loop once per tick instead of once each.
+    While the app is backgrounded or the screen is off the events are
+    cancelled entirely; on resume every timer fires once straight away so the
+    UI catches up. Wakeups are counted for battery profiling.
+    """
+
+    def __init__(self):
+        self._groups = {}   # interval -> {'event': ClockEvent, 'timers': [ScheduledTimer]}
+        self._lock = threading.RLock()
+        self.suspended = False
+        self.total_wakeups = 0
+        self._wakeup_times = deque(maxlen=4096)
+
+    def schedule_interval(self, callback, interval):
+        """Call callback(dt) every interval seconds until cancelled
+
+        Like Clock.schedule_interval, returning False from the callback
+        unschedules it.
+        """
+        timer = ScheduledTimer(self, callback, interval)
+        with self._lock:
+            group = self._groups.setdefault(interval, {'event': None, 'timers': []})
+            group['timers'].append(timer)
+            if group['event'] is None and not self.suspended:
+                group['event'] = self._start_group(interval)
+        return timer
+
+    def unschedule(self, timer):
+        with self._lock:
+            group = self._groups.get(timer.interval)
+            if not group or timer not in group['timers']:
+                return
+            group['timers'].remove(timer)
+            if not group['timers']:
+                if group['event'] is not None:
+                    group['event'].cancel()
+                del self._groups[timer.interval]
+
+    def _start_group(self, interval):
+        return Clock.schedule_interval(lambda dt: self._tick(interval, dt), interval)
+
+    def _tick(self, interval, dt):
+        with self._lock:
+            group = self._groups.get(interval)
+            timers = list(group['timers']) if group else []
+        if not timers:
+            return False
+
+        self.total_wakeups += 1
+        self._wakeup_times.append(time.monotonic())
+        for timer in timers:
+            try:
+                keep = timer.callback(dt)
+            except Exception as e:
+                print(f"⚠️ Scheduled callback failed: {e}")
+                keep = True
+            if keep is False:
+                timer.cancel()
+
+    def suspend(self):
+        """Stop all timer events, e.g. when the app is paused or the screen is off"""
+        with self._lock:
+            if self.suspended:
+                return
+            self.suspended = True
+            for group in self._groups.values():
+                if group['event'] is not None:
+                    group['event'].cancel()
+                    group['event'] = None
+
+    def resume(self):
+        """Restart timer events and run each callback once to refresh the UI"""
+        with self._lock:
+            if not self.suspended:
+                return
+            self.suspended = False
+            for interval, group in self._groups.items():
+                group['event'] = self._start_group(interval)
+            intervals = list(self._groups)
+        for interval in intervals:
+            Clock.schedule_once(lambda dt, i=interval: self._tick(i, 0))
+
+    def wakeups_per_minute(self):
+        """Timer wakeups in the last 60 seconds"""
+        cutoff = time.monotonic() - 60.0
+        with self._lock:
+            while self._wakeup_times and self._wakeup_times[0] < cutoff:
+                self._wakeup_times.popleft()
+            return len(self._wakeup_times)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'suspended': self.suspended,
+                'timers': sum(len(g['timers']) for g in self._groups.values()),
+                'clock_events': sum(1 for g in self._groups.values() if g['event'] is not None),
+                'total_wakeups': self.total_wakeups,
+                'wakeups_per_minute': self.wakeups_per_minute(),
+            }
+
+
+_shared_power_scheduler = None
+
+
+def get_power_scheduler():
+    """Return the process-wide power-aware timer scheduler"""
+    global _shared_power_scheduler
+    with _shared_backend_lock:
+        if _shared_power_scheduler is None:
+            _shared_power_scheduler = PowerScheduler()
+        return _shared_power_scheduler
 
 # ------------------- Pygame Audio Player (Fallback for Pydroid 3) -------------------
 class PygameAudioPlayer:
@@ -391,7 +656,14 @@ class PygameAudioPlayer:
         self._position = 0
         self._paused_position = 0
         self.is_mobile = is_mobile
-        self.wake_lock_manager = WakeLockManager(is_android=is_android)
+        self.wake_lock_manager = get_wake_lock_manager(is_android=is_android)
+        self._end_callbacks = []
+        self._end_check_event = None
+        self._end_event_type = None
+        self._play_offset = 0  # Position the current play() call started from
+        self._seek_stream = None  # Open file handed to the mixer after a byte-offset seek
+        self._lock = threading.RLock()  # Guards load/unload so test_load can't race a real load
+        self._indexing = set()  # files a seek index worker is building
         self._init_pygame()
 
     def _init_pygame(self):
@@ -419,6 +691,13 @@ class PygameAudioPlayer:
                     )
             self.initialized = True
             print(f"Pygame mixer initialized (mobile={self.is_mobile}): {pygame.mixer.get_init()}")
+
+            # Ask the mixer to post an event when a track finishes
+            try:
+                self._end_event_type = pygame.USEREVENT + PYGAME_END_EVENT_OFFSET
+                pygame.mixer.music.set_endevent(self._end_event_type)
+            except Exception:
+                self._end_event_type = None
         except ImportError:
             print("Pygame not installed - audio fallback unavailable")
             self.initialized = False
@@ -426,15 +705,16 @@ class PygameAudioPlayer:
             print(f"Failed to initialize pygame mixer: {e}")
             self.initialized = False
 
-    def load(self, filepath):
+    def load(self, filepath, build_index=True):
         """Load an audio file"""
         if not self.initialized:
             return False
 
         try:
-            pygame.mixer.music.load(filepath)
-            self.current_file = filepath
-            # Try to get length using mutagen
+            with self._lock:
+                pygame.mixer.music.load(filepath)
+                self._close_seek_stream()
+                self.current_file = filepath
             try:
                 from mutagen import File
                 audio = File(filepath)
@@ -444,11 +724,34 @@ class PygameAudioPlayer:
                     self._length = 0
             except Exception:
                 self._length = 0
+            # mutagen's estimate for now; the seek index (exact for VBR) is built off the load path
+            if build_index:
+                self._start_seek_index_build(filepath)
             return True
         except Exception as e:
             print(f"Pygame failed to load {filepath}: {e}")
             return False
 
+    def _start_seek_index_build(self, filepath):
+        """Build the seek index on a worker unless one is already building it"""
+        if os.path.splitext(filepath)[1].lower() not in ('.mp3', '.m4a', '.mp4'):
+            return
+        with self._lock:
+            if filepath in self._indexing:
+                return
+            self._indexing.add(filepath)
+        threading.Thread(target=self._build_seek_index, args=(filepath,), daemon=True).start()
+
+    def _build_seek_index(self, filepath):
+        """Worker: build (or load) the seek index and take its exact length if still loaded"""
+        try:
+            index = get_seek_index(filepath)
+        finally:
+            with self._lock:
+                self._indexing.discard(filepath)
+        if index and index.duration > 0 and self.current_file == filepath:
+            self._length = index.duration
+
     def play(self):
         """Play the loaded audio"""
         if not self.initialized or not self.current_file:
@@ -456,46 +759,103 @@ class PygameAudioPlayer:
 
         try:
             # Acquire wake lock for background playback
-            self.wake_lock_manager.acquire()
+            self.wake_lock_manager.acquire("pygame")
 
-            if self._paused_position > 0:
-                # Resume from paused position
-                pygame.mixer.music.play(start=self._paused_position)
-                self._paused_position = 0
-            else:
-                pygame.mixer.music.play()
+            # Resume from the paused position, if any
+            self._play_from(self._paused_position)
+            self._paused_position = 0
             self._state = 'play'
+            self._arm_end_check()
             return True
         except Exception as e:
             print(f"Pygame play error: {e}")
             return False
 
+    def play_from(self, position):
+        """Play the loaded audio starting at position (seconds)"""
+        self._paused_position = max(0, position)
+        return self.play()
+
+    def _play_from(self, position):
+        """
+        Start the mixer at position. With a byte-seekable index the file is handed to the
+        mixer from the exact frame, so the decoder doesn't scan from the start of a VBR file;
+        otherwise fall back to play(start=...).
+        """
+        reload = self._seek_stream is not None
+        # Never build the index here (seeks come from the UI thread): use a cached or
+        # sidecar index, else seek with play(start=...) while a worker builds it
+        index = get_seek_index(self.current_file, build=False) if position > 0 else None
+        if position > 0 and index is None:
+            self._start_seek_index_build(self.current_file)
+        if index and index.byte_seekable:
+            point_time, offset = index.locate(position)
+            stream = open(self.current_file, 'rb')
+            try:
+                stream.seek(offset)
+                pygame.mixer.music.load(stream, 'mp3')
+                pygame.mixer.music.play()
+            except Exception:
+                stream.close()
+                reload = True
+            else:
+                self._close_seek_stream()
+                self._seek_stream = stream
+                self._play_offset = point_time
+                return
+
+        if reload:
+            # The mixer holds a truncated (or failed) stream; go back to the whole file
+            pygame.mixer.music.load(self.current_file)
+            self._close_seek_stream()
+        if position > 0:
+            pygame.mixer.music.play(start=position)
+        else:
+            pygame.mixer.music.play()
+        self._play_offset = position
+
+    def _close_seek_stream(self):
+        stream, self._seek_stream = self._seek_stream, None
+        if stream:
+            try:
+                stream.close()
+            except Exception:
+                pass
+
     def stop(self):
         """Stop playback"""
         if not self.initialized:
             return
 
+        was_active = self._state in ('play', 'pause')
+        self._cancel_end_check()
         try:
             pygame.mixer.music.stop()
+            self._clear_end_events()
             self._state = 'stop'
             self._paused_position = 0
             # Release wake lock when stopped
-            self.wake_lock_manager.release()
+            self.wake_lock_manager.release("pygame")
         except Exception:
             pass
 
-    def pause(self):
-        """Pause playback"""
+        # Mirror Kivy's Sound, which dispatches on_stop when stopped
+        if was_active:
+            self._dispatch_end()
+
+    def pause(self, position=None):
+        """Pause playback (the mixer keeps its own position, so `position` is ignored)"""
         if not self.initialized:
             return
 
         try:
             # Save current position
-            self._paused_position = pygame.mixer.music.get_pos() / 1000.0
+            self._paused_position = self.get_pos()
+            self._cancel_end_check()
             pygame.mixer.music.pause()
             self._state = 'pause'
             # Release wake lock when paused to save battery
-            self.wake_lock_manager.release()
+            self.wake_lock_manager.release("pygame")
         except Exception:
             pass
 
@@ -506,19 +866,26 @@ class PygameAudioPlayer:
 
         try:
             # Re-acquire wake lock when resuming
-            self.wake_lock_manager.acquire()
+            self.wake_lock_manager.acquire("pygame")
             pygame.mixer.music.unpause()
             self._state = 'play'
+            self._paused_position = 0
+            self._arm_end_check()
         except Exception:
             pass
 
+    def resume(self):
+        """Resume playback (track interface name for unpause)"""
+        self.unpause()
+
     def get_pos(self):
-        """Get current playback position in seconds"""
+        """Get current playback position in seconds from the start of the track"""
         if not self.initialized or self._state != 'play':
             return self._paused_position
 
         try:
-            pos = pygame.mixer.music.get_pos() / 1000.0  # Convert ms to seconds
+            # mixer.music.get_pos() counts ms since play(), not from the start offset
+            pos = self._play_offset + pygame.mixer.music.get_pos() / 1000.0
             return pos
         except Exception:
             return 0
@@ -529,14 +896,17 @@ class PygameAudioPlayer:
             return
 
         try:
-            # pygame.mixer.music doesn't support seeking on all platforms
-            # Best we can do is restart and play from position
+            # pygame.mixer.music doesn't support seeking on all platforms, so restart
+            # from the position (by byte offset when the file has a seek index)
             was_playing = self._state == 'play'
+            self._cancel_end_check()
             pygame.mixer.music.stop()
-            pygame.mixer.music.play(start=position)
+            self._play_from(position)
             if not was_playing:
                 pygame.mixer.music.pause()
                 self._state = 'pause'
+            else:
+                self._arm_end_check()
         except Exception as e:
             print(f"Pygame seek error: {e}")
 
@@ -545,16 +915,130 @@ class PygameAudioPlayer:
         if not self.initialized:
             return
 
+        self._cancel_end_check()
         try:
-            pygame.mixer.music.stop()
-            pygame.mixer.music.unload()
-            self.current_file = None
-            self._state = 'stop'
-            self._length = 0
-            self._paused_position = 0
+            with self._lock:
+                pygame.mixer.music.stop()
+                pygame.mixer.music.unload()
+                self._clear_end_events()
+                self._close_seek_stream()
+                self.current_file = None
+                self._state = 'stop'
+                self._length = 0
+                self._paused_position = 0
+                self._play_offset = 0
         except Exception:
             pass
 
+    def test_load(self, filepath):
+        """
+        Check that pygame can open a file, without disturbing a loaded track
+
+        Returns:
+            True/False, or None if a track is loaded and testing would interrupt it
+        """
+        if not self.initialized:
+            return False
+        with self._lock:
+            if self.current_file is not None:
+                return None
+            if self.load(filepath, build_index=False):
+                self.unload()
+                return True
+            return False
+
+    def bind(self, on_stop=None):
+        """Register an end-of-track callback (mirrors Kivy's Sound.bind(on_stop=...))"""
+        if on_stop and on_stop not in self._end_callbacks:
+            self._end_callbacks.append(on_stop)
+
+    def unbind(self, on_stop=None):
+        """Remove an end-of-track callback"""
+        try:
+            self._end_callbacks.remove(on_stop)
+        except ValueError:
+            pass
+
+    def _dispatch_end(self):
+        """Notify listeners that playback ended"""
+        for callback in list(self._end_callbacks):
+            try:
+                callback(self)
+            except Exception as e:
+                print(f"Pygame end callback error: {e}")
+
+    def _remaining_time(self):
+        """Seconds left in the track, or None if the length is unknown"""
+        if self._length <= 0:
+            return None
+        return self._length - self.get_pos()
+
+    def _arm_end_check(self, delay=None):
+        """
+        Start a one-shot timer thread for when the track is due to finish. A thread
+        rather than Kivy's Clock, which stops while the Android app is paused.
+        """
+        self._cancel_end_check()
+        if delay is None:
+            # Called right after (re)starting the mixer: earlier end events are stale
+            self._clear_end_events()
+            remaining = self._remaining_time()
+            delay = max(0.02, remaining) if remaining is not None else 0.5
+        timer = threading.Timer(delay, self._check_end)
+        timer.daemon = True
+        self._end_check_event = timer
+        timer.start()
+
+    def _cancel_end_check(self):
+        if self._end_check_event:
+            self._end_check_event.cancel()
+            self._end_check_event = None
+
+    def _clear_end_events(self):
+        """Drop end events posted by stop()/seek() so they aren't taken for a real end"""
+        if self._end_event_type is not None:
+            try:
+                pygame.event.clear(self._end_event_type, pump=False)
+            except Exception:
+                pass
+
+    def _check_end(self):
+        """Timer thread: confirm the end via the mixer end event (or get_busy) and dispatch, else re-arm"""
+        with self._lock:
+            # A timer cancelled after it fired, or superseded by a re-arm, is stale
+            if threading.current_thread() is not self._end_check_event or self._state != 'play':
+                return
+            self._end_check_event = None
+
+            ended = False
+            if self._end_event_type is not None:
+                try:
+                    # No pump: pumping the event loop is only allowed on the main thread
+                    ended = bool(pygame.event.get(self._end_event_type, pump=False))
+                except Exception:
+                    # Event queue needs the video subsystem; fall back to get_busy
+                    pass
+            if not ended:
+                try:
+                    ended = not pygame.mixer.music.get_busy()
+                except Exception:
+                    ended = True
+
+            if ended:
+                self._state = 'stop'
+            else:
+                # Length estimate was short: check again soon, backing off once well past the end
+                remaining = self._remaining_time()
+                if remaining is None:
+                    delay = 0.5
+                else:
+                    delay = remaining if remaining > 0.02 else (0.02 if remaining > -2 else 0.25)
+                self._arm_end_check(delay)
+                return
+
+        self.wake_lock_manager.release("pygame")
+        self._dispatch_end()
+
     @property
     def state(self):
         """Get current playback state"""
@@ -597,462 +1081,3722 @@ class PygameAudioPlayer:
             pass
 
 
-# ------------------- Audio Converter Module -------------------
-class AudioConverter:
-    """Handles audio format conversion with fallback support"""
+def get_pygame_player(is_mobile=False, is_android=False):
+    """
+    Return the process-wide pygame player. The mixer and wake lock are set up once;
+    tracks are swapped with load()/unload().
+    """
+    global _shared_pygame_player
+    with _shared_backend_lock:
+        if _shared_pygame_player is None:
+            _shared_pygame_player = PygameAudioPlayer(is_mobile=is_mobile, is_android=is_android)
+        return _shared_pygame_player
 
-    def __init__(self, env_detector=None):
-        self.has_pydub = False
-        self.has_ffmpeg = False
-        self.env_detector = env_detector
-        self._check_dependencies()
 
-    def _check_dependencies(self):
-        """Check if pydub and ffmpeg are available"""
-        try:
-            from pydub import AudioSegment
-            self.has_pydub = True
+# ------------------- Audio Backends -------------------
+class AudioBackend:
+    """
+    Base class for playback backends. load() returns a track object exposing
+    play(), play_from(seconds), pause(position=None), resume(), stop(), seek(seconds), get_pos(), unload(),
+    length, state, volume and bind/unbind(on_stop=callback) for end-of-track events.
+    """
 
-            if self.env_detector and self.env_detector.ffmpeg_available:
-                self.has_ffmpeg = True
-                self.ffmpeg_path = self.env_detector.ffmpeg_path
-                AudioSegment.converter = self.ffmpeg_path
-                print(f"Using ffmpeg from environment detector: {self.ffmpeg_path}")
-            else:
-                import subprocess
-                ffmpeg_paths = [
-                    'ffmpeg',
-                    '/data/data/ru.iiec.pydroid3/files/ffmpeg',
-                    '/data/data/ru.iiec.pydroid3/files/aarch64-linux-android/bin/ffmpeg',
-                    '/storage/emulated/0/Download/ffmpeg',
-                ]
+    name = "base"
+    # Whether a second track can be loaded while one plays (gapless arming, crossfade)
+    supports_preload = False
 
-                for ffmpeg_path in ffmpeg_paths:
-                    try:
-                        result = subprocess.run([ffmpeg_path, '-version'],
-                                               capture_output=True,
-                                               timeout=2)
-                        if result.returncode == 0:
-                            self.has_ffmpeg = True
-                            self.ffmpeg_path = ffmpeg_path
-                            AudioSegment.converter = ffmpeg_path
-                            break
-                    except Exception:
-                        continue
-        except Exception:
-            pass
+    def load(self, filepath):
+        """Load a track; returns a track object, or None if this backend can't play the file"""
+        raise NotImplementedError
 
-    def can_convert(self):
-        """Check if conversion is possible"""
-        return self.has_pydub and self.has_ffmpeg
 
-    def set_ffmpeg_path(self, path, log_callback=None):
-        """
-        Set a custom ffmpeg path for Pydroid 3 or other environments
+class KivyTrack:
+    """Adapts a Kivy Sound to the track interface, adding a position-preserving pause"""
 
-        Args:
-            path: Path to ffmpeg executable
-            log_callback: Function to call for logging
+    def __init__(self, sound):
+        self.sound = sound
+        self._end_callbacks = []
+        self._paused_at = None
+        sound.bind(on_stop=self._on_sound_stop)
 
-        Returns:
-            True if ffmpeg is valid at that path, False otherwise
-        """
-        import subprocess
-        try:
-            result = subprocess.run([path, '-version'],
-                                   capture_output=True,
-                                   timeout=2)
-            if result.returncode == 0:
-                self.has_ffmpeg = True
-                self.ffmpeg_path = path
-                from pydub import AudioSegment
-                AudioSegment.converter = path
-                if log_callback:
-                    log_safe(log_callback, f"✅ FFmpeg configured at: {path}")
-                return True
-        except Exception as e:
-            if log_callback:
-                log_safe(log_callback, f"❌ Invalid ffmpeg path: {e}")
-        return False
+    def _on_sound_stop(self, sound, *args):
+        # Kivy has no pause, so pause() stops the sound - that isn't the end of the track
+        if self._paused_at is not None:
+            return
+        for callback in list(self._end_callbacks):
+            try:
+                callback(self)
+            except Exception as e:
+                print(f"Kivy end callback error: {e}")
 
-    def convert_to_mp3(self, input_file, output_file=None, log_callback=None):
-        """
-        Convert audio file to MP3 format
+    def bind(self, on_stop=None):
+        if on_stop and on_stop not in self._end_callbacks:
+            self._end_callbacks.append(on_stop)
 
-        Args:
-            input_file: Path to input audio file (.m4a, .opus, etc.)
-            output_file: Path for output MP3 file (optional, auto-generated if None)
-            log_callback: Function to call for logging
+    def unbind(self, on_stop=None):
+        try:
+            self._end_callbacks.remove(on_stop)
+        except ValueError:
+            pass
 
-        Returns:
-            Path to converted MP3 file, or None if conversion failed
-        """
-        if not self.can_convert():
-            if log_callback:
-                log_safe(log_callback, "⚠️ Conversion not available - pydub/ffmpeg not installed")
-            return None
+    def play(self):
+        self._paused_at = None
+        self.sound.play()
+
+    def play_from(self, position):
+        """Play starting at position (seconds)"""
+        self.play()
+        if position > 0:
+            Clock.schedule_once(lambda dt: self._seek_if_playing(position), 0.1)
+
+    def pause(self, position=None):
+        """Stop the sound but remember where it was (position overrides a 0 from get_pos)"""
+        if self.sound.state != 'play':
+            return
+        self._paused_at = position if position is not None else (self.sound.get_pos() or 0)
+        self.sound.stop()
 
+    def resume(self):
+        position, self._paused_at = self._paused_at, None
+        if position is None:
+            return
+        self.sound.play()
+        # CRITICAL: Must delay seek() after play() - Kivy audio pipeline needs time to initialize
+        if position > 0:
+            Clock.schedule_once(lambda dt: self._seek_if_playing(position), 0.1)
+
+    def _seek_if_playing(self, position):
         try:
-            from pydub import AudioSegment
+            if self.sound.state == 'play':
+                self.sound.seek(position)
+        except Exception as e:
+            print(f"Kivy seek error: {e}")
 
-            # Generate output filename if not provided
-            if output_file is None:
-                base_name = os.path.splitext(input_file)[0]
-                output_file = f"{base_name}_converted.mp3"
+    def stop(self):
+        self._paused_at = None
+        self.sound.stop()
 
-            # Check if input file exists
-            if not os.path.exists(input_file):
-                if log_callback:
-                    log_safe(log_callback, f"❌ Input file not found: {input_file}")
+    def seek(self, position):
+        self.sound.seek(position)
+
+    def get_pos(self):
+        if self._paused_at is not None:
+            return self._paused_at
+        return self.sound.get_pos()
+
+    def unload(self):
+        self._paused_at = None
+        try:
+            self.sound.unbind(on_stop=self._on_sound_stop)
+        except Exception:
+            pass
+        self.sound.unload()
+
+    @property
+    def state(self):
+        return 'pause' if self._paused_at is not None else self.sound.state
+
+    @property
+    def length(self):
+        return self.sound.length
+
+    @property
+    def volume(self):
+        return self.sound.volume
+
+    @volume.setter
+    def volume(self, value):
+        self.sound.volume = value
+
+
+class KivyBackend(AudioBackend):
+    """Kivy SoundLoader; each track is an independent Sound, so tracks can overlap"""
+
+    name = "kivy"
+    supports_preload = True
+
+    def load(self, filepath):
+        sound = SoundLoader.load(filepath)
+        return KivyTrack(sound) if sound else None
+
+
+class PygameBackend(AudioBackend):
+    """The shared pygame mixer.music stream - one track at a time"""
+
+    name = "pygame"
+
+    def __init__(self, is_mobile=False, is_android=False):
+        self.is_mobile = is_mobile
+        self.is_android = is_android
+
+    def load(self, filepath):
+        player = get_pygame_player(is_mobile=self.is_mobile, is_android=self.is_android)
+        return player if player.load(filepath) else None
+
+
+class NullTrack:
+    """
+    Simulated track for headless runs: a clock that advances in real time (or
+    `speed` times faster) and fires on_stop when it reaches the track length.
+    """
+
+    def __init__(self, filepath, length, speed=1.0):
+        self.filepath = filepath
+        self.length = length
+        self.speed = max(0.001, speed)
+        self.volume = 1.0
+        self.state = 'stop'
+        self._offset = 0.0
+        self._started_at = None
+        self._end_timer = None
+        self._end_callbacks = []
+        self._lock = threading.Lock()
+
+    def bind(self, on_stop=None):
+        if on_stop and on_stop not in self._end_callbacks:
+            self._end_callbacks.append(on_stop)
+
+    def unbind(self, on_stop=None):
+        try:
+            self._end_callbacks.remove(on_stop)
+        except ValueError:
+            pass
+
+    def _dispatch_end(self):
+        for callback in list(self._end_callbacks):
+            try:
+                callback(self)
+            except Exception as e:
+                print(f"Null backend end callback error: {e}")
+
+    def _cancel_timer(self):
+        if self._end_timer:
+            self._end_timer.cancel()
+            self._end_timer = None
+
+    def _finish(self):
+        with self._lock:
+            if self.state != 'play':
+                return
+            self._end_timer = None
+            self._offset = self.length
+            self._started_at = None
+            self.state = 'stop'
+        self._dispatch_end()
+
+    def play(self):
+        with self._lock:
+            if self._offset >= self.length:
+                self._offset = 0.0
+            self._cancel_timer()
+            self._started_at = time.monotonic()
+            self.state = 'play'
+            self._end_timer = threading.Timer((self.length - self._offset) / self.speed, self._finish)
+            self._end_timer.daemon = True
+            self._end_timer.start()
+
+    def play_from(self, position):
+        with self._lock:
+            self._offset = max(0.0, min(position, self.length))
+        self.play()
+
+    def pause(self, position=None):
+        with self._lock:
+            if self.state != 'play':
+                return
+            self._offset = self._position()
+            self._started_at = None
+            self._cancel_timer()
+            self.state = 'pause'
+
+    def resume(self):
+        if self.state == 'pause':
+            self.play()
+
+    def stop(self):
+        with self._lock:
+            was_active = self.state in ('play', 'pause')
+            self._cancel_timer()
+            self._offset = 0.0
+            self._started_at = None
+            self.state = 'stop'
+        if was_active:
+            self._dispatch_end()
+
+    def seek(self, position):
+        was_playing = self.state == 'play'
+        with self._lock:
+            self._cancel_timer()
+            self._offset = max(0.0, min(float(position), self.length))
+            self._started_at = None
+            if self.state == 'play':
+                self.state = 'pause'
+        if was_playing:
+            self.play()
+
+    def _position(self):
+        if self._started_at is None:
+            return self._offset
+        return min(self.length, self._offset + (time.monotonic() - self._started_at) * self.speed)
+
+    def get_pos(self):
+        with self._lock:
+            return self._position()
+
+    def unload(self):
+        with self._lock:
+            self._cancel_timer()
+            self._started_at = None
+            self.state = 'stop'
+
+
+class NullBackend(AudioBackend):
+    """Plays nothing; simulates playback timing so the stream pipeline can run headless"""
+
+    name = "null"
+    supports_preload = True
+
+    def __init__(self, speed=1.0, default_length=180.0):
+        self.speed = speed
+        self.default_length = default_length
+
+    def load(self, filepath):
+        if not os.path.exists(filepath):
+            return None
+        length = 0
+        try:
+            from mutagen import File
+            audio = File(filepath)
+            if audio and hasattr(audio.info, 'length'):
+                length = audio.info.length
+        except Exception:
+            length = 0
+        return NullTrack(filepath, length or self.default_length, speed=self.speed)
+
+
+def make_audio_backends(name="auto", is_mobile=False, is_android=False, speed=1.0):
+    """
+    Build the ordered backend list to try when loading a track
+
+    Args:
+        name: 'auto' (Kivy, then pygame), 'kivy', 'pygame' or 'null'
+        speed: Playback speed multiplier for the null backend
+    """
+    if name == "null":
+        return [NullBackend(speed=speed)]
+    if name == "kivy":
+        return [KivyBackend()]
+    if name == "pygame":
+        return [PygameBackend(is_mobile=is_mobile, is_android=is_android)]
+    return [KivyBackend(), PygameBackend(is_mobile=is_mobile, is_android=is_android)]
+
+
+def load_track(filepath, backends, log_callback=None):
+    """
+    Load a file with the first backend that can play it
+
+    Returns:
+        (track, backend), or (None, None) if no backend could load a playable track
+    """
+    for i, backend in enumerate(backends):
+        try:
+            track = backend.load(filepath)
+        except Exception as e:
+            track = None
+            if log_callback:
+                log_safe(log_callback, f"ℹ️ {backend.name} error: {e}")
+
+        if track is None:
+            if log_callback and i + 1 < len(backends):
+                log_safe(log_callback, f"ℹ️ {backend.name} could not load {os.path.basename(filepath)}, trying {backends[i + 1].name}...")
+            continue
+
+        # A zero length means the decoder couldn't read the stream
+        if (getattr(track, 'length', 0) or 0) <= 0:
+            try:
+                track.unload()
+            except Exception:
+                pass
+            continue
+
+        return track, backend
+
+    return None, None
+
+
+# ------------------- Codec Probe -------------------
+# Codecs known to be playable come from EnvironmentDetector.pygame_codecs; any other
+# codec is "unknown" and gets a full decoder load test (Kivy's SoundLoader may still
+# handle it, e.g. AAC through Android's MediaPlayer).
+# Container/codec name normalisation for what sniff_audio_codec reports
+_CODEC_ALIASES = {
+    'vorbis': 'ogg',
+}
+
+PROBE_CACHE_MAX_ENTRIES = 1024
+
+
+def sniff_audio_codec(file_path):
+    """
+    Identify the audio codec of a file from its magic bytes and mutagen headers,
+    without decoding any audio.
+
+    Returns:
+        Codec name ('mp3', 'ogg', 'opus', 'flac', 'wav', 'aac', 'alac', 'webm'),
+        or None if the file could not be identified
+    """
+    try:
+        with open(file_path, 'rb') as f:
+            head = f.read(4096)
+    except Exception:
+        return None
+
+    if len(head) < 12:
+        return None
+
+    # ADTS AAC shares the 11 sync bits with MPEG audio, so require a full MP3 frame header
+    # (which rejects layer 00); anything else falls through to mutagen below
+    audio_start = _id3v2_size(head)
+    if audio_start + 4 <= len(head):
+        is_mp3 = parse_mp3_frame_header(head[audio_start:audio_start + 4]) is not None
+    else:
+        is_mp3 = True   # the ID3 tag (e.g. with cover art) runs past what was read
+
+    codec = None
+    if is_mp3:
+        codec = 'mp3'
+    elif head.startswith(b'OggS'):
+        if b'OpusHead' in head:
+            codec = 'opus'
+        elif b'\x01vorbis' in head:
+            codec = 'vorbis'
+        elif b'\x7fFLAC' in head:
+            codec = 'flac'
+    elif head.startswith(b'fLaC'):
+        codec = 'flac'
+    elif head.startswith(b'RIFF') and head[8:12] == b'WAVE':
+        codec = 'wav'
+    elif head[4:8] == b'ftyp':
+        codec = 'mp4'
+    elif head.startswith(b'\x1a\x45\xdf\xa3'):
+        # Matroska/WebM: the CodecID element is near the start of the Tracks element
+        codec = 'opus' if b'A_OPUS' in head else 'webm'
+
+    # MP4 needs the sample description to tell AAC from ALAC; mutagen reads it from moov
+    if codec == 'mp4' or codec is None:
+        try:
+            from mutagen import File
+            audio = File(file_path)
+            kind = type(audio).__name__ if audio is not None else None
+            if kind == 'MP4':
+                mp4_codec = getattr(audio.info, 'codec', '') or ''
+                if mp4_codec.startswith('mp4a'):
+                    codec = 'aac'
+                elif mp4_codec == 'alac':
+                    codec = 'alac'
+                else:
+                    codec = mp4_codec or 'aac'
+            elif kind == 'MP3':
+                codec = 'mp3'
+            elif kind == 'AAC':
+                codec = 'aac'
+            elif kind == 'OggVorbis':
+                codec = 'vorbis'
+            elif kind == 'OggOpus':
+                codec = 'opus'
+            elif kind == 'FLAC':
+                codec = 'flac'
+            elif kind == 'WAVE':
+                codec = 'wav'
+            elif codec == 'mp4':
+                codec = 'aac'
+        except Exception:
+            if codec == 'mp4':
+                codec = 'aac'
+
+    return _CODEC_ALIASES.get(codec, codec)
+
+
+# ------------------- Seek Index -------------------
+SEEK_CACHE_DIR = "seek_cache"
+SEEK_INDEX_INTERVAL = 0.5  # Seconds between recorded seek points
+SEEK_INDEX_MEMORY_ENTRIES = 64
+_SEEK_MAGIC = b'SEK1'
+_SEEK_KINDS = ('frames', 'xing', 'vbri', 'mp4')
+
+_MP3_BITRATES = {
+    (1, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (1, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (1, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (2, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (2, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (2, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_MP3_SAMPLE_RATES = {1: (44100, 48000, 32000), 2: (22050, 24000, 16000), 25: (11025, 12000, 8000)}
+
+
+def parse_mp3_frame_header(header):
+    """
+    Decode a 4-byte MPEG audio frame header
+
+    Returns:
+        (frame_length, sample_rate, samples_per_frame, version, channel_mode), or None
+    """
+    if len(header) < 4 or header[0] != 0xFF or (header[1] & 0xE0) != 0xE0:
+        return None
+    version = {3: 1, 2: 2, 0: 25}.get((header[1] >> 3) & 3)
+    layer = {3: 1, 2: 2, 1: 3}.get((header[1] >> 1) & 3)
+    bitrate_index = header[2] >> 4
+    rate_index = (header[2] >> 2) & 3
+    if not version or not layer or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    bitrate = _MP3_BITRATES[(1 if version == 1 else 2, layer)][bitrate_index] * 1000
+    sample_rate = _MP3_SAMPLE_RATES[version][rate_index]
+    padding = (header[2] >> 1) & 1
+    if layer == 1:
+        samples = 384
+        length = (12 * bitrate // sample_rate + padding) * 4
+    else:
+        samples = 576 if (layer == 3 and version != 1) else 1152
+        length = samples // 8 * bitrate // sample_rate + padding
+    return length, sample_rate, samples, version, header[3] >> 6
+
+
+class SeekIndex:
+    """
+    Time-to-byte-offset table for a file, with points every SEEK_INDEX_INTERVAL seconds.
+    For MP3 the offsets are frame starts, so a decoder can begin at any of them; locate()
+    walks the few frames between points to land on the exact frame.
+    """
+
+    def __init__(self, path, kind, duration, times, offsets, sample_rate=0, samples_per_frame=0):
+        self.path = path
+        self.kind = kind
+        self.duration = duration
+        self.times = times
+        self.offsets = offsets
+        self.sample_rate = sample_rate
+        self.samples_per_frame = samples_per_frame
+
+    @property
+    def byte_seekable(self):
+        """True if playback can start from a raw byte offset (MP3 frames need no container)"""
+        return self.kind != 'mp4' and len(self.offsets) > 0
+
+    def locate(self, position):
+        """
+        Returns:
+            (time, byte_offset) of the latest seek point at or before position
+        """
+        import bisect
+        if not self.times:
+            return 0.0, 0
+        i = max(0, bisect.bisect_right(self.times, position) - 1)
+        point_time, offset = self.times[i], self.offsets[i]
+        if self.kind == 'frames' and self.sample_rate:
+            point_time, offset = self._refine_mp3(point_time, offset, position)
+        return point_time, offset
+
+    def _refine_mp3(self, point_time, offset, position):
+        """Step frame by frame from a seek point to the frame containing position"""
+        frame_seconds = self.samples_per_frame / float(self.sample_rate)
+        try:
+            with open(self.path, 'rb') as f:
+                f.seek(offset)
+                window = f.read(int(SEEK_INDEX_INTERVAL / frame_seconds + 2) * 1441 + 4)
+        except Exception:
+            return point_time, offset
+        pos = 0
+        while point_time + frame_seconds <= position:
+            frame = parse_mp3_frame_header(window[pos:pos + 4])
+            if not frame or pos + frame[0] + 4 > len(window):
+                break
+            pos += frame[0]
+            point_time += frame_seconds
+        return point_time, offset + pos
+
+    def save(self, sidecar, size, mtime_ns):
+        import struct
+        from array import array
+        os.makedirs(os.path.dirname(sidecar) or '.', exist_ok=True)
+        tmp = f"{sidecar}.tmp-{threading.get_ident()}"
+        with open(tmp, 'wb') as f:
+            f.write(struct.pack('<4sBqqdIII', _SEEK_MAGIC, _SEEK_KINDS.index(self.kind), size, mtime_ns,
+                                self.duration, self.sample_rate, self.samples_per_frame, len(self.times)))
+            f.write(array('d', self.times).tobytes())
+            f.write(array('q', self.offsets).tobytes())
+        os.replace(tmp, sidecar)
+
+    @classmethod
+    def load(cls, path, sidecar, size, mtime_ns):
+        """Read a sidecar written by save(); None if missing or written for other file contents"""
+        import struct
+        from array import array
+        header_size = struct.calcsize('<4sBqqdIII')
+        try:
+            with open(sidecar, 'rb') as f:
+                data = f.read()
+            magic, kind, saved_size, saved_mtime, duration, rate, spf, count = struct.unpack(
+                '<4sBqqdIII', data[:header_size])
+            if magic != _SEEK_MAGIC or (saved_size, saved_mtime) != (size, mtime_ns):
                 return None
+            times = array('d', data[header_size:header_size + count * 8])
+            offsets = array('q', data[header_size + count * 8:header_size + count * 16])
+            if len(times) != count or len(offsets) != count:
+                return None
+            return cls(path, _SEEK_KINDS[kind], duration, list(times), list(offsets), rate, spf)
+        except Exception:
+            return None
 
-            # Detect input format
-            input_ext = os.path.splitext(input_file)[1].lower()
-            format_map = {
-                '.m4a': 'm4a',
-                '.opus': 'opus',
-                '.ogg': 'ogg',
-                '.webm': 'webm',
-                '.mp4': 'mp4'
-            }
 
-            input_format = format_map.get(input_ext)
-            if not input_format:
-                if log_callback:
-                    log_safe(log_callback, f"⚠️ Unsupported format: {input_ext}")
+def _id3v2_size(head):
+    """Bytes taken by a leading ID3v2 tag (header, body and optional footer)"""
+    if len(head) < 10 or head[:3] != b'ID3':
+        return 0
+    size = (head[6] << 21) | (head[7] << 14) | (head[8] << 7) | head[9]
+    return 10 + size + (10 if head[5] & 0x10 else 0)
+
+
+def build_mp3_seek_index(file_path):
+    """
+    Index an MP3 by walking its frame headers (exact for CBR and VBR alike), falling back
+    to the Xing/Info or VBRI table of contents if the frames can't be followed.
+    """
+    import mmap
+    with open(file_path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < 4:
+            return None
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            start = _id3v2_size(data[:10])
+            sync = data.find(b'\xff', start)
+            while sync != -1 and not parse_mp3_frame_header(data[sync:sync + 4]):
+                sync = data.find(b'\xff', sync + 1)
+                if sync - start > 64 * 1024:
+                    sync = -1
+            if sync == -1:
                 return None
+            first = parse_mp3_frame_header(data[sync:sync + 4])
+            _, sample_rate, samples, version, mode = first
+            frame_seconds = samples / float(sample_rate)
+
+            # The Xing/Info (or VBRI) header lives in an otherwise silent first frame
+            side_info = (17 if mode == 3 else 32) if version == 1 else (9 if mode == 3 else 17)
+            xing_at = sync + 4 + side_info
+            toc = None
+            if data[xing_at:xing_at + 4] in (b'Xing', b'Info'):
+                toc = _parse_xing(data, xing_at, sync, size, frame_seconds)
+                audio_start = sync + first[0]
+            elif data[sync + 36:sync + 40] == b'VBRI':
+                toc = _parse_vbri(data, sync + 36, sync, frame_seconds)
+                audio_start = sync + first[0]
+            else:
+                audio_start = sync
+
+            times, offsets = [], []
+            pos, elapsed, next_mark, lost = audio_start, 0.0, 0.0, 0
+            end = size - 128 if data[size - 128:size - 125] == b'TAG' else size
+            while pos + 4 <= end:
+                frame = parse_mp3_frame_header(data[pos:pos + 4])
+                if not frame or frame[1] != sample_rate:
+                    # Resync on junk between frames; give up after a long run of junk
+                    lost += 1
+                    if lost > 32:
+                        break
+                    pos = data.find(b'\xff', pos + 1, end)
+                    if pos == -1:
+                        break
+                    continue
+                lost = 0
+                if elapsed >= next_mark:
+                    times.append(elapsed)
+                    offsets.append(pos)
+                    next_mark = elapsed + SEEK_INDEX_INTERVAL
+                pos += frame[0]
+                elapsed += frame_seconds
+        finally:
+            data.close()
+
+    if times and lost <= 32:
+        return SeekIndex(file_path, 'frames', elapsed, times, offsets, sample_rate, samples)
+    return toc
+
+
+def _parse_xing(data, at, frame_start, file_size, frame_seconds):
+    """SeekIndex from a Xing/Info header's 100-entry TOC (needs the frame and TOC flags)"""
+    import struct
+    flags = struct.unpack('>I', data[at + 4:at + 8])[0]
+    pos = at + 8
+    frames = total_bytes = None
+    if flags & 1:
+        frames = struct.unpack('>I', data[pos:pos + 4])[0]
+        pos += 4
+    if flags & 2:
+        total_bytes = struct.unpack('>I', data[pos:pos + 4])[0]
+        pos += 4
+    if not (flags & 4) or not frames:
+        return None
+    total_bytes = total_bytes or (file_size - frame_start)
+    duration = frames * frame_seconds
+    toc = data[pos:pos + 100]
+    times = [duration * i / 100.0 for i in range(100)]
+    offsets = [frame_start + toc[i] * total_bytes // 256 for i in range(100)]
+    return SeekIndex(None, 'xing', duration, times, offsets)
+
+
+def _parse_vbri(data, at, frame_start, frame_seconds):
+    """SeekIndex from a VBRI header's table of scaled byte deltas"""
+    import struct
+    _, _, _, total_bytes, frames, entries, scale, entry_size, frames_per_entry = struct.unpack(
+        '>HHHIIHHHH', data[at + 4:at + 26])
+    if not frames or entry_size not in (1, 2, 3, 4):
+        return None
+    times, offsets = [0.0], [frame_start]
+    pos = at + 26
+    for i in range(entries):
+        delta = int.from_bytes(data[pos:pos + entry_size], 'big') * scale
+        pos += entry_size
+        times.append((i + 1) * frames_per_entry * frame_seconds)
+        offsets.append(offsets[-1] + delta)
+    return SeekIndex(None, 'vbri', frames * frame_seconds, times[:-1], offsets[:-1])
+
+
+def _mp4_atoms(f, start, end):
+    """Yield (type, body_start, body_end) for the atoms between start and end"""
+    import struct
+    pos = start
+    while pos + 8 <= end:
+        f.seek(pos)
+        header = f.read(16)
+        size, kind = struct.unpack('>I4s', header[:8])
+        body = pos + 8
+        if size == 1:
+            size = struct.unpack('>Q', header[8:16])[0]
+            body = pos + 16
+        elif size == 0:
+            size = end - pos
+        if size < 8:
+            return
+        yield kind, body, pos + size
+        pos += size
+
+
+def build_mp4_seek_index(file_path):
+    """Index an MP4/M4A audio track by timing each chunk offset from its sample table"""
+    import struct
+
+    def child(f, parent, kind):
+        for atom, body, atom_end in _mp4_atoms(f, parent[0], parent[1]):
+            if atom == kind:
+                return body, atom_end
+        return None
+
+    def table(f, atom, fmt, header=8):
+        f.seek(atom[0])
+        raw = f.read(atom[1] - atom[0])
+        count = struct.unpack('>I', raw[4:8])[0]
+        step = struct.calcsize(fmt)
+        return [struct.unpack(fmt, raw[header + i * step:header + (i + 1) * step]) for i in range(count)]
+
+    with open(file_path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        moov = child(f, (0, size), b'moov')
+        if not moov:
+            return None
+        for trak_atom, body, atom_end in _mp4_atoms(f, moov[0], moov[1]):
+            if trak_atom != b'trak':
+                continue
+            mdia = child(f, (body, atom_end), b'mdia')
+            hdlr = mdia and child(f, mdia, b'hdlr')
+            if not hdlr:
+                continue
+            f.seek(hdlr[0] + 8)
+            if f.read(4) != b'soun':
+                continue
+
+            mdhd = child(f, mdia, b'mdhd')
+            f.seek(mdhd[0])
+            head = f.read(32)
+            if head[0] == 1:
+                timescale, duration = struct.unpack('>IQ', head[20:32])
+            else:
+                timescale, duration = struct.unpack('>II', head[12:20])
+            stbl = child(f, child(f, mdia, b'minf'), b'stbl')
+            stts = table(f, child(f, stbl, b'stts'), '>II')
+            stsc = table(f, child(f, stbl, b'stsc'), '>III')
+            co = child(f, stbl, b'stco')
+            offsets_table = [o[0] for o in (table(f, co, '>I') if co else table(f, child(f, stbl, b'co64'), '>Q'))]
+
+            # Sample index of each chunk's first sample, from the sample-to-chunk runs
+            chunk_first_sample = []
+            sample = 0
+            for i, (first_chunk, per_chunk, _) in enumerate(stsc):
+                last_chunk = stsc[i + 1][0] - 1 if i + 1 < len(stsc) else len(offsets_table)
+                for _ in range(first_chunk, last_chunk + 1):
+                    chunk_first_sample.append(sample)
+                    sample += per_chunk
+
+            # Time of each of those samples, walking the time-to-sample runs in step
+            times, offsets = [], []
+            run, run_left, sample, ticks, next_mark = 0, stts[0][0] if stts else 0, 0, 0, 0.0
+            for chunk, target in enumerate(chunk_first_sample[:len(offsets_table)]):
+                while sample < target and run < len(stts):
+                    step = min(run_left, target - sample)
+                    ticks += step * stts[run][1]
+                    sample += step
+                    run_left -= step
+                    if run_left == 0:
+                        run += 1
+                        run_left = stts[run][0] if run < len(stts) else 0
+                seconds = ticks / float(timescale)
+                if seconds >= next_mark:
+                    times.append(seconds)
+                    offsets.append(offsets_table[chunk])
+                    next_mark = seconds + SEEK_INDEX_INTERVAL
+            return SeekIndex(file_path, 'mp4', duration / float(timescale), times, offsets)
+    return None
+
+
+def seek_sidecar_path(file_path):
+    key = hashlib.sha1(os.path.abspath(file_path).encode('utf-8')).hexdigest()
+    return os.path.join(SEEK_CACHE_DIR, f"{key}.seek")
+
+
+_seek_indexes = {}
+_seek_indexes_lock = threading.Lock()
+
+
+def get_seek_index(file_path, build=True):
+    """
+    Seek index for an MP3/M4A file, built once per file contents and cached in memory
+    and as a sidecar in seek_cache/. Returns None for other formats or unparseable files,
+    and with build=False also when the index would have to be built (a full frame walk).
+    """
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext not in ('.mp3', '.m4a', '.mp4'):
+        return None
+    path = os.path.abspath(file_path)
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    key = (path, st.st_size, st.st_mtime_ns)
+    with _seek_indexes_lock:
+        index = _seek_indexes.pop(key, None)
+        if index is not None:
+            _seek_indexes[key] = index  # move to most-recently-used
+            return index
+
+    sidecar = seek_sidecar_path(path)
+    index = SeekIndex.load(path, sidecar, st.st_size, st.st_mtime_ns)
+    if index is None and not build:
+        return None
+    if index is None:
+        try:
+            index = build_mp3_seek_index(path) if ext == '.mp3' else build_mp4_seek_index(path)
+        except Exception as e:
+            print(f"Seek index build failed for {os.path.basename(path)}: {e}")
+            index = None
+        if index is None:
+            return None
+        index.path = path
+        try:
+            index.save(sidecar, st.st_size, st.st_mtime_ns)
+        except Exception:
+            pass
+
+    with _seek_indexes_lock:
+        _seek_indexes[key] = index
+        while len(_seek_indexes) > SEEK_INDEX_MEMORY_ENTRIES:
+            _seek_indexes.pop(next(iter(_seek_indexes)))
+    return index
+
+
+# ------------------- Conversion Cache -------------------
+CONVERSION_CACHE_DIR = "conversion_cache"
+CONVERSION_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+
+def hash_file_content(file_path, chunk_size=1024 * 1024):
+    """Return the SHA-1 hex digest of a file's contents, or None if it can't be read"""
+    try:
+        digest = hashlib.sha1()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+    except Exception:
+        return None
+
+
+def copy_atomic(src, dst):
+    """
+    Copy src to dst (replacing dst) via a temp file. Cache entries are never
+    hard-linked: mutagen rewrites tags in place, which would leak one track's
+    tags into the shared entry.
+    """
+    tmp = f"{dst}.tmp-{os.getpid()}-{threading.get_ident()}"
+    try:
+        shutil.copyfile(src, tmp)
+        os.replace(tmp, dst)
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+class ConversionCache:
+    """
+    Stores converted audio once per (source content hash, codec, bitrate) so the same
+    source downloaded to both the stream cache and the library is only converted once.
+    Entries are evicted least-recently-used first when the cache exceeds its byte budget.
+    """
+
+    def __init__(self, cache_dir=CONVERSION_CACHE_DIR, max_bytes=CONVERSION_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _entry_path(self, content_hash, codec, bitrate):
+        return os.path.join(self.cache_dir, f"{content_hash}_{bitrate}.{codec}")
+
+    def fetch(self, content_hash, codec, bitrate, output_file):
+        """
+        Materialise a cached conversion at output_file
+
+        Returns:
+            True on a cache hit, False on a miss
+        """
+        entry = self._entry_path(content_hash, codec, bitrate)
+        with self._lock:
+            if not os.path.exists(entry):
+                self.misses += 1
+                return False
+            try:
+                if os.path.abspath(entry) != os.path.abspath(output_file):
+                    copy_atomic(entry, output_file)
+                # Bump mtime so eviction treats this entry as recently used
+                os.utime(entry, None)
+            except Exception:
+                self.misses += 1
+                return False
+            self.hits += 1
+            return True
+
+    def store(self, content_hash, codec, bitrate, output_file):
+        """Add a freshly converted (still untagged) file to the cache and enforce the byte budget"""
+        entry = self._entry_path(content_hash, codec, bitrate)
+        with self._lock:
+            try:
+                copy_atomic(output_file, entry)
+            except Exception:
+                return
+            self._evict()
+
+    def _evict(self):
+        """Remove least-recently-used entries until the cache fits max_bytes"""
+        entries = []
+        total = 0
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                self.evictions += 1
+            except OSError:
+                pass
+
+    def stats(self):
+        """Return hit/miss/eviction counters"""
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+
+_conversion_cache = None
+_conversion_cache_lock = threading.Lock()
+
+
+def get_conversion_cache():
+    """Return the process-wide conversion cache shared by every AudioConverter"""
+    global _conversion_cache
+    with _conversion_cache_lock:
+        if _conversion_cache is None:
+            _conversion_cache = ConversionCache()
+        return _conversion_cache
+
+
+# ------------------- Audio Converter Module -------------------
+class AudioConverter:
+    """Handles audio format conversion with fallback support"""
+
+    def __init__(self, env_detector=None):
+        self.has_pydub = False
+        self.has_ffmpeg = False
+        self.env_detector = env_detector
+        # Playability verdicts keyed by (path, size, mtime) so a file is probed once
+        self._probe_cache = {}
+        self._probe_lock = threading.Lock()
+        self.conversion_cache = get_conversion_cache()
+        self._check_dependencies()
+
+    def _check_dependencies(self):
+        """Check if pydub and ffmpeg are available"""
+        try:
+            from pydub import AudioSegment
+            self.has_pydub = True
+
+            if self.env_detector and self.env_detector.ffmpeg_available:
+                self.has_ffmpeg = True
+                self.ffmpeg_path = self.env_detector.ffmpeg_path
+                AudioSegment.converter = self.ffmpeg_path
+                print(f"Using ffmpeg from environment detector: {self.ffmpeg_path}")
+            else:
+                import subprocess
+                ffmpeg_paths = [
+                    'ffmpeg',
+                    '/data/data/ru.iiec.pydroid3/files/ffmpeg',
+                    '/data/data/ru.iiec.pydroid3/files/aarch64-linux-android/bin/ffmpeg',
+                    '/storage/emulated/0/Download/ffmpeg',
+                ]
+
+                for ffmpeg_path in ffmpeg_paths:
+                    try:
+                        result = subprocess.run([ffmpeg_path, '-version'],
+                                               capture_output=True,
+                                               timeout=2)
+                        if result.returncode == 0:
+                            self.has_ffmpeg = True
+                            self.ffmpeg_path = ffmpeg_path
+                            AudioSegment.converter = ffmpeg_path
+                            break
+                    except Exception:
+                        continue
+        except Exception:
+            pass
+
+    def can_convert(self):
+        """Check if conversion is possible"""
+        return self.has_pydub and self.has_ffmpeg
+
+    def set_ffmpeg_path(self, path, log_callback=None):
+        """
+        Set a custom ffmpeg path for Pydroid 3 or other environments
+
+        Args:
+            path: Path to ffmpeg executable
+            log_callback: Function to call for logging
+
+        Returns:
+            True if ffmpeg is valid at that path, False otherwise
+        """
+        import subprocess
+        try:
+            result = subprocess.run([path, '-version'],
+                                   capture_output=True,
+                                   timeout=2)
+            if result.returncode == 0:
+                self.has_ffmpeg = True
+                self.ffmpeg_path = path
+                from pydub import AudioSegment
+                AudioSegment.converter = path
+                if log_callback:
+                    log_safe(log_callback, f"✅ FFmpeg configured at: {path}")
+                return True
+        except Exception as e:
+            if log_callback:
+                log_safe(log_callback, f"❌ Invalid ffmpeg path: {e}")
+        return False
+
+    def convert_to_mp3(self, input_file, output_file=None, log_callback=None):
+        """
+        Convert audio file to MP3 format
+
+        Args:
+            input_file: Path to input audio file (.m4a, .opus, etc.)
+            output_file: Path for output MP3 file (optional, auto-generated if None)
+            log_callback: Function to call for logging
+
+        Returns:
+            Path to converted MP3 file, or None if conversion failed
+        """
+        if not self.can_convert():
+            if log_callback:
+                log_safe(log_callback, "⚠️ Conversion not available - pydub/ffmpeg not installed")
+            return None
+
+        try:
+            from pydub import AudioSegment
+
+            # Generate output filename if not provided
+            if output_file is None:
+                base_name = os.path.splitext(input_file)[0]
+                output_file = f"{base_name}_converted.mp3"
+
+            # Check if input file exists
+            if not os.path.exists(input_file):
+                if log_callback:
+                    log_safe(log_callback, f"❌ Input file not found: {input_file}")
+                return None
+
+            # Detect input format
+            input_ext = os.path.splitext(input_file)[1].lower()
+            format_map = {
+                '.m4a': 'm4a',
+                '.opus': 'opus',
+                '.ogg': 'ogg',
+                '.webm': 'webm',
+                '.mp4': 'mp4'
+            }
+
+            input_format = format_map.get(input_ext)
+            if not input_format:
+                if log_callback:
+                    log_safe(log_callback, f"⚠️ Unsupported format: {input_ext}")
+                return None
+
+            # Reuse an identical earlier conversion if one is cached
+            bitrate = '192k'
+            content_hash = hash_file_content(input_file)
+            if content_hash and self.conversion_cache.fetch(content_hash, 'mp3', bitrate, output_file):
+                if log_callback:
+                    log_safe(log_callback, f"♻️ Reused cached conversion: {os.path.basename(output_file)}")
+                return output_file
+
+            if log_callback:
+                log_safe(log_callback, f"🔄 Converting {os.path.basename(input_file)} to MP3...")
+
+            # Load and convert audio
+            audio = AudioSegment.from_file(input_file, format=input_format)
+            audio.export(output_file, format='mp3', bitrate=bitrate)
+
+            if content_hash:
+                self.conversion_cache.store(content_hash, 'mp3', bitrate, output_file)
+
+            if log_callback:
+                log_safe(log_callback, f"✅ Converted to: {os.path.basename(output_file)}")
+
+            return output_file
+
+        except Exception as e:
+            if log_callback:
+                log_safe(log_callback, f"❌ Conversion error: {e}")
+            return None
+
+    def test_playback(self, file_path):
+        """
+        Test if a file can be played by SoundLoader
+
+        Args:
+            file_path: Path to audio file
+
+        Returns:
+            True if file can be loaded, False otherwise
+        """
+        try:
+            sound = SoundLoader.load(file_path)
+            if sound:
+                sound.unload()
+                return True
+            return False
+        except Exception:
+            return False
+
+    def test_pygame_playback(self, file_path):
+        """
+        Test if a file can be played using pygame mixer
+
+        Args:
+            file_path: Path to audio file
+
+        Returns:
+            True if file can be loaded by pygame, False otherwise,
+            None if the shared player is busy with another track
+        """
+        try:
+            is_mobile = self.env_detector.is_mobile if self.env_detector else False
+            is_android = self.env_detector.is_android if self.env_detector else False
+            return get_pygame_player(is_mobile=is_mobile, is_android=is_android).test_load(file_path)
+        except Exception:
+            return False
+
+    def _probe_key(self, file_path):
+        """Cache key for a file's playability verdict, or None if the file is missing"""
+        try:
+            st = os.stat(file_path)
+            return (os.path.abspath(file_path), st.st_size, st.st_mtime_ns)
+        except OSError:
+            return None
+
+    def _remember_playability(self, key, verdict):
+        """Store a playability verdict, evicting the oldest entries when full"""
+        if key is None:
+            return
+        with self._probe_lock:
+            self._probe_cache[key] = verdict
+            while len(self._probe_cache) > PROBE_CACHE_MAX_ENTRIES:
+                self._probe_cache.pop(next(iter(self._probe_cache)))
+
+    def probe_playability(self, file_path):
+        """
+        Cheaply decide whether a file is playable by sniffing its codec
+
+        Args:
+            file_path: Path to audio file
+
+        Returns:
+            True if known playable, False if known unplayable,
+            None if the codec is unknown and needs a full decoder load
+        """
+        key = self._probe_key(file_path)
+        if key is None:
+            return False
+
+        with self._probe_lock:
+            if key in self._probe_cache:
+                return self._probe_cache[key]
+
+        playable_codecs = getattr(self.env_detector, 'pygame_codecs', None) or ()
+
+        codec = sniff_audio_codec(file_path)
+        verdict = True if codec is not None and codec in playable_codecs else None
+
+        if verdict is not None:
+            self._remember_playability(key, verdict)
+        return verdict
+
+    def auto_convert_if_needed(self, file_path, log_callback=None):
+        """
+        Automatically convert file to MP3 if it can't be played
+        Tries multiple fallback methods:
+        1. Probe the codec from file headers (cached per path/size/mtime)
+        2. Test with SoundLoader (Kivy default) if the codec is unknown
+        3. Test with Pygame mixer (better codec support on Android/Pydroid 3)
+        4. Convert with ffmpeg if available
+
+        Args:
+            file_path: Path to audio file
+            log_callback: Function to call for logging
+
+        Returns:
+            Path to playable file (original or converted), or None if failed
+        """
+        verdict = self.probe_playability(file_path)
+        if verdict is True:
+            return file_path
+
+        busy = False
+        if verdict is None:
+            key = self._probe_key(file_path)
+
+            # Unknown codec: try to play the file with Kivy's SoundLoader
+            if self.test_playback(file_path):
+                self._remember_playability(key, True)
+                return file_path
+
+            # Then pygame mixer (better codec support on Android/Pydroid 3)
+            pygame_ok = self.test_pygame_playback(file_path)
+            if pygame_ok:
+                self._remember_playability(key, True)
+                if log_callback:
+                    log_safe(log_callback, f"✅ {os.path.basename(file_path)} playable with pygame fallback")
+                return file_path
+            busy = pygame_ok is None
+            if not busy:
+                self._remember_playability(key, False)
+            # A busy shared player leaves playability unknown - convert if we can
+
+        # If both failed and file is in a convertible format, try ffmpeg conversion
+        ext = os.path.splitext(file_path)[1].lower()
+        if ext in ['.m4a', '.opus', '.ogg', '.webm']:
+            if log_callback:
+                log_safe(log_callback, f"⚠️ {os.path.basename(file_path)} cannot be played directly")
+
+            if self.can_convert():
+                converted_file = self.convert_to_mp3(file_path, log_callback=log_callback)
+                if converted_file and os.path.exists(converted_file):
+                    return converted_file
+            else:
+                if log_callback:
+                    log_safe(log_callback, "ℹ️ Audio conversion not available - ffmpeg not found")
+                    log_safe(log_callback, "ℹ️ Note: Pygame fallback will be used for playback")
+
+        # Unverified (player busy) and not converted: let the player try it
+        return file_path if busy else None
+
+
+# ------------------- Configuration -------------------
+CONFIG_FILE = "app_settings.json"
+
+def load_settings():
+    """Load app settings from config file"""
+    try:
+        if os.path.exists(CONFIG_FILE):
+            with open(CONFIG_FILE, 'r') as f:
+                return json.load(f)
+    except Exception:
+        pass
+    return {"mobile_mode": False}
+
+def save_settings(settings):
+    """Save app settings to config file"""
+    try:
+        with open(CONFIG_FILE, 'w') as f:
+            json.dump(settings, f)
+    except Exception:
+        pass
+
+# ------------------- Utility -------------------
+AUDIO_EXTENSIONS = ('.mp3', '.m4a', '.webm', '.opus', '.ogg')
+
+
+def sanitize_filename(name):
+    return "".join(c if c.isalnum() or c in " ._-()" else "_" for c in name)
+
+def list_library_files(directory="."):
+    """Sorted audio file names in the library directory"""
+    return sorted(f for f in os.listdir(directory) if f.lower().endswith(AUDIO_EXTENSIONS))
+
+def log_safe(log_func, msg):
+    # Thread-safe loggers (see thread_safe) batch their own UI updates
+    if getattr(log_func, 'thread_safe', False):
+        try:
+            log_func(msg)
+        except Exception:
+            pass
+        return
+    # Schedule log update on the main thread (Kivy)
+    try:
+        Clock.schedule_once(lambda dt: log_func(msg))
+    except Exception:
+        # If scheduling fails for any reason, attempt direct call (best-effort)
+        try:
+            log_func(msg)
+        except Exception:
+            pass
+
+def format_time(seconds):
+    """Convert seconds to MM:SS format"""
+    if seconds is None or seconds < 0:
+        return "00:00"
+    minutes = int(seconds // 60)
+    seconds = int(seconds % 60)
+    return f"{minutes:02d}:{seconds:02d}"
+
+def detect_speed():
+    """Simulate internet speed detection (stub)."""
+    try:
+        r = requests.get("https://www.google.com", timeout=3)
+        if r.elapsed.total_seconds() < 0.5:
+            return "high"
+        elif r.elapsed.total_seconds() < 1.5:
+            return "medium"
+        else:
+            return "low"
+    except Exception:
+        return "medium"
+
+
+class CancelToken:
+    """Cancellable handle for a background job whose result may be superseded"""
+
+    def __init__(self, payload=None):
+        self.payload = payload
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+
+def thread_safe(func):
+    """Mark a log function as callable from any thread, so log_safe calls it directly"""
+    func.thread_safe = True
+    return func
+
+# ------------------- Activity Log -------------------
+LOG_MAX_LINES = 50
+LOG_FILE = "activity.log"
+LOG_FILE_MAX_BYTES = 1024 * 1024
+
+
+class LogFileSink:
+    """Appends the full log history to a file from a background thread, rotating it at LOG_FILE_MAX_BYTES"""
+
+    def __init__(self, path=LOG_FILE):
+        self.path = path
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def write(self, message):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        self._queue.put(f"{time.strftime('%Y-%m-%d %H:%M:%S')} {message}\n")
+
+    def close(self, timeout=1.0):
+        """Write out queued lines and stop the writer thread"""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            # Drain everything queued so a burst costs one open/write
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            closing = None in batch
+            lines = [line for line in batch if line is not None]
+            try:
+                if os.path.exists(self.path) and os.path.getsize(self.path) > LOG_FILE_MAX_BYTES:
+                    os.replace(self.path, f"{self.path}.1")
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.writelines(lines)
+            except Exception:
+                pass
+            if closing:
+                return
+
+
+class LogBuffer:
+    """
+    The most recent LOG_MAX_LINES log lines in a fixed-size ring. write() is safe
+    from any thread; the on-screen log is re-rendered at most once per frame no
+    matter how many lines arrive, and every line also goes to the file sink.
+    """
+
+    def __init__(self, render, max_lines=LOG_MAX_LINES, sink=None):
+        self.lines = deque(maxlen=max_lines)
+        self.render = render
+        self.sink = sink
+        self.total_lines = 0
+        self.renders = 0
+        self._scheduled = False
+        self._lock = threading.Lock()
+
+    def write(self, message):
+        with self._lock:
+            self.lines.append(message)
+            self.total_lines += 1
+            schedule = not self._scheduled
+            self._scheduled = True
+        if self.sink:
+            self.sink.write(message)
+        if schedule:
+            try:
+                Clock.schedule_once(self._flush)
+            except Exception:
+                self._flush()
+
+    def _flush(self, dt=0):
+        with self._lock:
+            self._scheduled = False
+            text = '\n'.join(self.lines) + '\n'
+        self.renders += 1
+        try:
+            self.render(text)
+        except Exception:
+            pass
+
+# ------------------- UI Update Bus -------------------
+class UIUpdateBus:
+    """
+    Latest-value-wins mailbox from worker threads to the UI. Workers publish
+    state under a key ('download_progress', 'queue', ...); once per frame the
+    main thread applies only the newest update for each key, so progress ticks
+    that arrive faster than frames never pile up in the Clock queue.
+    """
+
+    def __init__(self):
+        self._pending = {}   # key -> (callback, args), in first-published order
+        self._scheduled = False
+        self._lock = threading.Lock()
+        self.published = 0
+        self.delivered = 0
+        self.superseded = 0
+
+    def publish(self, key, callback, *args):
+        """Queue callback(*args) for the next frame, replacing any pending update for key"""
+        with self._lock:
+            if key in self._pending:
+                self.superseded += 1
+            self._pending[key] = (callback, args)
+            self.published += 1
+            schedule = not self._scheduled
+            self._scheduled = True
+        if schedule:
+            Clock.schedule_once(self._drain)
+
+    def _drain(self, dt=0):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._scheduled = False
+        for key, (callback, args) in pending.items():
+            try:
+                callback(*args)
+            except Exception as e:
+                print(f"⚠️ UI update '{key}' failed: {e}")
+        self.delivered += len(pending)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'published': self.published,
+                'delivered': self.delivered,
+                'superseded': self.superseded,
+                'pending': len(self._pending),
+            }
+
+
+_shared_ui_update_bus = None
+
+
+def get_ui_update_bus():
+    """Return the process-wide UI update bus"""
+    global _shared_ui_update_bus
+    with _shared_backend_lock:
+        if _shared_ui_update_bus is None:
+            _shared_ui_update_bus = UIUpdateBus()
+        return _shared_ui_update_bus
+
+# ------------------- Cover Art Helper -------------------
+COVER_CACHE_DIR = "cover_cache"
+COVER_CACHE_MAX_BYTES = 50 * 1024 * 1024
+
+
+class CoverStore:
+    """
+    Content-addressed cover image cache. Each distinct image is stored once as
+    <sha1>.<ext>; a reverse index maps track keys (file paths, thumbnail URLs)
+    to the image hash, and an image is deleted when its last track is
+    released. Past COVER_CACHE_MAX_BYTES the least recently used images are
+    evicted along with their track mappings.
+    """
+
+    def __init__(self, cache_dir=COVER_CACHE_DIR, max_bytes=COVER_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(cache_dir, "index.json")
+        self.covers = OrderedDict()   # hash -> {'file', 'size', 'refs': [track keys]}, LRU first
+        self.tracks = {}              # track key -> hash
+        self.bytes = 0
+        self._lock = threading.RLock()
+        self._save_timer = None
+        os.makedirs(cache_dir, exist_ok=True)
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            for digest, cover in index['covers']:
+                if os.path.exists(os.path.join(cache_dir, cover['file'])):
+                    self.covers[digest] = cover
+                    self.bytes += cover['size']
+            self.tracks = {key: digest for key, digest in index['tracks'].items() if digest in self.covers}
+        except Exception:
+            pass
+        # Drop anything the index doesn't know, e.g. per-track files from older versions
+        known = {cover['file'] for cover in self.covers.values()} | {"index.json"}
+        for name in os.listdir(cache_dir):
+            if name not in known:
+                try:
+                    os.remove(os.path.join(cache_dir, name))
+                except OSError:
+                    pass
+
+    def path_for(self, track_key):
+        """Cached cover path for a track, or None; no tag parsing or file I/O"""
+        with self._lock:
+            digest = self.tracks.get(track_key)
+            if digest is None:
+                return None
+            self.covers.move_to_end(digest)
+            return os.path.join(self.cache_dir, self.covers[digest]['file'])
+
+    def store(self, track_key, data):
+        """Cache image bytes for a track, sharing the file with identical images"""
+        digest = hashlib.sha1(data).hexdigest()
+        ext = 'png' if data[:8] == b'\x89PNG\r\n\x1a\n' else 'jpg'
+        with self._lock:
+            if self.tracks.get(track_key) not in (None, digest):
+                self._release_locked(track_key)
+            cover = self.covers.get(digest)
+            if cover is None:
+                cover = {'file': f"{digest}.{ext}", 'size': len(data), 'refs': []}
+                tmp = os.path.join(self.cache_dir, f"{cover['file']}.tmp")
+                with open(tmp, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp, os.path.join(self.cache_dir, cover['file']))
+                self.covers[digest] = cover
+                self.bytes += cover['size']
+            if track_key not in cover['refs']:
+                cover['refs'].append(track_key)
+            self.tracks[track_key] = digest
+            self.covers.move_to_end(digest)
+            while self.bytes > self.max_bytes and len(self.covers) > 1:
+                self._evict_locked(next(iter(self.covers)))
+            path = os.path.join(self.cache_dir, cover['file'])
+        self.save_soon()
+        return path
+
+    def release(self, track_key):
+        """Forget a track's cover, deleting the image once no track refers to it"""
+        with self._lock:
+            released = self._release_locked(track_key)
+        if released:
+            self.save_soon()
+
+    def _release_locked(self, track_key):
+        digest = self.tracks.pop(track_key, None)
+        if digest is None:
+            return False
+        cover = self.covers[digest]
+        if track_key in cover['refs']:
+            cover['refs'].remove(track_key)
+        if not cover['refs']:
+            self._evict_locked(digest)
+        return True
+
+    def _evict_locked(self, digest):
+        cover = self.covers.pop(digest)
+        self.bytes -= cover['size']
+        for key in cover['refs']:
+            self.tracks.pop(key, None)
+        try:
+            os.remove(os.path.join(self.cache_dir, cover['file']))
+        except OSError:
+            pass
+
+    def save(self):
+        """Write the index atomically"""
+        with self._lock:
+            self._save_timer = None
+            data = json.dumps({'covers': list(self.covers.items()), 'tracks': self.tracks})
+        try:
+            tmp = f"{self.index_path}.tmp"
+            with open(tmp, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(tmp, self.index_path)
+        except Exception as e:
+            print(f"Error saving cover index: {e}")
+
+    def save_soon(self, delay=2.0):
+        """Coalesce bursts of updates into a single write"""
+        with self._lock:
+            if self._save_timer:
+                return
+            self._save_timer = threading.Timer(delay, self.save)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def stats(self):
+        with self._lock:
+            return {'covers': len(self.covers), 'tracks': len(self.tracks), 'bytes': self.bytes}
+
+
+_cover_store = None
+
+
+def get_cover_store():
+    """Return the process-wide cover store"""
+    global _cover_store
+    with _shared_backend_lock:
+        if _cover_store is None:
+            _cover_store = CoverStore()
+        return _cover_store
+
+
+def extract_cover_art(file_path):
+    """
+    Cover image path for an audio file, keyed by its absolute path in the cover
+    store; tags are only parsed on the first request. Returns None without a cover.
+    """
+    key = os.path.abspath(file_path)
+    store = get_cover_store()
+    cached = store.path_for(key)
+    if cached:
+        return cached
+    data = read_cover_bytes(file_path)
+    return store.store(key, data) if data else None
+
+
+def download_cover_art(url):
+    """Download cover art from URL into the cover store; returns the cached image path"""
+    store = get_cover_store()
+    cached = store.path_for(url)
+    if cached:
+        return cached
+    try:
+        response = requests.get(url, timeout=10)
+        if response.status_code == 200 and response.content:
+            return store.store(url, response.content)
+    except Exception:
+        pass
+
+    return None
+
+
+COVER_TEXTURE_SIZE = 512                   # longest side of a decoded cover, in pixels
+COVER_TEXTURE_CACHE_BYTES = 32 * 1024 * 1024
+
+
+def read_cover_bytes(file_path):
+    """Return the embedded cover image bytes of an MP3 or M4A file, or None"""
+    try:
+        if file_path.lower().endswith(('.m4a', '.mp4')):
+            covers = MP4(file_path).tags.get('covr') or []
+            return bytes(covers[0]) if covers else None
+        for tag in ID3(file_path).values():
+            if isinstance(tag, APIC):
+                return tag.data
+    except Exception:
+        pass
+    return None
+
+
+def decode_cover(data, max_size=COVER_TEXTURE_SIZE):
+    """
+    Decode and downscale cover image bytes; runs on a worker thread
+
+    Returns:
+        ('rgba', (width, height), pixels) with Pillow, ('encoded', ext, data)
+        for the UI thread to decode without it, or None
+    """
+    if not data:
+        return None
+    if not PIL_AVAILABLE:
+        ext = 'png' if data[:8] == b'\x89PNG\r\n\x1a\n' else 'jpg'
+        return ('encoded', ext, data)
+    try:
+        img = PILImage.open(BytesIO(data))
+        img.draft('RGB', (max_size, max_size))   # JPEG: decode at reduced scale
+        img = img.convert('RGBA')
+        img.thumbnail((max_size, max_size))
+        return ('rgba', img.size, img.tobytes())
+    except Exception:
+        return None
+
+
+class CoverTextureCache:
+    """
+    Size-bounded LRU of cover textures keyed by track ID. Covers are read
+    (or downloaded) and decoded on a worker thread; only the texture upload
+    happens on the UI thread. Files read without embedded art are cached as
+    None (at a nominal size, so they share the byte budget); a failed
+    download is not cached and is retried on the next request.
+    """
+
+    NO_COVER_BYTES = 1024   # budget charged for a cached "no cover" entry
+
+    def __init__(self, max_bytes=COVER_TEXTURE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._textures = OrderedDict()   # key -> (texture or None, nbytes)
+        self._waiting = {}               # key -> [callback] for in-flight decodes
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return (True, texture_or_None) on a hit, (False, None) on a miss"""
+        with self._lock:
+            if key in self._textures:
+                self._textures.move_to_end(key)
+                return True, self._textures[key][0]
+        return False, None
+
+    def request(self, key, callback, file_path=None, url=None):
+        """Call callback(texture_or_None) on the UI thread; immediately on a cache hit"""
+        with self._lock:
+            hit = key in self._textures
+            if hit:
+                self._textures.move_to_end(key)
+                texture = self._textures[key][0]
+                self.hits += 1
+            else:
+                self.misses += 1
+        if hit:
+            callback(texture)
+            return
+        with self._lock:
+            if key in self._waiting:
+                self._waiting[key].append(callback)
+                return
+            self._waiting[key] = [callback]
+            if self._executor is None:
+                from concurrent.futures import ThreadPoolExecutor
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cover")
+        self._executor.submit(self._load, key, file_path, url)
+
+    def _load(self, key, file_path, url):
+        decoded = None
+        # Only a file read that found no art is a lasting answer; network failures are retried
+        cacheable = False
+        try:
+            file_read = bool(file_path) and os.path.exists(file_path)
+            cover_path = extract_cover_art(file_path) if file_read else None
+            if cover_path:
+                cacheable = True
+            elif url:
+                cover_path = download_cover_art(url)
+                cacheable = cover_path is not None
+            else:
+                cacheable = file_read
+            data = None
+            if cover_path:
+                with open(cover_path, 'rb') as f:
+                    data = f.read()
+            decoded = decode_cover(data)
+        except Exception:
+            cacheable = False
+        Clock.schedule_once(lambda dt: self._finish(key, decoded, cacheable))
+
+    def _finish(self, key, decoded, cacheable=True):
+        """UI thread: upload the decoded pixels and hand the texture to the waiters"""
+        texture = None
+        try:
+            if decoded and decoded[0] == 'rgba':
+                from kivy.graphics.texture import Texture
+                texture = Texture.create(size=decoded[1], colorfmt='rgba')
+                texture.blit_buffer(decoded[2], colorfmt='rgba', bufferfmt='ubyte')
+                texture.flip_vertical()
+            elif decoded:
+                texture = CoreImage(BytesIO(decoded[2]), ext=decoded[1]).texture
+        except Exception:
+            texture = None
+        if texture is not None or cacheable:
+            self.put(key, texture)
+
+        with self._lock:
+            callbacks = self._waiting.pop(key, [])
+        for callback in callbacks:
+            try:
+                callback(texture)
+            except Exception as e:
+                print(f"⚠️ Cover art callback failed: {e}")
+
+    def put(self, key, texture):
+        nbytes = texture.width * texture.height * 4 if texture is not None else self.NO_COVER_BYTES
+        with self._lock:
+            old = self._textures.pop(key, None)
+            if old:
+                self.bytes -= old[1]
+            self._textures[key] = (texture, nbytes)
+            self.bytes += nbytes
+            while self.bytes > self.max_bytes and len(self._textures) > 1:
+                _, (_, evicted) = self._textures.popitem(last=False)
+                self.bytes -= evicted
+
+    def discard(self, key):
+        with self._lock:
+            old = self._textures.pop(key, None)
+            if old:
+                self.bytes -= old[1]
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._textures), 'bytes': self.bytes,
+                    'hits': self.hits, 'misses': self.misses}
+
+
+_shared_cover_cache = None
+
+
+def get_cover_texture_cache():
+    """Return the process-wide cover texture cache"""
+    global _shared_cover_cache
+    with _shared_backend_lock:
+        if _shared_cover_cache is None:
+            _shared_cover_cache = CoverTextureCache()
+        return _shared_cover_cache
+
+
+# ------------------- Thumbnail Atlas -------------------
+THUMB_SIZE = 48
+THUMB_ATLAS_WIDTH = 2048
+THUMB_ATLAS_FILE = "cover_thumbs.atlas"
+THUMB_INDEX_FILE = "cover_thumbs.json"
+THUMB_COLUMNS = THUMB_ATLAS_WIDTH // THUMB_SIZE
+THUMB_PAGE_BANDS = 4096 // THUMB_SIZE   # keeps each page texture within common GPU limits
+THUMB_PER_PAGE = THUMB_COLUMNS * THUMB_PAGE_BANDS
+THUMB_BAND_BYTES = THUMB_ATLAS_WIDTH * THUMB_SIZE * 3
+THUMB_PAGE_BYTES = THUMB_BAND_BYTES * THUMB_PAGE_BANDS
+
+
+def make_thumbnail(data, size=THUMB_SIZE):
+    """Crop and downscale cover bytes to a size x size RGB tile, bottom row first"""
+    from PIL import ImageOps
+    img = PILImage.open(BytesIO(data))
+    img.draft('RGB', (size * 2, size * 2))
+    img = ImageOps.fit(img.convert('RGB'), (size, size))
+    # Texture rows run bottom-up, so store the tile flipped
+    return img.transpose(PILImage.FLIP_TOP_BOTTOM).tobytes()
+
+
+class ThumbnailAtlas:
+    """
+    Cover thumbnails for the whole library packed into one memory-mappable file.
+
+    The file is raw RGB laid out exactly as texture pages: each page is
+    THUMB_ATLAS_WIDTH pixels wide and grows by bands of THUMB_SIZE rows, with
+    THUMB_COLUMNS tiles per band. A JSON index maps each file to its slot, so
+    showing artwork for any number of rows costs one texture upload per page
+    and no per-row file I/O. Thumbnails are extracted on a background thread
+    and only redone when a file's size or mtime changes.
+    """
+
+    def __init__(self, path=THUMB_ATLAS_FILE, index_path=THUMB_INDEX_FILE):
+        self.path = path
+        self.index_path = index_path
+        self.on_updated = None
+        self.entries = {}   # abs path -> {'slot': int (-1: no cover), 'size': int, 'mtime_ns': int}
+        self.free_slots = []
+        self.next_slot = 0
+        self._pending = deque()
+        self._pages = {}     # page number -> Texture
+        self._regions = {}   # slot -> Texture region
+        self._thread = None
+        self._current = None   # file _run is extracting; cleared by remove() to void the result
+        self._lock = threading.Lock()
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            self.entries = index['entries']
+            self.free_slots = index['free_slots']
+            self.next_slot = index['next_slot']
+        except Exception:
+            pass
+
+    def available(self):
+        return PIL_AVAILABLE
+
+    def update(self, files):
+        """Queue files whose thumbnail is missing or stale and extract them in the background"""
+        if not self.available():
+            return
+        with self._lock:
+            self._pending.extend(os.path.abspath(f) for f in files)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def remove(self, file_path):
+        """Forget a deleted file and reuse its slot"""
+        with self._lock:
+            key = os.path.abspath(file_path)
+            entry = self.entries.pop(key, None)
+            if self._current == key:
+                self._current = None
+            if entry and entry['slot'] >= 0:
+                self.free_slots.append(entry['slot'])
+                self._regions.pop(entry['slot'], None)
+        if entry:
+            self.save()
+
+    def _run(self):
+        if not os.path.exists(self.path):
+            open(self.path, 'wb').close()
+        while True:
+            changed = 0
+            slots = set()   # tiles rewritten in this pass
+            with open(self.path, 'r+b') as f:
+                while True:
+                    with self._lock:
+                        if not self._pending:
+                            break
+                        key = self._pending.popleft()
+                        entry = self.entries.get(key)
+                        self._current = key
+                    try:
+                        st = os.stat(key)
+                    except OSError:
+                        continue
+                    if entry and entry['size'] == st.st_size and entry['mtime_ns'] == st.st_mtime_ns:
+                        continue
+
+                    pixels = None
+                    data = read_cover_bytes(key)
+                    if data:
+                        try:
+                            pixels = make_thumbnail(data)
+                        except Exception:
+                            pixels = None
+
+                    with self._lock:
+                        # remove() ran meanwhile: the old slot may already be free (or reused)
+                        if self._current != key or self.entries.get(key) is not entry:
+                            continue
+                        self._current = None
+                        slot = entry['slot'] if entry else -1
+                        if pixels and slot < 0:
+                            slot = self.free_slots.pop() if self.free_slots else self.next_slot
+                            self.next_slot = max(self.next_slot, slot + 1)
+                        elif not pixels and slot >= 0:
+                            self.free_slots.append(slot)
+                            slot = -1
+                        self.entries[key] = {'slot': slot, 'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+                    if pixels:
+                        self._write_tile(f, slot, pixels)
+                        slots.add(slot)
+                    changed += 1
+
+            if changed:
+                self.save()
+                if self.on_updated:
+                    self.on_updated(slots)
+
+            # update() only starts a thread when none is registered, so pick up
+            # anything queued while saving before this one exits
+            with self._lock:
+                self._current = None
+                if not self._pending:
+                    self._thread = None
+                    return
+
+    @staticmethod
+    def _tile_offset(slot):
+        page, i = divmod(slot, THUMB_PER_PAGE)
+        band, column = divmod(i, THUMB_COLUMNS)
+        return page * THUMB_PAGE_BYTES + band * THUMB_BAND_BYTES + column * THUMB_SIZE * 3
+
+    def _write_tile(self, f, slot, pixels):
+        offset = self._tile_offset(slot)
+        band_end = offset - (offset % THUMB_BAND_BYTES) + THUMB_BAND_BYTES
+        f.seek(0, os.SEEK_END)
+        if f.tell() < band_end:
+            f.truncate(band_end)
+        row_bytes = THUMB_SIZE * 3
+        for row in range(THUMB_SIZE):
+            f.seek(offset + row * THUMB_ATLAS_WIDTH * 3)
+            f.write(pixels[row * row_bytes:(row + 1) * row_bytes])
+        f.flush()
+
+    def save(self):
+        """Write the index atomically"""
+        with self._lock:
+            data = json.dumps({'entries': self.entries, 'free_slots': self.free_slots,
+                               'next_slot': self.next_slot})
+        try:
+            tmp = f"{self.index_path}.tmp"
+            with open(tmp, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(tmp, self.index_path)
+        except Exception as e:
+            print(f"Error saving thumbnail index: {e}")
+
+    def load_textures(self):
+        """UI thread: map the atlas file and upload each page as one texture"""
+        import mmap
+        from kivy.graphics.texture import Texture
+        pages = {}
+        try:
+            with open(self.path, 'rb') as f:
+                length = os.fstat(f.fileno()).st_size
+                if length:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                        for page in range((length + THUMB_PAGE_BYTES - 1) // THUMB_PAGE_BYTES):
+                            start = page * THUMB_PAGE_BYTES
+                            end = min(length, start + THUMB_PAGE_BYTES)
+                            bands = (end - start) // THUMB_BAND_BYTES
+                            if not bands:
+                                continue
+                            texture = Texture.create(size=(THUMB_ATLAS_WIDTH, bands * THUMB_SIZE), colorfmt='rgb')
+                            texture.blit_buffer(mm[start:start + bands * THUMB_BAND_BYTES],
+                                                colorfmt='rgb', bufferfmt='ubyte')
+                            pages[page] = texture
+        except Exception as e:
+            print(f"⚠️ Could not load thumbnail atlas: {e}")
+        with self._lock:
+            self._pages = pages
+            self._regions = {}
+
+    def blit_tiles(self, slots):
+        """
+        UI thread: copy rewritten tiles into the page textures already uploaded.
+        Falls back to a full load_textures() when a tile lands on a page or band
+        the textures don't cover yet.
+        """
+        row_bytes = THUMB_SIZE * 3
+        try:
+            with open(self.path, 'rb') as f:
+                for slot in slots:
+                    page, i = divmod(slot, THUMB_PER_PAGE)
+                    band, column = divmod(i, THUMB_COLUMNS)
+                    with self._lock:
+                        texture = self._pages.get(page)
+                    if texture is None or (band + 1) * THUMB_SIZE > texture.height:
+                        self.load_textures()
+                        return
+                    offset = self._tile_offset(slot)
+                    rows = []
+                    for row in range(THUMB_SIZE):
+                        f.seek(offset + row * THUMB_ATLAS_WIDTH * 3)
+                        rows.append(f.read(row_bytes))
+                    texture.blit_buffer(b''.join(rows), pos=(column * THUMB_SIZE, band * THUMB_SIZE),
+                                        size=(THUMB_SIZE, THUMB_SIZE), colorfmt='rgb', bufferfmt='ubyte')
+        except Exception as e:
+            print(f"⚠️ Could not update thumbnail atlas: {e}")
+
+    def texture_for(self, file_path):
+        """Thumbnail texture region for a library file, or None"""
+        with self._lock:
+            entry = self.entries.get(os.path.abspath(file_path))
+            if not entry or entry['slot'] < 0:
+                return None
+            slot = entry['slot']
+            region = self._regions.get(slot)
+            if region is None:
+                page, i = divmod(slot, THUMB_PER_PAGE)
+                band, column = divmod(i, THUMB_COLUMNS)
+                texture = self._pages.get(page)
+                if texture is None or (band + 1) * THUMB_SIZE > texture.height:
+                    return None
+                region = texture.get_region(column * THUMB_SIZE, band * THUMB_SIZE, THUMB_SIZE, THUMB_SIZE)
+                self._regions[slot] = region
+            return region
+
+
+# ------------------- Metadata -------------------
+def embed_metadata(file_path, metadata, log_callback):
+    """
+    Safely embed metadata for both MP3 (ID3) and M4A (MP4) files.
+    `log_callback` should be a function that accepts one string argument.
+    """
+    try:
+        file_ext = os.path.splitext(file_path)[1].lower()
+
+        # Handle M4A files
+        if file_ext == '.m4a':
+            try:
+                audio = MP4(file_path)
+                audio['\xa9nam'] = metadata.get("title", "Unknown Title")
+                audio['\xa9ART'] = metadata.get("uploader", "Unknown Artist")
+                audio['\xa9alb'] = metadata.get("album", "Streamed Playlist")
+                if metadata.get("id"):
+                    from mutagen.mp4 import MP4FreeForm
+                    audio[_MP4_FREEFORM + 'source_id'] = [MP4FreeForm(str(metadata.get("id")).encode('utf-8'))]
+
+                # Add cover art for M4A
+                if metadata.get("thumbnail"):
+                    try:
+                        resp = requests.get(metadata.get("thumbnail"), timeout=10)
+                        if resp.status_code == 200:
+                            from mutagen.mp4 import MP4Cover
+                            audio['covr'] = [MP4Cover(resp.content, imageformat=MP4Cover.FORMAT_JPEG)]
+                    except Exception:
+                        pass
+
+                audio.save(file_path)
+                log_safe(log_callback, "✅ Metadata embedded (M4A).")
+            except Exception as e:
+                log_safe(log_callback, f"⚠️ Error saving M4A tags: {e}")
+            return
+
+        # Handle MP3 files
+        audio = None
+        # Try to load existing EasyID3 tags; if none exist, attempt to create them safely
+        try:
+            audio = EasyID3(file_path)
+        except Exception:
+            try:
+                # Attempt to add ID3 tags using MP3 wrapper then reopen with EasyID3
+                from mutagen.mp3 import MP3
+                mp3 = MP3(file_path)
+                try:
+                    mp3.add_tags()
+                except Exception:
+                    pass
+                audio = EasyID3(file_path)
+            except Exception:
+                log_safe(log_callback, "⚠️ Could not create ID3 tags; continuing without EasyID3 metadata.")
+                audio = None
+
+        if audio is not None:
+            try:
+                audio["title"] = metadata.get("title", "Unknown Title")
+                audio["artist"] = metadata.get("uploader", "Unknown Artist")
+                audio["album"] = metadata.get("album", "Streamed Playlist")
+                if metadata.get("id"):
+                    audio["source_id"] = str(metadata.get("id"))
+                audio.save(file_path)
+                log_safe(log_callback, "✅ Metadata embedded (MP3).")
+            except Exception as e:
+                log_safe(log_callback, f"⚠️ Error saving EasyID3 tags: {e}")
+
+        # Handle thumbnail separately using ID3 APIC frames for MP3
+        if metadata.get("thumbnail"):
+            try:
+                resp = requests.get(metadata.get("thumbnail"), timeout=10)
+                if resp.status_code == 200:
+                    img_data = resp.content
+                else:
+                    img_data = None
+            except Exception:
+                img_data = None
+
+            try:
+                id3 = None
+                try:
+                    id3 = ID3(file_path)
+                except Exception:
+                    # Create ID3 header if missing
+                    try:
+                        id3 = ID3()
+                    except Exception:
+                        id3 = None
+
+                if id3 is not None and img_data:
+                    try:
+                        id3.delall("APIC")
+                    except Exception:
+                        pass
+                    id3.add(APIC(
+                        encoding=3,
+                        mime="image/jpeg",
+                        type=3,
+                        desc="Cover",
+                        data=img_data
+                    ))
+                    id3.save(file_path)
+                    log_safe(log_callback, "🖼️ Embedded thumbnail.")
+            except Exception as e:
+                log_safe(log_callback, f"⚠️ Could not embed thumbnail: {e}")
+
+    except Exception as e:
+        log_safe(log_callback, f"⚠️ Error embedding metadata: {e}")
+
+
+def get_metadata(file_path):
+    """Extract metadata from audio file, from the library index when it is current"""
+    track = get_library_index().get(file_path)
+    if not track:
+        try:
+            track = read_track_info(file_path)
+        except Exception:
+            track = {}
+    return {
+        'title': track.get('title') or os.path.basename(file_path),
+        'artist': track.get('artist') or 'Unknown Artist',
+        'album': track.get('album') or 'Unknown Album',
+        'duration': track.get('duration'),
+    }
+
+
+# Analysis index fields mirrored into file tags: field -> (tag name, text format)
+ANALYSIS_TAGS = {
+    'replaygain_gain': ('replaygain_track_gain', '{:+.2f} dB'),
+    'peak': ('replaygain_track_peak', '{:.6f}'),
+    'trim_start': ('trim_start', '{:.3f}'),
+    'trim_end': ('trim_end', '{:.3f}'),
+}
+_MP4_FREEFORM = '----:com.apple.iTunes:'
+
+# EasyID3 knows the ReplayGain keys; the trim offsets and source ID are stored as TXXX frames
+for _key in ('trim_start', 'trim_end', 'source_id'):
+    try:
+        EasyID3.RegisterTXXXKey(_key, _key.upper())
+    except Exception:
+        pass
+
+
+def embed_analysis_tags(file_path, fields):
+    """
+    Write analysis results (ReplayGain gain/peak, silence trim offsets) as tags:
+    ID3 TXXX frames, MP4 freeform atoms or Vorbis comments
+
+    Returns:
+        True if the tags were saved, False if the format isn't supported or saving failed
+    """
+    values = {tag: fmt.format(fields[field]) for field, (tag, fmt) in ANALYSIS_TAGS.items()
+              if fields.get(field) is not None}
+    if not values:
+        return False
+    # Don't rewrite (and re-date) a file whose tags already match, e.g. hard-linked duplicates
+    existing = read_analysis_tags(file_path)
+    if all(field in existing and fmt.format(existing[field]) == values[tag]
+           for field, (tag, fmt) in ANALYSIS_TAGS.items() if tag in values):
+        return True
+    # Tags are rewritten in place, so a file sharing its inode (a conversion cache entry
+    # linked by older versions, or a linked duplicate) would change under its other names
+    try:
+        if os.stat(file_path).st_nlink > 1:
+            return False
+    except OSError:
+        return False
+    file_ext = os.path.splitext(file_path)[1].lower()
+    try:
+        if file_ext == '.mp3':
+            try:
+                audio = EasyID3(file_path)
+            except Exception:
+                from mutagen.mp3 import MP3
+                mp3 = MP3(file_path)
+                mp3.add_tags()
+                mp3.save()
+                audio = EasyID3(file_path)
+            for tag, text in values.items():
+                audio[tag] = text
+            audio.save(file_path)
+        elif file_ext == '.m4a':
+            from mutagen.mp4 import MP4FreeForm
+            audio = MP4(file_path)
+            for tag, text in values.items():
+                audio[_MP4_FREEFORM + tag] = [MP4FreeForm(text.encode('utf-8'))]
+            audio.save(file_path)
+        elif file_ext in ('.ogg', '.opus'):
+            import mutagen
+            audio = mutagen.File(file_path)
+            if audio is None:
+                return False
+            for tag, text in values.items():
+                audio[tag.upper()] = [text]
+            audio.save()
+        else:
+            return False
+        return True
+    except Exception:
+        return False
+
+
+def read_analysis_tags(file_path):
+    """
+    Read analysis tags written by this app (ReplayGain tags may also come from other taggers)
+
+    Returns:
+        Dict of the ANALYSIS_TAGS fields present in the file, as floats
+    """
+    def parse(value):
+        if isinstance(value, (list, tuple)):
+            value = value[0] if value else None
+        if isinstance(value, bytes):
+            value = value.decode('utf-8', 'ignore')
+        if value is None:
+            return None
+        return float(str(value).lower().replace('db', '').strip())
+
+    file_ext = os.path.splitext(file_path)[1].lower()
+    try:
+        if file_ext == '.mp3':
+            audio = EasyID3(file_path)
+            lookup = lambda tag: audio.get(tag)
+        elif file_ext == '.m4a':
+            audio = MP4(file_path)
+            lookup = lambda tag: audio.get(_MP4_FREEFORM + tag)
+        elif file_ext in ('.ogg', '.opus'):
+            import mutagen
+            audio = mutagen.File(file_path)
+            tags = (audio.tags if audio is not None else None) or {}
+            lookup = lambda tag: tags.get(tag.upper())
+        else:
+            return {}
+    except Exception:
+        return {}
+
+    fields = {}
+    for field, (tag, _) in ANALYSIS_TAGS.items():
+        try:
+            value = parse(lookup(tag))
+        except Exception:
+            value = None
+        if value is not None:
+            fields[field] = value
+    return fields
+
+
+# ------------------- Library Index -------------------
+LIBRARY_INDEX_FILE = "library.db"
+LIBRARY_INDEX_COLUMNS = ('title', 'artist', 'album', 'duration', 'codec', 'bitrate',
+                         'size', 'mtime_ns', 'source_id', 'cover_hash')
+
+
+def read_track_info(file_path):
+    """Read tags, stream info and a cover hash for the library index in one mutagen parse"""
+    from mutagen import File
+    from mutagen.mp4 import MP4Tags
+    st = os.stat(file_path)
+    info = dict.fromkeys(LIBRARY_INDEX_COLUMNS)
+    info.update(size=st.st_size, mtime_ns=st.st_mtime_ns, codec=sniff_audio_codec(file_path))
+    try:
+        audio = File(file_path)
+    except Exception:
+        audio = None
+    if audio is None:
+        return info
+
+    if getattr(audio, 'info', None) is not None:
+        info['duration'] = getattr(audio.info, 'length', None)
+        info['bitrate'] = getattr(audio.info, 'bitrate', None) or None
+
+    def first(value):
+        if isinstance(value, (list, tuple)):
+            value = value[0] if value else None
+        if isinstance(value, bytes):
+            value = value.decode('utf-8', 'ignore')
+        return str(value) if value is not None else None
+
+    tags = audio.tags
+    cover = None
+    try:
+        if isinstance(tags, ID3):
+            frame = lambda key: first(tags[key].text) if key in tags else None
+            info.update(title=frame('TIT2'), artist=frame('TPE1'), album=frame('TALB'),
+                        source_id=frame('TXXX:SOURCE_ID'))
+            pictures = tags.getall('APIC')
+            cover = pictures[0].data if pictures else None
+        elif isinstance(tags, MP4Tags):
+            info.update(title=first(tags.get('\xa9nam')), artist=first(tags.get('\xa9ART')),
+                        album=first(tags.get('\xa9alb')),
+                        source_id=first(tags.get(_MP4_FREEFORM + 'source_id')))
+            covers = tags.get('covr')
+            cover = bytes(covers[0]) if covers else None
+        elif tags is not None:
+            # Vorbis comments
+            info.update(title=first(tags.get('title')), artist=first(tags.get('artist')),
+                        album=first(tags.get('album')), source_id=first(tags.get('source_id')))
+    except Exception:
+        pass
+    if cover:
+        info['cover_hash'] = hashlib.sha1(cover).hexdigest()
+    return info
 
-            if log_callback:
-                log_safe(log_callback, f"🔄 Converting {os.path.basename(input_file)} to MP3...")
 
-            # Load and convert audio
-            audio = AudioSegment.from_file(input_file, format=input_format)
-            audio.export(output_file, format='mp3', bitrate='192k')
+class LibraryIndex:
+    """
+    Tags and stream info for every library file in SQLite (WAL mode), keyed by
+    absolute path. Rows are only refreshed when a file's size or mtime changes,
+    by a background scanner fed from refresh_file_list and the library watcher.
 
-            if log_callback:
-                log_safe(log_callback, f"✅ Converted to: {os.path.basename(output_file)}")
+    on_change(updated_rows, removed_paths) is called on the scanner thread after
+    each batch.
+    """
 
-            return output_file
+    def __init__(self, path=LIBRARY_INDEX_FILE):
+        import sqlite3
+        self.path = path
+        self.on_change = None
+        self._lock = threading.RLock()
+        self._pending = deque()
+        self._thread = None
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        with self._lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS tracks ("
+                "path TEXT PRIMARY KEY, title TEXT, artist TEXT, album TEXT, duration REAL, "
+                "codec TEXT, bitrate INTEGER, size INTEGER, mtime_ns INTEGER, "
+                "source_id TEXT, cover_hash TEXT)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS tracks_source_id ON tracks(source_id)")
+            self._db.commit()
+
+    def get(self, file_path):
+        """Return the row for file_path as a dict if it matches the file on disk, else None"""
+        key = os.path.abspath(file_path)
+        with self._lock:
+            row = self._db.execute("SELECT * FROM tracks WHERE path = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        try:
+            st = os.stat(key)
+        except OSError:
+            return None
+        if row['size'] != st.st_size or row['mtime_ns'] != st.st_mtime_ns:
+            return None
+        return dict(row)
 
-        except Exception as e:
-            if log_callback:
-                log_safe(log_callback, f"❌ Conversion error: {e}")
+    def all_tracks(self):
+        with self._lock:
+            return [dict(row) for row in self._db.execute("SELECT * FROM tracks")]
+
+    def find_source(self, source_id):
+        """Path of an existing library file downloaded from source_id, or None"""
+        if not source_id:
             return None
+        with self._lock:
+            rows = self._db.execute("SELECT path FROM tracks WHERE source_id = ?", (str(source_id),)).fetchall()
+        for row in rows:
+            if os.path.exists(row['path']):
+                return row['path']
+        return None
 
-    def test_playback(self, file_path):
-        """
-        Test if a file can be played by SoundLoader
+    def update(self, files):
+        """Queue files for a background rescan; unchanged files cost one stat"""
+        with self._lock:
+            self._pending.extend(os.path.abspath(f) for f in files)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def scan(self, files, directory="."):
+        """Rescan a full listing of directory, dropping rows for files no longer in it"""
+        keep = {os.path.abspath(f) for f in files}
+        root = os.path.abspath(directory)
+        with self._lock:
+            stale = [row['path'] for row in self._db.execute("SELECT path FROM tracks")
+                     if os.path.dirname(row['path']) == root and row['path'] not in keep]
+        self.remove(stale)
+        self.update(files)
+
+    def remove(self, files):
+        keys = [os.path.abspath(f) for f in files]
+        if not keys:
+            return
+        with self._lock:
+            self._db.executemany("DELETE FROM tracks WHERE path = ?", [(k,) for k in keys])
+            self._db.commit()
+        if self.on_change:
+            self.on_change([], keys)
+
+    def _run(self):
+        while True:
+            updated = []
+            while True:
+                with self._lock:
+                    if not self._pending:
+                        break
+                    key = self._pending.popleft()
+                    row = self._db.execute("SELECT size, mtime_ns FROM tracks WHERE path = ?", (key,)).fetchone()
+                try:
+                    st = os.stat(key)
+                except OSError:
+                    continue
+                if row and row['size'] == st.st_size and row['mtime_ns'] == st.st_mtime_ns:
+                    continue
+                try:
+                    info = read_track_info(key)
+                except Exception:
+                    continue
+                info['path'] = key
+                with self._lock:
+                    self._db.execute(
+                        f"INSERT OR REPLACE INTO tracks (path, {', '.join(LIBRARY_INDEX_COLUMNS)}) "
+                        f"VALUES (?{', ?' * len(LIBRARY_INDEX_COLUMNS)})",
+                        [key] + [info[c] for c in LIBRARY_INDEX_COLUMNS])
+                    # Commit in batches so a big first scan isn't one fsync per file
+                    if len(updated) % 100 == 99:
+                        self._db.commit()
+                updated.append(info)
+
+            if updated:
+                with self._lock:
+                    self._db.commit()
+                if self.on_change:
+                    self.on_change(updated, [])
+
+            # update() only starts a thread when none is registered, so anything queued
+            # while this one was committing has to be picked up before it exits
+            with self._lock:
+                if not self._pending:
+                    self._thread = None
+                    return
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM tracks").fetchone()[0]
+
+
+_library_index = None
+
+
+def get_library_index():
+    """Return the process-wide library index"""
+    global _library_index
+    with _shared_backend_lock:
+        if _library_index is None:
+            _library_index = LibraryIndex()
+        return _library_index
+
+# ------------------- Library Search -------------------
+SEARCH_FIELDS = ('title', 'artist', 'album')
+
+
+def search_tokens(text):
+    """Lower-case, accent-folded word tokens of text"""
+    import re
+    import unicodedata
+    text = unicodedata.normalize('NFKD', str(text or '')).casefold()
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return re.findall(r'\w+', text)
+
+
+class SearchIndex:
+    """
+    In-memory token index over title, artist, album and file name. Every
+    query word is matched as a prefix: a bisect into the sorted vocabulary
+    finds the matching tokens, their posting sets are unioned, and the
+    per-word results are intersected, smallest first. Tracks are added and
+    removed incrementally as the library index changes.
+    """
 
-        Args:
-            file_path: Path to audio file
+    def __init__(self):
+        self._ids = {}          # path -> doc id
+        self._paths = {}        # doc id -> path
+        self._doc_tokens = {}   # doc id -> set of tokens
+        self._postings = {}     # token -> set of doc ids
+        self._vocabulary = []   # sorted tokens
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def add(self, path, fields):
+        """Index (or re-index) one track from a dict with SEARCH_FIELDS"""
+        import bisect
+        tokens = set(search_tokens(os.path.splitext(os.path.basename(path))[0]))
+        for field in SEARCH_FIELDS:
+            tokens.update(search_tokens(fields.get(field)))
+        with self._lock:
+            self._remove_locked(path)
+            doc = self._next_id
+            self._next_id += 1
+            self._ids[path] = doc
+            self._paths[doc] = path
+            self._doc_tokens[doc] = tokens
+            for token in tokens:
+                posting = self._postings.get(token)
+                if posting is None:
+                    self._postings[token] = posting = set()
+                    bisect.insort(self._vocabulary, token)
+                posting.add(doc)
+
+    def remove(self, path):
+        with self._lock:
+            self._remove_locked(path)
+
+    def _remove_locked(self, path):
+        import bisect
+        doc = self._ids.pop(path, None)
+        if doc is None:
+            return
+        del self._paths[doc]
+        for token in self._doc_tokens.pop(doc):
+            posting = self._postings[token]
+            posting.discard(doc)
+            if not posting:
+                del self._postings[token]
+                del self._vocabulary[bisect.bisect_left(self._vocabulary, token)]
+
+    def _prefix_docs(self, prefix):
+        import bisect
+        vocabulary = self._vocabulary
+        start = bisect.bisect_left(vocabulary, prefix)
+        end = bisect.bisect_left(vocabulary, prefix + '\uffff', start)
+        if end - start == 1:
+            return self._postings[vocabulary[start]]
+        docs = set()
+        for token in vocabulary[start:end]:
+            docs |= self._postings[token]
+        return docs
+
+    def search(self, query, limit=None):
+        """Paths of tracks matching every word of query as a prefix, sorted"""
+        words = search_tokens(query)
+        if not words:
+            return []
+        with self._lock:
+            # Longest words first: they match the fewest tokens
+            matches = None
+            for word in sorted(set(words), key=len, reverse=True):
+                docs = self._prefix_docs(word)
+                matches = set(docs) if matches is None else matches & docs
+                if not matches:
+                    return []
+            paths = sorted(self._paths[doc] for doc in matches)
+        return paths[:limit] if limit else paths
+
+    def __len__(self):
+        return len(self._ids)
+
+# ------------------- Library Analysis -------------------
+ANALYSIS_INDEX_FILE = "library_analysis.json"
+ANALYSIS_SAMPLE_RATE = 48000
+ANALYSIS_CHANNELS = 2
+ANALYSIS_BLOCK_SECONDS = 10
+REPLAYGAIN_REFERENCE_LUFS = -18.0
+PEAKS_CACHE_DIR = "peaks_cache"
+PEAKS_COUNT = 2048
+SILENCE_THRESHOLD_DB = -50.0  # RMS level (dBFS) below which a window counts as silence
+SILENCE_WINDOW_SECONDS = 0.05
+SILENCE_PAD_SECONDS = 0.1  # Kept either side of the audible region so fades aren't clipped
+TRIM_MIN_SECONDS = 0.25  # Shorter silences aren't worth a seek
+FINGERPRINT_CACHE_DIR = "fingerprint_cache"
+FINGERPRINT_STEP_SECONDS = 0.5
+FINGERPRINT_SAMPLE_RATE = 12000
+_FINGERPRINT_MAGIC = b'FPR1'
+_PEAKS_MAGIC = b'PEK1'
+
+# ITU-R BS.1770 K-weighting at 48 kHz: a high-shelf pre-filter followed by a high-pass
+_K_WEIGHTING_BIQUADS = (
+    ((1.53512485958697, -2.69169618940638, 1.19839281085285), (1.0, -1.69065929318241, 0.73248077421585)),
+    ((1.0, -2.0, 1.0), (1.0, -1.99004745483398, 0.99007225036621)),
+)
+
+
+def decode_pcm_blocks(ffmpeg_path, file_path, sample_rate=ANALYSIS_SAMPLE_RATE,
+                      channels=ANALYSIS_CHANNELS, block_seconds=ANALYSIS_BLOCK_SECONDS,
+                      stop_check=None):
+    """
+    Decode a file to float32 PCM with ffmpeg, yielding (frames, channels) NumPy arrays
 
-        Returns:
-            True if file can be loaded, False otherwise
-        """
+    Every block except the last holds exactly block_seconds of audio, so consumers can
+    rely on block boundaries falling on whole 100 ms segments.
+    """
+    import subprocess
+    cmd = [ffmpeg_path, '-v', 'error', '-nostdin', '-i', file_path, '-vn',
+           '-ac', str(channels), '-ar', str(sample_rate), '-f', 'f32le', '-']
+    frame_bytes = 4 * channels
+    block_bytes = int(sample_rate * block_seconds) * frame_bytes
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    try:
+        while not (stop_check and stop_check()):
+            data = proc.stdout.read(block_bytes)
+            usable = len(data) - len(data) % frame_bytes
+            if usable:
+                yield np.frombuffer(data[:usable], dtype='<f4').reshape(-1, channels)
+            if len(data) < block_bytes:
+                break
+    finally:
         try:
-            sound = SoundLoader.load(file_path)
-            if sound:
-                sound.unload()
-                return True
-            return False
+            proc.stdout.close()
         except Exception:
-            return False
-
-    def test_pygame_playback(self, file_path):
-        """
-        Test if a file can be played using pygame mixer
+            pass
+        if proc.poll() is None:
+            proc.kill()
+        proc.wait()
 
-        Args:
-            file_path: Path to audio file
 
-        Returns:
-            True if file can be loaded by pygame, False otherwise
-        """
-        try:
-            is_mobile = self.env_detector.is_mobile if self.env_detector else False
-            is_android = self.env_detector.is_android if self.env_detector else False
-            player = PygameAudioPlayer(is_mobile=is_mobile, is_android=is_android)
-            if player.load(file_path):
-                player.unload()
-                return True
-            return False
-        except Exception:
-            return False
+def _k_weighting_power(freqs, sample_rate):
+    """Squared magnitude response of the K-weighting filter at the given frequencies"""
+    z = np.exp(-2j * np.pi * freqs / sample_rate)
+    response = np.ones_like(z)
+    for b, a in _K_WEIGHTING_BIQUADS:
+        response *= (b[0] + b[1] * z + b[2] * z * z) / (a[0] + a[1] * z + a[2] * z * z)
+    return np.abs(response) ** 2
 
-    def auto_convert_if_needed(self, file_path, log_callback=None):
-        """
-        Automatically convert file to MP3 if it can't be played
-        Tries multiple fallback methods:
-        1. Test with SoundLoader (Kivy default)
-        2. Test with Pygame mixer (better codec support on Android/Pydroid 3)
-        3. Convert with ffmpeg if available
 
-        Args:
-            file_path: Path to audio file
-            log_callback: Function to call for logging
+def peaks_sidecar_path(file_path):
+    """Sidecar file holding the waveform peaks for file_path"""
+    key = hashlib.sha1(os.path.abspath(file_path).encode('utf-8')).hexdigest()
+    return os.path.join(PEAKS_CACHE_DIR, f"{key}.peaks")
 
-        Returns:
-            Path to playable file (original or converted), or None if failed
-        """
-        # First, try to play the file with Kivy's SoundLoader
-        if self.test_playback(file_path):
-            return file_path
 
-        # Second, try pygame mixer (better codec support on Android/Pydroid 3)
-        if self.test_pygame_playback(file_path):
-            if log_callback:
-                log_safe(log_callback, f"✅ {os.path.basename(file_path)} playable with pygame fallback")
-            return file_path
+def write_peaks(path, mins, maxs):
+    """Store min/max peaks as a count header followed by interleaved int8 pairs"""
+    import struct
+    pairs = np.empty(len(mins) * 2, dtype=np.int8)
+    pairs[0::2] = np.clip(np.round(mins * 127), -127, 127)
+    pairs[1::2] = np.clip(np.round(maxs * 127), -127, 127)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp = f"{path}.tmp-{threading.get_ident()}"
+    with open(tmp, 'wb') as f:
+        f.write(_PEAKS_MAGIC + struct.pack('<I', len(mins)) + pairs.tobytes())
+    os.replace(tmp, path)
 
-        # If both failed and file is in a convertible format, try ffmpeg conversion
-        ext = os.path.splitext(file_path)[1].lower()
-        if ext in ['.m4a', '.opus', '.ogg', '.webm']:
-            if log_callback:
-                log_safe(log_callback, f"⚠️ {os.path.basename(file_path)} cannot be played directly")
 
-            if self.can_convert():
-                converted_file = self.convert_to_mp3(file_path, log_callback=log_callback)
-                if converted_file and os.path.exists(converted_file):
-                    return converted_file
-            else:
-                if log_callback:
-                    log_safe(log_callback, "ℹ️ Audio conversion not available - ffmpeg not found")
-                    log_safe(log_callback, "ℹ️ Note: Pygame fallback will be used for playback")
+def load_peaks(path):
+    """
+    Read a peaks sidecar with a single small read (no decoding, no NumPy needed)
 
+    Returns:
+        (count, array('b') of interleaved min/max pairs scaled to +-127), or None
+    """
+    import struct
+    from array import array
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+        if data[:4] != _PEAKS_MAGIC:
+            return None
+        count = struct.unpack('<I', data[4:8])[0]
+        pairs = array('b', data[8:8 + count * 2])
+        if len(pairs) != count * 2:
+            return None
+        return count, pairs
+    except Exception:
         return None
 
 
-# ------------------- Configuration -------------------
-CONFIG_FILE = "app_settings.json"
+class AnalysisStage:
+    """
+    One measurement taken from the shared PCM decode of a track. Stages are fed every
+    decoded block in order and return their index fields from finish().
+    """
 
-def load_settings():
-    """Load app settings from config file"""
-    try:
-        if os.path.exists(CONFIG_FILE):
-            with open(CONFIG_FILE, 'r') as f:
-                return json.load(f)
-    except Exception:
-        pass
-    return {"mobile_mode": False}
+    name = ""
 
-def save_settings(settings):
-    """Save app settings to config file"""
-    try:
-        with open(CONFIG_FILE, 'w') as f:
-            json.dump(settings, f)
-    except Exception:
-        pass
+    def __init__(self, file_path):
+        self.file_path = file_path
 
-# ------------------- Utility -------------------
-def sanitize_filename(name):
-    return "".join(c if c.isalnum() or c in " ._-()" else "_" for c in name)
+    def feed(self, block):
+        raise NotImplementedError
 
-def log_safe(log_func, msg):
-    # Schedule log update on the main thread (Kivy)
+    def finish(self):
+        raise NotImplementedError
+
+
+class LoudnessStage(AnalysisStage):
+    """
+    EBU R128 integrated loudness, sample peak and ReplayGain track gain.
+
+    Each block is split into 100 ms segments which are K-weighted in the frequency domain
+    with one batched FFT; 400 ms gating blocks (75% overlap) are then built from running
+    sums of the segment energies and gated at -70 LUFS absolute and -10 LU relative.
+    """
+
+    name = "loudness"
+
+    def __init__(self, file_path, sample_rate=ANALYSIS_SAMPLE_RATE):
+        super().__init__(file_path)
+        self.segment = int(sample_rate * 0.1)
+        weights = _k_weighting_power(np.fft.rfftfreq(self.segment, 1.0 / sample_rate), sample_rate)
+        # Parseval for a real FFT: interior bins also stand in for their mirrored twins
+        last = -1 if self.segment % 2 == 0 else None
+        weights[1:last] *= 2
+        self._weights = (weights / self.segment ** 2)[None, :, None]
+        self._energies = []
+        self._peak = 0.0
+
+    def feed(self, block):
+        if not block.size:
+            return
+        self._peak = max(self._peak, float(np.abs(block).max()))
+        count = len(block) // self.segment
+        if not count:
+            return
+        segments = block[:count * self.segment].reshape(count, self.segment, block.shape[1])
+        spectrum = np.fft.rfft(segments, axis=1)
+        power = (spectrum.real ** 2 + spectrum.imag ** 2) * self._weights
+        self._energies.append(power.sum(axis=1))
+
+    def finish(self):
+        fields = {'peak': round(self._peak, 6), 'loudness_lufs': None, 'replaygain_gain': None}
+        if not self._energies:
+            return fields
+
+        segments = np.concatenate(self._energies)
+        if len(segments) < 4:
+            blocks = segments.mean(axis=0, keepdims=True)
+        else:
+            running = np.cumsum(np.vstack([np.zeros((1, segments.shape[1])), segments]), axis=0)
+            blocks = (running[4:] - running[:-4]) / 4.0
+        # Left/right channel weights are both 1.0
+        power = blocks.sum(axis=1)
+        with np.errstate(divide='ignore'):
+            block_lufs = -0.691 + 10 * np.log10(power)
+
+        above_absolute = block_lufs > -70.0
+        if not above_absolute.any():
+            return fields  # digital silence: nothing to normalise
+        relative_gate = -0.691 + 10 * np.log10(power[above_absolute].mean()) - 10.0
+        gated = power[above_absolute & (block_lufs > relative_gate)]
+        lufs = -0.691 + 10 * np.log10(gated.mean())
+
+        fields['loudness_lufs'] = round(float(lufs), 2)
+        fields['replaygain_gain'] = round(REPLAYGAIN_REFERENCE_LUFS - float(lufs), 2)
+        return fields
+
+
+class SilenceStage(AnalysisStage):
+    """
+    Leading/trailing silence: RMS over 50 ms windows (all channels) compared against
+    SILENCE_THRESHOLD_DB. Records where the audible region starts and ends.
+    """
+
+    name = "silence"
+
+    def __init__(self, file_path, sample_rate=ANALYSIS_SAMPLE_RATE):
+        super().__init__(file_path)
+        self.sample_rate = sample_rate
+        self.window = int(sample_rate * SILENCE_WINDOW_SECONDS)
+        self.threshold = (10 ** (SILENCE_THRESHOLD_DB / 20.0)) ** 2
+        self._windows = 0
+        self._frames = 0
+        self._first_loud = None
+        self._last_loud = None
+
+    def feed(self, block):
+        count = -(-len(block) // self.window)
+        if not count:
+            return
+        padded = block
+        if count * self.window != len(block):
+            padded = np.zeros((count * self.window, block.shape[1]), dtype=block.dtype)
+            padded[:len(block)] = block
+        mean_square = (padded.reshape(count, -1) ** 2).mean(axis=1)
+        loud = np.flatnonzero(mean_square > self.threshold)
+        if loud.size:
+            if self._first_loud is None:
+                self._first_loud = self._windows + int(loud[0])
+            self._last_loud = self._windows + int(loud[-1])
+        self._windows += count
+        self._frames += len(block)
+
+    def finish(self):
+        duration = self._frames / float(self.sample_rate)
+        if self._first_loud is None:
+            # All silent (or nothing decoded): leave the track alone
+            return {'trim_start': 0.0, 'trim_end': round(duration, 3), 'silence_removed': 0.0}
+        start = max(0.0, self._first_loud * SILENCE_WINDOW_SECONDS - SILENCE_PAD_SECONDS)
+        end = min(duration, (self._last_loud + 1) * SILENCE_WINDOW_SECONDS + SILENCE_PAD_SECONDS)
+        return {'trim_start': round(start, 3), 'trim_end': round(end, 3),
+                'silence_removed': round(start + duration - end, 3)}
+
+
+def fingerprint_sidecar_path(file_path):
+    """Sidecar file holding the chroma fingerprint for file_path"""
+    key = hashlib.sha1(os.path.abspath(file_path).encode('utf-8')).hexdigest()
+    return os.path.join(FINGERPRINT_CACHE_DIR, f"{key}.fp")
+
+
+def load_fingerprint(path):
+    """Read a fingerprint sidecar as a uint32 NumPy array, or None"""
+    import struct
     try:
-        Clock.schedule_once(lambda dt: log_func(msg))
+        with open(path, 'rb') as f:
+            data = f.read()
+        if data[:4] != _FINGERPRINT_MAGIC:
+            return None
+        count = struct.unpack('<I', data[4:8])[0]
+        codes = np.frombuffer(data[8:8 + count * 4], dtype='<u4')
+        return codes if len(codes) == count else None
     except Exception:
-        # If scheduling fails for any reason, attempt direct call (best-effort)
+        return None
+
+
+class FingerprintStage(AnalysisStage):
+    """
+    Compact chroma fingerprint for duplicate detection. Audio is downmixed to mono at
+    12 kHz and cut into 0.5 s frames whose spectra are folded into 12 pitch classes and
+    smoothed over neighbouring frames. Each frame becomes a 24-bit code: 12 bits for the
+    pitch classes above average and 12 for those holding over twice their share. Weak
+    classes stay 0, so the bits survive re-encoding, noise, level changes and offsets.
+    """
+
+    name = "fingerprint"
+
+    def __init__(self, file_path, sample_rate=ANALYSIS_SAMPLE_RATE):
+        super().__init__(file_path)
+        self.decimate = max(1, sample_rate // FINGERPRINT_SAMPLE_RATE)
+        rate = sample_rate / float(self.decimate)
+        self.frame = int(rate * FINGERPRINT_STEP_SECONDS)
+        self._window = np.hanning(self.frame).astype(np.float32)
+
+        # One-hot map from FFT bins (A2-A7) to pitch classes
+        freqs = np.fft.rfftfreq(self.frame, 1.0 / rate)
+        usable = (freqs >= 110.0) & (freqs <= 3520.0)
+        pitch = np.zeros(len(freqs), dtype=int)
+        pitch[usable] = np.round(12 * np.log2(freqs[usable] / 440.0)).astype(int) % 12
+        self._chroma_map = np.zeros((len(freqs), 12), dtype=np.float32)
+        self._chroma_map[np.flatnonzero(usable), pitch[usable]] = 1.0
+        self._pending = np.zeros(0, dtype=np.float32)
+        self._chroma = []
+
+    def feed(self, block):
+        mono = block.mean(axis=1)
+        usable = len(mono) - len(mono) % self.decimate
+        mono = mono[:usable].reshape(-1, self.decimate).mean(axis=1)
+        if self._pending.size:
+            mono = np.concatenate([self._pending, mono])
+        count = len(mono) // self.frame
+        self._pending = mono[count * self.frame:]
+        if not count:
+            return
+        frames = mono[:count * self.frame].reshape(count, self.frame) * self._window
+        spectrum = np.abs(np.fft.rfft(frames, axis=1)) ** 2
+        self._chroma.append(spectrum @ self._chroma_map)
+
+    def finish(self):
+        if not self._chroma:
+            return {'fingerprint_file': None, 'fingerprint_count': 0}
+        chroma = np.concatenate(self._chroma)
+        energy = chroma.sum(axis=1)
+        if len(chroma) > 2:
+            chroma[1:-1] = (chroma[:-2] + chroma[1:-1] + chroma[2:]) / 3.0
+        chroma = chroma / np.maximum(chroma.sum(axis=1), 1e-12)[:, None]
+
+        weights = (1 << np.arange(12)).astype(np.uint32)
+        active = (chroma > 1 / 12.0).astype(np.uint32) @ weights
+        dominant = (chroma > 2 / 12.0).astype(np.uint32) @ weights
+        codes = (active | (dominant << 12)).astype('<u4')
+        # Near-silent frames carry no information; 0 marks them so they never match
+        codes[energy < energy.max() * 1e-4] = 0
+
+        import struct
+        sidecar = fingerprint_sidecar_path(self.file_path)
+        os.makedirs(FINGERPRINT_CACHE_DIR, exist_ok=True)
+        tmp = f"{sidecar}.tmp-{threading.get_ident()}"
+        with open(tmp, 'wb') as f:
+            f.write(_FINGERPRINT_MAGIC + struct.pack('<I', len(codes)) + codes.tobytes())
+        os.replace(tmp, sidecar)
+        return {'fingerprint_file': sidecar, 'fingerprint_count': int(len(codes))}
+
+
+class PeaksStage(AnalysisStage):
+    """
+    Waveform overview for the seek bar: per-10 ms min/max across channels, reduced to
+    PEAKS_COUNT buckets and written to a compact binary sidecar (see load_peaks).
+    """
+
+    name = "peaks"
+
+    def __init__(self, file_path, sample_rate=ANALYSIS_SAMPLE_RATE):
+        super().__init__(file_path)
+        self.chunk = int(sample_rate * 0.01)
+        self._mins = []
+        self._maxs = []
+
+    def feed(self, block):
+        count = len(block) // self.chunk
+        if count:
+            chunks = block[:count * self.chunk].reshape(count, -1)
+            self._mins.append(chunks.min(axis=1))
+            self._maxs.append(chunks.max(axis=1))
+        rest = block[count * self.chunk:]
+        if rest.size:
+            self._mins.append(rest.min(keepdims=True).ravel())
+            self._maxs.append(rest.max(keepdims=True).ravel())
+
+    def finish(self):
+        if not self._mins:
+            return {'peaks_file': None, 'peaks_count': 0}
+        mins = np.concatenate(self._mins)
+        maxs = np.concatenate(self._maxs)
+        buckets = min(PEAKS_COUNT, len(mins))
+        edges = (np.arange(buckets) * len(mins)) // buckets
+        mins = np.minimum.reduceat(mins, edges)
+        maxs = np.maximum.reduceat(maxs, edges)
+
+        sidecar = peaks_sidecar_path(self.file_path)
+        write_peaks(sidecar, mins, maxs)
+        return {'peaks_file': sidecar, 'peaks_count': int(buckets)}
+
+
+class AnalysisIndex:
+    """
+    Per-file analysis results keyed by absolute path and persisted as JSON. An entry is
+    only trusted while the file's size and mtime match, and records which stages produced
+    it so newly added stages are run on files analysed before they existed.
+    """
+
+    # Entry fields naming sidecar files that are removed along with the entry
+    SIDECAR_FIELDS = ('peaks_file', 'seek_file', 'fingerprint_file')
+
+    def __init__(self, path=ANALYSIS_INDEX_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._save_timer = None
+        self._entries = {}
         try:
-            log_func(msg)
+            with open(self.path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
         except Exception:
-            pass
+            entries = {}
+        for key, entry in entries.items():
+            if os.path.exists(key):
+                self._entries[key] = entry
+            else:
+                self._remove_sidecars(entry)
 
-def format_time(seconds):
-    """Convert seconds to MM:SS format"""
-    if seconds is None or seconds < 0:
-        return "00:00"
-    minutes = int(seconds // 60)
-    seconds = int(seconds % 60)
-    return f"{minutes:02d}:{seconds:02d}"
+    def _remove_sidecars(self, entry):
+        for field in self.SIDECAR_FIELDS:
+            sidecar = entry.get(field)
+            if sidecar:
+                try:
+                    os.remove(sidecar)
+                except OSError:
+                    pass
 
-def detect_speed():
-    """Simulate internet speed detection (stub)."""
-    try:
-        r = requests.get("https://www.google.com", timeout=3)
-        if r.elapsed.total_seconds() < 0.5:
-            return "high"
-        elif r.elapsed.total_seconds() < 1.5:
-            return "medium"
-        else:
-            return "low"
-    except Exception:
-        return "medium"
+    @staticmethod
+    def _signature(file_path):
+        st = os.stat(file_path)
+        return st.st_size, st.st_mtime_ns
+
+    def get(self, file_path):
+        """Return the entry for file_path if it is still current, else None"""
+        key = os.path.abspath(file_path)
+        with self._lock:
+            entry = self._entries.get(key)
+        if not entry:
+            return None
+        try:
+            size, mtime_ns = self._signature(key)
+        except OSError:
+            return None
+        if entry.get('size') != size or entry.get('mtime_ns') != mtime_ns:
+            return None
+        return entry
+
+    def needs(self, file_path, stages):
+        """True if any of the named stages hasn't been run on the current file contents"""
+        entry = self.get(file_path)
+        return entry is None or not set(stages) <= set(entry.get('stages', ()))
+
+    def put(self, file_path, fields, stages):
+        """Merge fields into the entry for file_path, stamped with its current signature"""
+        key = os.path.abspath(file_path)
+        size, mtime_ns = self._signature(key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if not entry or entry.get('size') != size or entry.get('mtime_ns') != mtime_ns:
+                entry = {'stages': []}
+            entry.update(fields)
+            entry['size'] = size
+            entry['mtime_ns'] = mtime_ns
+            entry['stages'] = sorted(set(entry['stages']) | set(stages))
+            self._entries[key] = entry
+
+    def discard(self, file_path):
+        """Forget a deleted file and remove its sidecars"""
+        with self._lock:
+            entry = self._entries.pop(os.path.abspath(file_path), None)
+        if entry:
+            self._remove_sidecars(entry)
+            self.save_soon()
+
+    def save(self):
+        """Write the index atomically"""
+        with self._lock:
+            self._save_timer = None
+            data = json.dumps(self._entries)
+        try:
+            tmp = f"{self.path}.tmp"
+            with open(tmp, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(tmp, self.path)
+        except Exception as e:
+            print(f"Error saving analysis index: {e}")
 
+    def save_soon(self, delay=2.0):
+        """Coalesce bursts of updates into a single write"""
+        with self._lock:
+            if self._save_timer:
+                return
+            self._save_timer = threading.Timer(delay, self.save)
+            self._save_timer.daemon = True
+            self._save_timer.start()
 
-# ------------------- Cover Art Helper -------------------
-def extract_cover_art(file_path, cache_dir="cover_cache"):
-    """Extract cover art from audio file and cache it"""
-    os.makedirs(cache_dir, exist_ok=True)
+    def __len__(self):
+        return len(self._entries)
 
-    # Generate cache filename using basename for simplicity
-    cache_file = os.path.join(cache_dir, f"{os.path.basename(file_path)}.jpg")
 
-    # Return cached file if it exists
-    if os.path.exists(cache_file):
-        return cache_file
+_analysis_index = None
+_analysis_index_lock = threading.Lock()
 
-    try:
-        audio = ID3(file_path)
-        for tag in audio.values():
-            if isinstance(tag, APIC):
-                # Found cover art
-                with open(cache_file, 'wb') as f:
-                    f.write(tag.data)
-                return cache_file
-    except Exception:
-        # No APIC or ID3 data — ignore
-        pass
 
-    return None
+def get_analysis_index():
+    """Return the process-wide analysis index"""
+    global _analysis_index
+    with _analysis_index_lock:
+        if _analysis_index is None:
+            _analysis_index = AnalysisIndex()
+        return _analysis_index
 
-def download_cover_art(url, cache_dir="cover_cache", filename="cover.jpg"):
-    """Download cover art from URL and cache it"""
-    os.makedirs(cache_dir, exist_ok=True)
 
-    cache_file = os.path.join(cache_dir, filename)
+_tag_fields = {}   # (path, size, mtime_ns) -> read_analysis_tags() result, oldest first
+_tag_fields_lock = threading.Lock()
+TAG_FIELDS_MEMORY_ENTRIES = 64
 
-    # Return cached file if it exists
-    if os.path.exists(cache_file):
-        return cache_file
 
+def analysis_fields(file_path):
+    """
+    Analysis results for a file: its current index entry, else whatever its tags carry.
+    Tags are parsed once per file contents; volume and trim lookups reuse the result.
+    """
+    entry = get_analysis_index().get(file_path)
+    if entry:
+        return entry
+    path = os.path.abspath(file_path)
     try:
-        response = requests.get(url, timeout=10)
-        if response.status_code == 200:
-            with open(cache_file, 'wb') as f:
-                f.write(response.content)
-            return cache_file
-    except Exception:
-        pass
+        st = os.stat(path)
+    except OSError:
+        return {}
+    key = (path, st.st_size, st.st_mtime_ns)
+    with _tag_fields_lock:
+        fields = _tag_fields.get(key)
+    if fields is None:
+        fields = read_analysis_tags(path)
+        with _tag_fields_lock:
+            _tag_fields[key] = fields
+            while len(_tag_fields) > TAG_FIELDS_MEMORY_ENTRIES:
+                _tag_fields.pop(next(iter(_tag_fields)))
+    return fields
+
+
+def replaygain_volume(file_path):
+    """
+    Playback volume (0.0-1.0) that brings a track to the ReplayGain reference level,
+    from the analysis index or, failing that, ReplayGain tags written by another tagger.
+    Players can only attenuate, so tracks quieter than the reference play at full volume.
+    """
+    fields = analysis_fields(file_path)
+    gain = fields.get('replaygain_gain')
+    if gain is None:
+        return 1.0
+    peak = fields.get('peak') or 0.0
 
-    return None
+    volume = 10 ** (gain / 20.0)
+    if peak > 0:
+        volume = min(volume, 1.0 / peak)
+    return max(0.0, min(1.0, volume))
 
 
-# ------------------- Metadata -------------------
-def embed_metadata(file_path, metadata, log_callback):
+def track_trim(file_path):
     """
-    Safely embed metadata for both MP3 (ID3) and M4A (MP4) files.
-    `log_callback` should be a function that accepts one string argument.
+    Silence trim offsets for a track
+
+    Returns:
+        (start, end) in seconds; start is 0 and end None where trimming isn't worthwhile
+    """
+    fields = analysis_fields(file_path)
+    start = fields.get('trim_start') or 0.0
+    end = fields.get('trim_end')
+    duration = fields.get('duration')
+    if start < TRIM_MIN_SECONDS:
+        start = 0.0
+    if end is not None and duration and duration - end < TRIM_MIN_SECONDS:
+        end = None
+    if end is not None and end <= start:
+        return 0.0, None
+    return start, end
+
+
+class LibraryAnalyzer:
+    """
+    Background job that runs the analysis stages over library files. Each file is decoded
+    once by ffmpeg and every stage is fed the same blocks; files are spread over a thread
+    pool sized to the CPU count (ffmpeg runs out of process and NumPy's FFTs release the
+    GIL, so the work scales across cores). on_analyzed(file_path, fields), if set, is
+    called from the worker thread after each file is recorded.
     """
-    try:
-        file_ext = os.path.splitext(file_path)[1].lower()
 
-        # Handle M4A files
-        if file_ext == '.m4a':
+    STAGES = (LoudnessStage, SilenceStage, PeaksStage, FingerprintStage)
+
+    def __init__(self, ffmpeg_path=None, log_callback=None, index=None, max_workers=None):
+        self.ffmpeg_path = ffmpeg_path
+        self.log_callback = log_callback
+        self.index = index or get_analysis_index()
+        self.max_workers = max_workers or os.cpu_count() or 2
+        self.analyzed = 0
+        self.failed = 0
+        self._executor = None
+        self._pending = {}   # file path -> Future of the analysis in flight
+        self._lock = threading.Lock()
+        self._closed = False
+        self.on_analyzed = None
+
+    def available(self):
+        """Analysis needs NumPy and an ffmpeg binary"""
+        return NUMPY_AVAILABLE and bool(self.ffmpeg_path)
+
+    def stage_names(self):
+        return [stage.name for stage in self.STAGES]
+
+    def submit(self, file_path, write_tags=True):
+        """
+        Queue one file for analysis unless its index entry is already current
+
+        Returns:
+            A Future resolving to the new index fields, or None if nothing was queued
+        """
+        if not self.available() or self._closed:
+            return None
+        key = os.path.abspath(file_path)
+        with self._lock:
+            if key in self._pending or not self.index.needs(key, self.stage_names()):
+                return None
+            if self._executor is None:
+                from concurrent.futures import ThreadPoolExecutor
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix="analysis")
+            # Registered under the lock, which _analyze also takes before it clears the entry
+            future = self._executor.submit(self._analyze, key, write_tags)
+            self._pending[key] = future
+            return future
+
+    def pending_futures(self, files):
+        """Futures of analyses already in flight for any of files"""
+        with self._lock:
+            return [self._pending[key] for key in map(os.path.abspath, files) if key in self._pending]
+
+    def analyze_library(self, files, write_tags=True):
+        """Queue every file that needs analysis and log a summary when the batch is done"""
+        futures = [f for f in (self.submit(path, write_tags) for path in files) if f]
+        if not futures:
+            return futures
+        log_safe(self.log_callback, f"🎚️ Analyzing {len(futures)} track(s) (loudness, silence, waveform, fingerprint)...")
+
+        def report():
+            from concurrent.futures import wait
+            started = time.monotonic()
+            wait(futures)
+            done = sum(1 for f in futures if not f.cancelled() and f.result())
+            if done:
+                log_safe(self.log_callback,
+                         f"✅ Track analysis: {done}/{len(futures)} track(s) in {time.monotonic() - started:.1f}s")
+
+        threading.Thread(target=report, daemon=True).start()
+        return futures
+
+    def _analyze(self, file_path, write_tags):
+        try:
+            return self.analyze_file(file_path, write_tags)
+        except Exception as e:
+            self.failed += 1
+            log_safe(self.log_callback, f"⚠️ Analysis failed for {os.path.basename(file_path)}: {e}")
+            return None
+        finally:
+            with self._lock:
+                self._pending.pop(file_path, None)
+
+    def analyze_file(self, file_path, write_tags=True):
+        """Decode file_path once, run every stage on it and record the results"""
+        # Build the seek index up front too (header/frame parsing only, no decode)
+        seek_index = get_seek_index(file_path)
+        stages = [stage(file_path) for stage in self.STAGES]
+        frames = 0
+        for block in decode_pcm_blocks(self.ffmpeg_path, file_path, stop_check=lambda: self._closed):
+            frames += len(block)
+            for stage in stages:
+                stage.feed(block)
+        if self._closed:
+            return None
+        if not frames:
+            raise ValueError("no audio decoded")
+
+        fields = {'duration': round(frames / float(ANALYSIS_SAMPLE_RATE), 3),
+                  'seek_file': seek_sidecar_path(file_path) if seek_index else None}
+        for stage in stages:
+            fields.update(stage.finish())
+
+        if write_tags:
+            embed_analysis_tags(file_path, fields)
+        # Record after tagging so the stored signature matches the rewritten file
+        self.index.put(file_path, fields, [stage.name for stage in stages])
+        self.index.save_soon()
+        self.analyzed += 1
+        if self.on_analyzed:
+            self.on_analyzed(file_path, fields)
+        return fields
+
+    def stats(self):
+        """Return analyzed/failed/pending counters"""
+        with self._lock:
+            pending = len(self._pending)
+        return {'analyzed': self.analyzed, 'failed': self.failed, 'pending': pending,
+                'indexed': len(self.index)}
+
+    def shutdown(self):
+        """Abandon queued work and stop in-flight decodes so the app can exit promptly"""
+        self._closed = True
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+        self.index.save()
+
+
+# ------------------- Duplicate Detection -------------------
+DUPLICATE_MIN_SIMILARITY = 0.9  # Share of matching fingerprint bits (unrelated audio ~0.6-0.7)
+DUPLICATE_MIN_VOTES = 4  # Key hits at a consistent offset before comparing in full
+_FINGERPRINT_INDEX_STRIDE = 4  # Index every 4th key; queries probe every key
+
+
+class FingerprintIndex:
+    """
+    Inverted index from fingerprint keys (the active pitch classes of two frames) to
+    the files and positions they occur at. A query votes for (file, time offset) pairs,
+    so only files that line up with the query are compared bit-by-bit.
+    """
+
+    def __init__(self):
+        self._paths = []
+        self._codes = []
+        self._postings = {}
+
+    @staticmethod
+    def _keys(codes):
+        pitch = codes & 0xFFF
+        keys = (pitch[:-1] << 12) | pitch[1:]
+        keys[(codes[:-1] == 0) | (codes[1:] == 0)] = 0
+        return keys
+
+    def add(self, path, codes):
+        file_id = len(self._paths)
+        self._paths.append(path)
+        self._codes.append(codes)
+        keys = self._keys(codes)
+        for pos in range(0, len(keys), _FINGERPRINT_INDEX_STRIDE):
+            key = int(keys[pos])
+            if key:
+                self._postings.setdefault(key, []).append((file_id, pos))
+
+    def query(self, codes, min_similarity=DUPLICATE_MIN_SIMILARITY):
+        """
+        Returns:
+            List of (path, similarity) for indexed files that match codes
+        """
+        from collections import Counter
+        votes = Counter()
+        for pos, key in enumerate(self._keys(codes).tolist()):
+            for file_id, other_pos in self._postings.get(key, ()):
+                votes[(file_id, pos - other_pos)] += 1
+
+        best = {}
+        for (file_id, offset), count in votes.most_common():
+            if count < DUPLICATE_MIN_VOTES:
+                break
+            best.setdefault(file_id, offset)
+
+        matches = []
+        for file_id, offset in best.items():
+            similarity = fingerprint_similarity(codes, self._codes[file_id], offset)
+            if similarity >= min_similarity:
+                matches.append((self._paths[file_id], similarity))
+        return matches
+
+
+def fingerprint_similarity(a, b, offset):
+    """
+    Share of equal bits between fingerprints a and b with a[i] aligned to b[i - offset],
+    over frames both have audio in. 0.0 if they overlap by less than half the shorter one.
+    """
+    start = max(0, offset)
+    end = min(len(a), len(b) + offset)
+    if end - start < min(len(a), len(b)) / 2:
+        return 0.0
+    x = a[start:end]
+    y = b[start - offset:end - offset]
+    audible = (x != 0) & (y != 0)
+    if not audible.any():
+        return 0.0
+    differing = np.unpackbits((x[audible] ^ y[audible]).astype('<u4').view(np.uint8)).sum()
+    return 1.0 - differing / float(audible.sum() * 24)
+
+
+def find_duplicate_clusters(files, analyzer, min_similarity=DUPLICATE_MIN_SIMILARITY):
+    """
+    Fingerprint any files that still need it, then group near-duplicates.
+
+    Returns:
+        List of clusters, largest reclaimable first: dicts with 'keep' (the largest file,
+        usually the best encode), 'duplicates' and 'reclaimable' bytes
+    """
+    from concurrent.futures import wait
+    # Also wait for files an earlier batch (e.g. the startup scan) is still analyzing
+    in_flight = analyzer.pending_futures(files)
+    wait(in_flight + analyzer.analyze_library(files))
+
+    index = FingerprintIndex()
+    parent = {}
+
+    def root(path):
+        while parent[path] != path:
+            parent[path] = parent[parent[path]]
+            path = parent[path]
+        return path
+
+    for path in files:
+        entry = analyzer.index.get(path)
+        codes = load_fingerprint(entry['fingerprint_file']) if entry and entry.get('fingerprint_file') else None
+        if codes is None or not len(codes):
+            continue
+        parent[path] = path
+        for other, _ in index.query(codes, min_similarity):
+            parent[root(path)] = root(other)
+        index.add(path, codes)
+
+    groups = {}
+    for path in parent:
+        groups.setdefault(root(path), []).append(path)
+
+    clusters = []
+    for members in groups.values():
+        if len(members) < 2:
+            continue
+        stats = {path: os.stat(path) for path in members}
+        keep = max(members, key=lambda p: stats[p].st_size)
+        duplicates = [p for p in members if p != keep]
+        # Files already hard-linked to the keeper take no extra space
+        reclaimable = sum(stats[p].st_size for p in duplicates
+                          if (stats[p].st_dev, stats[p].st_ino) != (stats[keep].st_dev, stats[keep].st_ino))
+        clusters.append({'keep': keep, 'duplicates': duplicates, 'reclaimable': reclaimable})
+    clusters.sort(key=lambda c: c['reclaimable'], reverse=True)
+    return clusters
+
+
+def hardlink_duplicates(clusters, log_callback=None):
+    """
+    Replace each duplicate with a hard link to its cluster's kept file. Duplicates in a
+    different format are left alone (their name would no longer match their contents).
+
+    Returns:
+        Bytes reclaimed
+    """
+    reclaimed = 0
+    for cluster in clusters:
+        keep = cluster['keep']
+        keep_ext = os.path.splitext(keep)[1].lower()
+        keep_stat = os.stat(keep)
+        for dup in cluster['duplicates']:
             try:
-                audio = MP4(file_path)
-                audio['\xa9nam'] = metadata.get("title", "Unknown Title")
-                audio['\xa9ART'] = metadata.get("uploader", "Unknown Artist")
-                audio['\xa9alb'] = metadata.get("album", "Streamed Playlist")
+                st = os.stat(dup)
+                if (st.st_dev, st.st_ino) == (keep_stat.st_dev, keep_stat.st_ino):
+                    continue
+                if os.path.splitext(dup)[1].lower() != keep_ext:
+                    log_safe(log_callback, f"ℹ️ Kept {os.path.basename(dup)}: different format from {os.path.basename(keep)}")
+                    continue
+                tmp = f"{dup}.link-{os.getpid()}"
+                os.link(keep, tmp)
+                os.replace(tmp, dup)
+                get_analysis_index().discard(dup)
+                reclaimed += st.st_size
+                log_safe(log_callback, f"🔗 Linked {os.path.basename(dup)} -> {os.path.basename(keep)}")
+            except Exception as e:
+                log_safe(log_callback, f"⚠️ Could not link {os.path.basename(dup)}: {e}")
+    return reclaimed
 
-                # Add cover art for M4A
-                if "thumbnail" in metadata and metadata.get("thumbnail"):
-                    try:
-                        resp = requests.get(metadata["thumbnail"], timeout=10)
-                        if resp.status_code == 200:
-                            from mutagen.mp4 import MP4Cover
-                            audio['covr'] = [MP4Cover(resp.content, imageformat=MP4Cover.FORMAT_JPEG)]
-                    except Exception:
-                        pass
 
-                audio.save(file_path)
-                log_safe(log_callback, "✅ Metadata embedded (M4A).")
-            except Exception as e:
-                log_safe(log_callback, f"⚠️ Error saving M4A tags: {e}")
+# ------------------- Library Watcher -------------------
+LIBRARY_POLL_INTERVAL = 2.0   # seconds between scans when inotify isn't used
+LIBRARY_WATCH_SETTLE = 0.3    # quiet time before a burst of events is reported
+
+# inotify(7) constants
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+
+class LibraryWatcher:
+    """
+    Watches the library directory and reports add/remove/modify diffs.
+
+    Uses inotify through ctypes where it is available, and otherwise (or on
+    Android, where shared storage doesn't deliver events reliably) polls with
+    os.scandir every LIBRARY_POLL_INTERVAL seconds. Only the names touched by
+    an event are re-stat'ed, so a change costs O(1) rather than O(library).
+    A poll is one scandir pass comparing each file's (size, mtime_ns), so
+    in-place rewrites (e.g. tag edits) are reported as modified too.
+
+    on_change(added, removed, modified) is called on the watcher thread with
+    lists of file names relative to the watched directory.
+    """
+
+    def __init__(self, directory=".", on_change=None, use_inotify=True):
+        self.directory = directory
+        self.on_change = on_change
+        self.use_inotify = use_inotify
+        self.mode = None
+        self.files = {}   # name -> (size, mtime_ns)
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Snapshot the library and start watching it in a daemon thread"""
+        if self.running:
             return
+        self._stop.clear()
+        self.files = self._scan()
+        fd = self._inotify_open() if self.use_inotify else None
+        if fd is not None:
+            self.mode = 'inotify'
+            target, args = self._run_inotify, (fd,)
+        else:
+            self.mode = 'polling'
+            target, args = self._run_polling, ()
+        self._thread = threading.Thread(target=target, args=args, daemon=True)
+        self._thread.start()
 
-        # Handle MP3 files
-        audio = None
-        # Try to load existing EasyID3 tags; if none exist, attempt to create them safely
+    def stop(self):
+        self._stop.set()
+
+    def _scan(self):
+        """Signatures of every audio file in the directory"""
+        files = {}
         try:
-            audio = EasyID3(file_path)
-        except Exception:
-            try:
-                # Attempt to add ID3 tags using MP3 wrapper then reopen with EasyID3
-                from mutagen.mp3 import MP3
-                mp3 = MP3(file_path)
-                try:
-                    mp3.add_tags()
-                except Exception:
-                    pass
-                audio = EasyID3(file_path)
-            except Exception:
-                log_safe(log_callback, "⚠️ Could not create ID3 tags; continuing without EasyID3 metadata.")
-                audio = None
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if entry.name.lower().endswith(AUDIO_EXTENSIONS):
+                        try:
+                            st = entry.stat()
+                            files[entry.name] = (st.st_size, st.st_mtime_ns)
+                        except OSError:
+                            pass
+        except OSError:
+            pass
+        return files
 
-        if audio is not None:
+    def _signature(self, name):
+        try:
+            st = os.stat(os.path.join(self.directory, name))
+            return (st.st_size, st.st_mtime_ns)
+        except OSError:
+            return None
+
+    def _diff(self, names, signatures=None):
+        """Update the snapshot for names and report what changed"""
+        added, removed, modified = [], [], []
+        for name in sorted(names):
+            sig = signatures.get(name) if signatures is not None else self._signature(name)
+            old = self.files.get(name)
+            if sig is None:
+                if old is not None:
+                    del self.files[name]
+                    removed.append(name)
+            elif old is None:
+                self.files[name] = sig
+                added.append(name)
+            elif old != sig:
+                self.files[name] = sig
+                modified.append(name)
+
+        if (added or removed or modified) and self.on_change:
             try:
-                audio["title"] = metadata.get("title", "Unknown Title")
-                audio["artist"] = metadata.get("uploader", "Unknown Artist")
-                audio["album"] = metadata.get("album", "Streamed Playlist")
-                audio.save(file_path)
-                log_safe(log_callback, "✅ Metadata embedded (MP3).")
+                self.on_change(added, removed, modified)
             except Exception as e:
-                log_safe(log_callback, f"⚠️ Error saving EasyID3 tags: {e}")
+                print(f"⚠️ Library change handler failed: {e}")
 
-        # Handle thumbnail separately using ID3 APIC frames for MP3
-        if "thumbnail" in metadata and metadata.get("thumbnail"):
-            try:
-                resp = requests.get(metadata["thumbnail"], timeout=10)
-                if resp.status_code == 200:
-                    img_data = resp.content
-                else:
-                    img_data = None
-            except Exception:
-                img_data = None
+    def _inotify_open(self):
+        """Return an inotify fd watching the directory, or None if unavailable"""
+        if not sys.platform.startswith('linux'):
+            return None
+        try:
+            import ctypes
+            import ctypes.util
+            libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+            fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+            if fd < 0:
+                return None
+            mask = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE
+            if libc.inotify_add_watch(fd, os.fsencode(os.path.abspath(self.directory)), mask) < 0:
+                os.close(fd)
+                return None
+            return fd
+        except Exception:
+            return None
 
-            try:
-                id3 = None
-                try:
-                    id3 = ID3(file_path)
-                except Exception:
-                    # Create ID3 header if missing
-                    try:
-                        id3 = ID3()
-                    except Exception:
-                        id3 = None
+    def _run_inotify(self, fd):
+        import select
+        import struct
 
-                if id3 is not None and img_data:
+        # Creation isn't watched: a file only counts as added once it has been
+        # closed after writing or renamed into place, so partial downloads never show up
+        dirty = set()
+        rescan = False
+        try:
+            while not self._stop.is_set():
+                ready, _, _ = select.select([fd], [], [], LIBRARY_WATCH_SETTLE if dirty or rescan else 1.0)
+                if ready:
                     try:
-                        id3.delall("APIC")
-                    except Exception:
-                        pass
-                    id3.add(APIC(
-                        encoding=3,
-                        mime="image/jpeg",
-                        type=3,
-                        desc="Cover",
-                        data=img_data
-                    ))
-                    id3.save(file_path)
-                    log_safe(log_callback, "🖼️ Embedded thumbnail.")
-            except Exception as e:
-                log_safe(log_callback, f"⚠️ Could not embed thumbnail: {e}")
+                        buf = os.read(fd, 65536)
+                    except BlockingIOError:
+                        continue
+                    offset = 0
+                    while offset + 16 <= len(buf):
+                        _, mask, _, length = struct.unpack_from('iIII', buf, offset)
+                        name = buf[offset + 16:offset + 16 + length].rstrip(b'\0')
+                        offset += 16 + length
+                        if mask & IN_Q_OVERFLOW:
+                            rescan = True
+                        elif name:
+                            name = os.fsdecode(name)
+                            if name.lower().endswith(AUDIO_EXTENSIONS):
+                                dirty.add(name)
+                    continue
 
-    except Exception as e:
-        log_safe(log_callback, f"⚠️ Error embedding metadata: {e}")
+                # Quiet for LIBRARY_WATCH_SETTLE: report the burst
+                if rescan:
+                    current = self._scan()
+                    self._diff(set(current) | set(self.files), current)
+                elif dirty:
+                    self._diff(dirty)
+                dirty, rescan = set(), False
+        finally:
+            os.close(fd)
 
+    def _run_polling(self):
+        while not self._stop.wait(LIBRARY_POLL_INTERVAL):
+            # Nobody is looking at the list while the app is in the background
+            if get_power_scheduler().suspended:
+                continue
+            current = self._scan()
+            self._diff(set(current) | set(self.files), current)
 
-def get_metadata(file_path):
-    """Extract metadata from audio file"""
-    try:
-        audio = EasyID3(file_path)
-        return {
-            'title': audio.get('title', ['Unknown Title'])[0],
-            'artist': audio.get('artist', ['Unknown Artist'])[0],
-            'album': audio.get('album', ['Unknown Album'])[0],
-        }
-    except Exception:
-        return {
-            'title': os.path.basename(file_path),
-            'artist': 'Unknown Artist',
-            'album': 'Unknown Album',
-        }
+# ------------------- yt_dlp Helpers -------------------
+class QueueTrack:
+    """
+    Compact queue entry keeping only what playback and the UI use from a
+    yt-dlp info dict. Supports the dict-style get() the player code uses, so
+    queues may still mix in plain dicts (e.g. local tracks).
+    """
+
+    __slots__ = ('id', 'url', 'title', 'uploader', 'duration', 'thumbnail', 'format_id')
+
+    def __init__(self, id=None, url=None, title=None, uploader=None, duration=None,
+                 thumbnail=None, format_id=None):
+        self.id = id
+        self.url = url
+        self.title = title
+        self.uploader = uploader
+        self.duration = duration
+        self.thumbnail = thumbnail
+        self.format_id = format_id
+
+    @classmethod
+    def from_info(cls, info):
+        """Build from a yt-dlp info dict, dropping formats, thumbnails, captions etc."""
+        thumbnail = info.get('thumbnail')
+        if not thumbnail and info.get('thumbnails'):
+            thumbnail = info['thumbnails'][-1].get('url')   # yt-dlp sorts them smallest first
+        return cls(
+            id=info.get('id'),
+            url=info.get('webpage_url') or info.get('url'),
+            title=info.get('title'),
+            uploader=info.get('uploader') or info.get('channel'),
+            duration=info.get('duration'),
+            thumbnail=thumbnail,
+            format_id=info.get('format_id'),
+        )
+
+    # yt-dlp key names for the fields stored under a different name
+    _ALIASES = {'webpage_url': 'url'}
+
+    def get(self, key, default=None):
+        name = self._ALIASES.get(key, key)
+        value = getattr(self, name, None) if name in self.__slots__ else None
+        return default if value is None else value
 
 
-# ------------------- yt_dlp Helpers -------------------
 def get_playlist_entries(url):
-    """Extract playlist entries for streaming."""
+    """Extract playlist entries for streaming, as compact QueueTrack records."""
     opts = {
         "quiet": True,
         "no_warnings": True,
@@ -1062,15 +4806,338 @@ def get_playlist_entries(url):
         with yt_dlp.YoutubeDL(opts) as ydl:
             info = ydl.extract_info(url, download=False)
             if 'entries' in info and info['entries'] is not None:
-                return list(info['entries'])
+                return [QueueTrack.from_info(entry) for entry in info['entries'] if entry]
             else:
-                return [info]
+                return [QueueTrack.from_info(info)]
     except Exception as e:
         print(f"Error getting playlist entries: {e}")
         return []
 
 
+# ------------------- Waveform Seek Bar -------------------
+class WaveformSeekBar(Widget):
+    """
+    Progress bar drawn as the track's waveform from precomputed peaks (see PeaksStage),
+    or as a flat bar until peaks are available. Keeps MDProgressBar's 0-100 `value`;
+    tapping it calls on_seek(fraction).
+    """
+
+    value = NumericProperty(0)
+
+    def __init__(self, color=(0.11, 0.73, 0.33, 1), background_color=(0.3, 0.3, 0.3, 1),
+                 on_seek=None, **kwargs):
+        super().__init__(**kwargs)
+        self.on_seek = on_seek
+        self._peaks = None
+        self._columns = []
+        self._played = -1
+        with self.canvas:
+            Color(*background_color)
+            self._rest_mesh = Mesh(mode='triangles')
+            Color(*color)
+            self._played_mesh = Mesh(mode='triangles')
+        self.bind(pos=self._layout, size=self._layout, value=self._update_played)
+
+    def set_peaks(self, peaks):
+        """Show peaks as returned by load_peaks, or None for a flat bar"""
+        self._peaks = peaks
+        self._layout()
+
+    def _layout(self, *args):
+        """Rebuild the column rectangles for the current size and peaks"""
+        bar, gap = dp(2), dp(1)
+        columns = max(1, int(self.width // (bar + gap)))
+        if self._peaks:
+            count, pairs = self._peaks
+            heights = []
+            for c in range(columns):
+                start = c * count // columns
+                end = max(start + 1, (c + 1) * count // columns)
+                window = pairs[start * 2:end * 2]
+                heights.append(max(abs(v) for v in window) / 127.0 if window else 0.0)
+        else:
+            heights = [0.12] * columns
+
+        self._columns = []
+        for c, amplitude in enumerate(heights):
+            h = max(dp(2), amplitude * self.height)
+            self._columns.append((self.x + c * (bar + gap), self.center_y - h / 2.0, bar, h))
+        self._played = -1
+        self._update_played()
+
+    def _update_played(self, *args):
+        played = int(len(self._columns) * min(100.0, max(0.0, self.value)) / 100.0)
+        if played == self._played:
+            return
+        self._played = played
+        self._fill(self._played_mesh, self._columns[:played])
+        self._fill(self._rest_mesh, self._columns[played:])
+
+    @staticmethod
+    def _fill(mesh, rects):
+        vertices = []
+        indices = []
+        for i, (x, y, w, h) in enumerate(rects):
+            vertices += [x, y, 0, 0, x + w, y, 0, 0, x + w, y + h, 0, 0, x, y + h, 0, 0]
+            base = i * 4
+            indices += [base, base + 1, base + 2, base, base + 2, base + 3]
+        mesh.vertices = vertices
+        mesh.indices = indices
+
+    def on_touch_down(self, touch):
+        if self.on_seek and self.width > 0 and self.collide_point(*touch.pos):
+            self.on_seek((touch.x - self.x) / self.width)
+            return True
+        return super().on_touch_down(touch)
+
+
+# ------------------- Library List -------------------
+CONVERTIBLE_EXTENSIONS = ('.m4a', '.opus', '.ogg', '.webm')
+LIBRARY_ROW_HEIGHT = 88
+
+
+def library_row(file):
+    """Data-model entry for one library file, as shown by LibraryRow"""
+    return {
+        'file': file,
+        'title': file[:35] + "..." if len(file) > 35 else file,
+        'convertible': os.path.splitext(file)[1].lower() in CONVERTIBLE_EXTENSIONS,
+    }
+
+
+class LibraryRow(RecycleDataViewBehavior, MDCard):
+    """
+    One recycled song card in the library list. The widgets are built once and
+    rebound to a different file as the list scrolls; button presses go to the
+    DownloaderUI held by the owning LibraryListView.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(
+            size_hint_y=None,
+            height=dp(LIBRARY_ROW_HEIGHT),
+            md_bg_color=[0.09, 0.09, 0.09, 1],
+            radius=[dp(8)],
+            padding=dp(12),
+            **kwargs
+        )
+        self.file = None
+        self.list_view = None
+
+        self.card_layout = BoxLayout(spacing=dp(12))
+        play_btn = MDIconButton(
+            icon="play-circle",
+            theme_text_color="Custom",
+            text_color=[0.11, 0.73, 0.33, 1],
+            icon_size=dp(40),
+            size_hint_x=None,
+            width=dp(56)
+        )
+        play_btn.bind(on_press=lambda inst: self._dispatch('play_audio'))
+
+        # Cover thumbnail, a region of the shared atlas texture
+        self.thumb = Image(
+            size_hint_x=None,
+            width=dp(THUMB_SIZE),
+            allow_stretch=True,
+            keep_ratio=True,
+            opacity=0
+        )
+
+        info_layout = BoxLayout(orientation='vertical', size_hint_x=0.7)
+        self.file_label = MDLabel(
+            text="",
+            font_style="Body1",
+            theme_text_color="Custom",
+            text_color=[1, 1, 1, 1],
+            font_size=dp(16)
+        )
+        info_layout.add_widget(self.file_label)
+
+        # Only attached for formats that can be converted to MP3
+        self.convert_btn = MDIconButton(
+            icon="swap-horizontal",
+            theme_text_color="Custom",
+            text_color=[0.2, 0.6, 1.0, 1],
+            icon_size=dp(36),
+            size_hint_x=None,
+            width=dp(56)
+        )
+        self.convert_btn.bind(on_press=lambda inst: self._dispatch('convert_audio'))
+
+        del_btn = MDIconButton(
+            icon="delete",
+            theme_text_color="Custom",
+            text_color=[0.8, 0.2, 0.2, 1],
+            icon_size=dp(36),
+            size_hint_x=None,
+            width=dp(56)
+        )
+        del_btn.bind(on_press=lambda inst: self._dispatch('delete_audio'))
+
+        self.card_layout.add_widget(play_btn)
+        self.card_layout.add_widget(self.thumb)
+        self.card_layout.add_widget(info_layout)
+        self.card_layout.add_widget(del_btn)
+        self.add_widget(self.card_layout)
+
+    def refresh_view_attrs(self, rv, index, data):
+        """Rebind this row to the file at data"""
+        self.list_view = rv
+        self.file = data['file']
+        self.file_label.text = data['title']
+        texture = rv.ui.thumbnail_atlas.texture_for(self.file) if rv.ui is not None else None
+        self.thumb.texture = texture
+        self.thumb.opacity = 1 if texture is not None else 0
+        if data['convertible'] and self.convert_btn.parent is None:
+            # Sits between the file info and the delete button
+            self.card_layout.add_widget(self.convert_btn, index=1)
+        elif not data['convertible'] and self.convert_btn.parent is not None:
+            self.card_layout.remove_widget(self.convert_btn)
+
+    def _dispatch(self, action):
+        if self.file and self.list_view is not None and self.list_view.ui is not None:
+            getattr(self.list_view.ui, action)(self.file)
+
+
+class LibraryListView(RecycleView):
+    """
+    Virtualized library list: `data` holds one library_row dict per file and
+    only the rows on screen exist as widgets.
+    """
+
+    def __init__(self, ui=None, **kwargs):
+        super().__init__(**kwargs)
+        self.ui = ui
+        self.viewclass = LibraryRow
+        layout = RecycleBoxLayout(
+            orientation='vertical',
+            spacing=dp(12),
+            default_size=(None, dp(LIBRARY_ROW_HEIGHT)),
+            default_size_hint=(1, None),
+            size_hint_y=None
+        )
+        layout.bind(minimum_height=layout.setter('height'))
+        self.add_widget(layout)
+
+    def files(self):
+        return [row['file'] for row in self.data]
+
+    def set_files(self, files):
+        """Replace the model; a no-op when the file list hasn't changed"""
+        if self.files() == list(files):
+            return False
+        self.data = [library_row(f) for f in files]
+        return True
+
+    def _position(self, file):
+        """Binary search for file in the sorted data model"""
+        lo, hi = 0, len(self.data)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.data[mid]['file'] < file:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def update_file(self, file):
+        """Refresh the one row showing file, inserting it in order if it is new"""
+        i = self._position(file)
+        if i < len(self.data) and self.data[i]['file'] == file:
+            self.data[i] = library_row(file)
+        else:
+            self.data.insert(i, library_row(file))
+
+    def remove_file(self, file):
+        i = self._position(file)
+        if i < len(self.data) and self.data[i]['file'] == file:
+            del self.data[i]
+
+    def refresh_thumbnails(self, slots=None):
+        """Upload changed atlas tiles (or the whole atlas) and rebind the visible rows"""
+        if slots is None:
+            self.ui.thumbnail_atlas.load_textures()
+        else:
+            self.ui.thumbnail_atlas.blit_tiles(slots)
+        self.refresh_from_data()
+
 # ------------------- Queue Dialog -------------------
+QUEUE_ROW_HEIGHT = 60
+QUEUE_ROW_SPACING = 12
+
+
+class QueueRow(RecycleDataViewBehavior, MDLabel):
+    """One recycled queue line; text is built from the shared queue only when the row is shown"""
+
+    def __init__(self, **kwargs):
+        super().__init__(
+            size_hint_y=None,
+            height=dp(QUEUE_ROW_HEIGHT),
+            theme_text_color="Custom",
+            halign='left',
+            font_style="Body1",
+            **kwargs
+        )
+
+    def refresh_view_attrs(self, rv, index, data):
+        i = data['index']
+        entry = rv.queue[i] if i < len(rv.queue) else {}
+        if i == rv.current_index:
+            prefix = "▶ NOW PLAYING"
+            self.text_color = [0.11, 0.73, 0.33, 1]  # Spotify green
+        else:
+            prefix = f"{i+1}."
+            self.text_color = [1, 1, 1, 1]  # White
+        self.text = f"{prefix} {entry.get('title', 'Unknown')} - {entry.get('uploader', 'Unknown Artist')}"
+
+
+class QueueListView(RecycleView):
+    """
+    Virtualized view over the stream queue. The data model is just one index
+    per entry; rows read titles from the queue list itself, so advancing the
+    current track only refreshes the two rows that changed.
+    """
+
+    def __init__(self, queue_data, current_index, **kwargs):
+        super().__init__(**kwargs)
+        self.queue = queue_data
+        self.current_index = current_index
+        self.viewclass = QueueRow
+        layout = RecycleBoxLayout(
+            orientation='vertical',
+            spacing=dp(QUEUE_ROW_SPACING),
+            default_size=(None, dp(QUEUE_ROW_HEIGHT)),
+            default_size_hint=(1, None),
+            size_hint_y=None
+        )
+        layout.bind(minimum_height=layout.setter('height'))
+        self.add_widget(layout)
+        self.data = [{'index': i} for i in range(len(queue_data))]
+
+    def update(self, queue_data, current_index):
+        """Follow the streamer: pick up appended entries and move the now-playing marker"""
+        self.queue = queue_data
+        if len(self.data) != len(queue_data):
+            if len(self.data) < len(queue_data):
+                self.data.extend({'index': i} for i in range(len(self.data), len(queue_data)))
+            else:
+                del self.data[len(queue_data):]
+        previous, self.current_index = self.current_index, current_index
+        for i in {previous, current_index}:
+            if 0 <= i < len(self.data):
+                self.data[i] = {'index': i}
+
+    def center_on_current(self, *args):
+        """Scroll so the now-playing row sits in the middle of the view"""
+        step = dp(QUEUE_ROW_HEIGHT + QUEUE_ROW_SPACING)
+        overflow = len(self.data) * step - self.height
+        if overflow <= 0:
+            return
+        top = self.current_index * step - (self.height - dp(QUEUE_ROW_HEIGHT)) / 2
+        self.scroll_y = 1 - min(1, max(0, top / overflow))
+
+
 class QueueDialog(ModalView):
     def __init__(self, queue_data, current_index, **kwargs):
         super().__init__(**kwargs)
@@ -1097,34 +5164,9 @@ class QueueDialog(ModalView):
         )
         layout.add_widget(title_label)
 
-        # Queue list - responsive height
-        scroll = ScrollView(size_hint=(1, 0.6))
-        queue_layout = GridLayout(cols=1, spacing=dp(12), size_hint_y=None)
-        queue_layout.bind(minimum_height=queue_layout.setter('height'))
-
-        for i, entry in enumerate(queue_data):
-            if i == current_index:
-                prefix = "▶ NOW PLAYING"
-                color = [0.11, 0.73, 0.33, 1]  # Spotify green
-            else:
-                prefix = f"{i+1}."
-                color = [1, 1, 1, 1]  # White
-
-            track_text = f"{prefix} {entry.get('title', 'Unknown')} - {entry.get('uploader', 'Unknown Artist')}"
-            track_label = MDLabel(
-                text=track_text,
-                size_hint_y=None,
-                height=dp(60),
-                theme_text_color="Custom",
-                text_color=color,
-                halign='left',
-                font_style="Body1"
-            )
-            queue_layout.add_widget(track_label)
-
-        queue_layout.height = len(queue_data) * dp(72)
-        scroll.add_widget(queue_layout)
-        layout.add_widget(scroll)
+        # Queue list - responsive height; only visible rows are widgets
+        self.queue_view = QueueListView(queue_data, current_index, size_hint=(1, 0.6))
+        layout.add_widget(self.queue_view)
 
         # Close button - larger for mobile
         close_btn = MDRaisedButton(
@@ -1138,6 +5180,10 @@ class QueueDialog(ModalView):
         layout.add_widget(close_btn)
 
         self.add_widget(layout)
+        self.bind(on_open=lambda *args: Clock.schedule_once(self.queue_view.center_on_current))
+
+    def update(self, queue_data, current_index):
+        self.queue_view.update(queue_data, current_index)
 
     def _update_bg(self, instance, value):
         self.bg_rect.pos = self.pos
@@ -1171,7 +5217,7 @@ class DownloadManager:
                 self._download_audio_mobile(url)
             else:
                 self._download_audio_desktop(url)
-            Clock.schedule_once(lambda dt: self.ui.refresh_file_list())
+            Clock.schedule_once(lambda dt: self.ui.sync_library())
             Clock.schedule_once(lambda dt: self.ui.log("✅ Download completed."))
         except Exception as e:
             Clock.schedule_once(lambda dt: self.ui.log(f"❌ Download error: {e}"))
@@ -1201,7 +5247,7 @@ class DownloadManager:
         total_items = len(entries)
         log_safe(self.ui.log, f"🔎 Found {total_items} item(s). Starting download...")
 
-        Clock.schedule_once(lambda dt: self.ui.update_download_title(f"Downloading {total_items} items..."))
+        get_ui_update_bus().publish('download_title', self.ui.update_download_title, f"Downloading {total_items} items...")
 
         for i, entry in enumerate(entries):
             if self.download_stop_flag:
@@ -1210,7 +5256,7 @@ class DownloadManager:
 
             progress = (i / total_items) * 100 if total_items > 0 else 0
             status = f"Downloading {i+1}/{total_items}: {entry.get('title', '')[:30]}..."
-            Clock.schedule_once(lambda dt, p=progress, s=status: self.ui.update_download_progress(p, s))
+            get_ui_update_bus().publish('download_progress', self.ui.update_download_progress, progress, status)
             Clock.schedule_once(lambda dt, e=entry, idx=i: self.ui.log(f"🎶 Downloading {idx+1}/{total_items}: {e.get('title','')}"))
 
             # Mobile mode: ONLY MP3 and OGG containers (pygame on Android cannot play WebM/M4A/Opus)
@@ -1274,7 +5320,7 @@ class DownloadManager:
                 Clock.schedule_once(lambda dt, t=entry.get('title',''), err=e: self.ui.log(f"❌ Error downloading {t}: {err}"))
 
         if not self.download_stop_flag:
-            Clock.schedule_once(lambda dt: self.ui.update_download_progress(100, "Download completed!"))
+            get_ui_update_bus().publish('download_progress', self.ui.update_download_progress, 100, "Download completed!")
 
         # cleanup temp folder if exists
         try:
@@ -1300,7 +5346,7 @@ class DownloadManager:
         total_items = len(entries)
         log_safe(self.ui.log, f"🔎 Found {total_items} item(s). Starting download...")
 
-        Clock.schedule_once(lambda dt: self.ui.update_download_title(f"Downloading {total_items} items..."))
+        get_ui_update_bus().publish('download_title', self.ui.update_download_title, f"Downloading {total_items} items...")
 
         for i, entry in enumerate(entries):
             if self.download_stop_flag:
@@ -1309,7 +5355,7 @@ class DownloadManager:
 
             progress = (i / total_items) * 100 if total_items > 0 else 0
             status = f"Downloading {i+1}/{total_items}: {entry.get('title', '')[:30]}..."
-            Clock.schedule_once(lambda dt, p=progress, s=status: self.ui.update_download_progress(p, s))
+            get_ui_update_bus().publish('download_progress', self.ui.update_download_progress, progress, status)
             Clock.schedule_once(lambda dt, e=entry, idx=i: self.ui.log(f"🎶 Downloading {idx+1}/{total_items}: {e.get('title','')}"))
 
             ydl_opts = {
@@ -1359,7 +5405,7 @@ class DownloadManager:
                 Clock.schedule_once(lambda dt, t=entry.get('title',''), err=e: self.ui.log(f"❌ Error downloading {t}: {err}"))
 
         if not self.download_stop_flag:
-            Clock.schedule_once(lambda dt: self.ui.update_download_progress(100, "Download completed!"))
+            get_ui_update_bus().publish('download_progress', self.ui.update_download_progress, 100, "Download completed!")
 
         # cleanup temp folder if exists
         try:
@@ -1404,6 +5450,176 @@ class DownloadManager:
             return None
 
 
+# ------------------- Playback Clock -------------------
+class PlaybackClock:
+    """
+    Reports the playback position from the backend's own clock (sound.get_pos()),
+    falling back to a monotonic clock for backends that don't report one. The fallback
+    is continuously compared against the backend and re-anchored when they drift apart.
+    """
+
+    DRIFT_TOLERANCE = 0.25  # seconds of disagreement before re-anchoring the fallback
+
+    def __init__(self):
+        self.sound = None
+        self._anchor_position = 0.0
+        self._anchor_time = time.monotonic()
+        self._paused = True
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.samples = 0
+        self.corrections = 0
+        self._drift_total = 0.0
+        self.max_drift = 0.0
+
+    def start(self, sound, position=0.0):
+        """Begin timing a newly started sound"""
+        with self._lock:
+            self.sound = sound
+            self._anchor(position)
+            self._paused = False
+
+    def pause(self):
+        """Freeze the clock; returns the position it was paused at"""
+        position = self.position()
+        with self._lock:
+            self._anchor(position)
+            self._paused = True
+        return position
+
+    def resume(self, position=None):
+        """Restart the clock, optionally from an explicit position"""
+        with self._lock:
+            if position is not None:
+                self._anchor(position)
+            else:
+                self._anchor(self._anchor_position)
+            self._paused = False
+
+    def seek(self, position):
+        with self._lock:
+            self._anchor(position)
+
+    def stop(self):
+        with self._lock:
+            self.sound = None
+            self._anchor(0.0)
+            self._paused = True
+
+    def _anchor(self, position):
+        self._anchor_position = max(0.0, float(position or 0))
+        self._anchor_time = time.monotonic()
+
+    def _fallback_position(self):
+        if self._paused:
+            return self._anchor_position
+        return self._anchor_position + (time.monotonic() - self._anchor_time)
+
+    def _backend_position(self):
+        """Position reported by the backend, or None if it doesn't provide one"""
+        sound = self.sound
+        if sound is None or not hasattr(sound, 'get_pos'):
+            return None
+        try:
+            pos = sound.get_pos()
+        except Exception:
+            return None
+        # Providers without position support report 0 for the whole track
+        if pos is None or pos <= 0:
+            return None
+        return float(pos)
+
+    def position(self):
+        """Current playback position in seconds"""
+        with self._lock:
+            fallback = self._fallback_position()
+            if self._paused:
+                return fallback
+
+            backend = self._backend_position()
+            if backend is None:
+                return fallback
+
+            drift = backend - fallback
+            self.samples += 1
+            self._drift_total += abs(drift)
+            self.max_drift = max(self.max_drift, abs(drift))
+            if abs(drift) > self.DRIFT_TOLERANCE:
+                self.corrections += 1
+            # Keep the fallback locked to the backend so a backend dropout doesn't jump
+            self._anchor(backend)
+            return backend
+
+    def drift_stats(self):
+        """Return drift statistics between the backend and the monotonic fallback"""
+        with self._lock:
+            mean = self._drift_total / self.samples if self.samples else 0.0
+            return {
+                'samples': self.samples,
+                'mean_drift_ms': mean * 1000,
+                'max_drift_ms': self.max_drift * 1000,
+                'corrections': self.corrections,
+            }
+
+
+def track_duration(entry, sound):
+    """Best known duration in seconds: the entry's metadata, then the decoder's length"""
+    duration = 0
+    if entry:
+        try:
+            duration = float(entry.get('duration') or 0)
+        except Exception:
+            duration = 0
+    if duration <= 0 and sound is not None:
+        duration = getattr(sound, 'length', 0) or 0
+    return duration
+
+
+# ------------------- Track Gap Measurement -------------------
+class TrackGapRecorder:
+    """Records the dead air between one track ending and the next one starting"""
+
+    def __init__(self, max_samples=500):
+        self.samples = deque(maxlen=max_samples)
+        self._ended_at = None
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self.samples.clear()
+            self._ended_at = None
+
+    def mark_end(self):
+        """Call when a track finishes, is skipped or is faded out"""
+        with self._lock:
+            self._ended_at = time.perf_counter()
+
+    def mark_start(self):
+        """Call when the next track starts producing audio; returns the gap in seconds"""
+        with self._lock:
+            if self._ended_at is None:
+                return None
+            gap = time.perf_counter() - self._ended_at
+            self._ended_at = None
+            self.samples.append(gap)
+            return gap
+
+    def summary(self):
+        """Return gap statistics in milliseconds"""
+        with self._lock:
+            gaps = sorted(self.samples)
+        if not gaps:
+            return {'count': 0, 'mean_ms': 0.0, 'p95_ms': 0.0, 'max_ms': 0.0}
+        return {
+            'count': len(gaps),
+            'mean_ms': sum(gaps) / len(gaps) * 1000,
+            'p95_ms': gaps[min(len(gaps) - 1, int(len(gaps) * 0.95))] * 1000,
+            'max_ms': gaps[-1] * 1000,
+        }
+
+
 # ------------------- Stream Player -------------------
 class StreamPlayer:
     def __init__(self, ui, is_android=False):
@@ -1415,22 +5631,58 @@ class StreamPlayer:
         self.current_entry = None
         self.queue = []
         self.current_index = 0
+        self.queue_dialog = None
         self.temp_dir = "stream_cache"
         os.makedirs(self.temp_dir, exist_ok=True)
         self.next_download_thread = None
         self.current_file = None
         self.progress_update_event = None
-        self.playback_start_time = 0
-        self.total_paused_time = 0
-        self.last_pause_time = 0
+        self.playback_clock = PlaybackClock()
         self.played_files = set()  # Track played files for cleanup
         self.stream_stop_flag = False  # Separate flag for stream cancellation
+        self.streaming = False  # stream_playlist is running (and owns the shared player)
         self.pause_position = 0  # Track position when paused
         self.mobile_mode = False  # Mobile mode flag
         self.audio_converter = AudioConverter()  # Audio converter for m4a files
-        self.using_pygame = False  # Track if using pygame fallback player
         self.is_android = is_android
-        self.wake_lock_manager = WakeLockManager(is_android=is_android)
+        self.backends = make_audio_backends(is_android=is_android)
+        self.backend = None  # Backend that loaded the current track
+        self.wake_lock_manager = get_wake_lock_manager(is_android=is_android)
+        # Wakes play_song on track end, pause/resume, skip and stop instead of polling
+        self._playback_cond = threading.Condition()
+        self._track_ended = False
+        self.gap_recorder = TrackGapRecorder()
+        # Gapless playback: the next track is decoded and armed while the current one plays
+        self.gapless = True
+        self.crossfade_seconds = 0.0
+        self.replaygain = True  # Play tracks at their analysed ReplayGain level
+        self.trim_silence = True  # Skip analysed leading/trailing silence
+        self._track_end = None  # Trimmed end of the current track, if any
+        self.dead_air_removed = 0.0  # Seconds of silence skipped in the current playlist
+        self.tracks_trimmed = 0
+        self._armed = None
+        self._crossfade_event = None
+        self._fade = None
+
+    def _signal_playback(self, ended=False):
+        """Wake the thread waiting in play_song"""
+        with self._playback_cond:
+            if ended:
+                self._track_ended = True
+            self._playback_cond.notify_all()
+
+    def set_audio_backend(self, name="auto", speed=1.0):
+        """Choose the playback backend(s): 'auto', 'kivy', 'pygame' or 'null'"""
+        is_mobile = self.env_detector.is_mobile if getattr(self, 'env_detector', None) else False
+        self.backends = make_audio_backends(name, is_mobile=is_mobile, is_android=self.is_android, speed=speed)
+
+    def _on_sound_stop(self, sound, *args):
+        """on_stop handler for playback tracks"""
+        # Ignore stops from stale tracks, or while paused
+        if sound is not self.sound or self.pause_flag:
+            return
+        self.gap_recorder.mark_end()
+        self._signal_playback(ended=True)
 
     def cleanup_temp_directory(self):
         """Safely remove files in temp_dir but do not remove file currently playing."""
@@ -1469,16 +5721,10 @@ class StreamPlayer:
                 file_path = os.path.join(self.temp_dir, filename)
                 if os.path.exists(file_path):
                     try:
-                        # Extract cover art BEFORE deleting the audio file
-                        cover_path = extract_cover_art(file_path)
                         os.remove(file_path)
                         files_deleted += 1
-                        # Also clean up cover art if present
-                        if cover_path and os.path.exists(cover_path):
-                            try:
-                                os.remove(cover_path)
-                            except Exception as e:
-                                log_safe(self.ui.log, f"⚠️ Could not delete cover art {cover_path}: {e}")
+                        # Drop its cover reference; shared art stays for other tracks
+                        get_cover_store().release(os.path.abspath(file_path))
                     except Exception as e:
                         log_safe(self.ui.log, f"⚠️ Could not delete {filename}: {e}")
                 try:
@@ -1492,24 +5738,21 @@ class StreamPlayer:
         except Exception as e:
             log_safe(self.ui.log, f"⚠️ Error during cleanup: {e}")
 
+    def is_stream_cache_file(self, file_path):
+        """True for files this player downloaded into its cache (never library files)"""
+        return os.path.dirname(os.path.abspath(file_path)) == os.path.abspath(self.temp_dir)
+
     def safe_delete_file(self, file_path):
         """Safely delete a file with error handling"""
         try:
-            if file_path and os.path.exists(file_path):
-                # Extract cover art before removing audio file
-                cover_path = extract_cover_art(file_path)
+            if file_path and os.path.exists(file_path) and self.is_stream_cache_file(file_path):
                 try:
                     os.remove(file_path)
                 except Exception as e:
                     log_safe(self.ui.log, f"⚠️ Could not delete {os.path.basename(file_path)}: {e}")
                     return False
-
-                # delete cached cover art if any
-                if cover_path and os.path.exists(cover_path):
-                    try:
-                        os.remove(cover_path)
-                    except Exception as e:
-                        log_safe(self.ui.log, f"⚠️ Could not delete cover art {cover_path}: {e}")
+                get_analysis_index().discard(file_path)
+                get_cover_store().release(os.path.abspath(file_path))
                 return True
         except Exception as e:
             log_safe(self.ui.log, f"⚠️ Could not delete {os.path.basename(file_path)}: {e}")
@@ -1517,12 +5760,14 @@ class StreamPlayer:
 
     def stream_playlist(self, url):
         """Queue and play songs sequentially, pre-downloading next."""
+        self.streaming = True
         self.stop_flag = False
         self.stream_stop_flag = False
         self.pause_flag = False
         self.skip_flag = False
         self.current_index = 0
         self.played_files.clear()
+        self.gap_recorder.reset()
 
         # Clean up temp directory before starting new stream
         self.cleanup_temp_directory()
@@ -1533,79 +5778,276 @@ class StreamPlayer:
                 log_safe(self.ui.log, "❌ No entries found or invalid URL")
                 return
 
-            speed = detect_speed()
-            log_safe(self.ui.log, f"🌐 Detected speed: {speed}")
-            log_safe(self.ui.log, f"📜 Found {len(entries)} track(s).")
+            speed = detect_speed()
+            log_safe(self.ui.log, f"🌐 Detected speed: {speed}")
+            log_safe(self.ui.log, f"📜 Found {len(entries)} track(s).")
+
+            self.queue = entries
+            self.play_queue(entries, lambda entry: self.download_song(entry, speed))
+
+            if not self.stop_flag and not self.stream_stop_flag:
+                log_safe(self.ui.log, "✅ Playlist finished.")
+
+            gaps = self.gap_recorder.summary()
+            if gaps['count']:
+                log_safe(self.ui.log, f"⏱️ Track gaps: mean {gaps['mean_ms']:.0f} ms, "
+                                      f"p95 {gaps['p95_ms']:.0f} ms, max {gaps['max_ms']:.0f} ms "
+                                      f"over {gaps['count']} transition(s)")
+
+        except Exception as e:
+            log_safe(self.ui.log, f"❌ Error in stream_playlist: {e}")
+        finally:
+            self.streaming = False
+            self.disarm_next()
+            # Clear queue display when done
+            get_ui_update_bus().publish('queue', self.ui.clear_queue_display)
+            # Final cleanup - delete all remaining files (except possibly a playing file)
+            self.cleanup_temp_directory()
+
+    def play_queue(self, entries, fetch, delete_played=True):
+        """
+        Play entries in order, fetching the next one in the background and arming it
+        for gapless playback while the current track plays.
+
+        Args:
+            entries: List of entry dicts (yt-dlp info or local track info)
+            fetch: Function mapping an entry to a playable file path (or None)
+            delete_played: Remove each file once it has been played
+        """
+        self.dead_air_removed = 0.0
+        self.tracks_trimmed = 0
+        try:
+            self._play_entries(entries, fetch, delete_played)
+        finally:
+            if self.tracks_trimmed:
+                log_safe(self.ui.log, f"✂️ Trimmed {format_time(self.dead_air_removed)} of silence "
+                                      f"from {self.tracks_trimmed} track(s)")
+
+    def _play_entries(self, entries, fetch, delete_played):
+        for i in range(len(entries)):
+            if self.stop_flag or self.stream_stop_flag:
+                break
+
+            self.current_index = i
+            entry = entries[i]
+
+            # Wait for previous download to finish if it exists
+            if self.next_download_thread and self.next_download_thread.is_alive():
+                self.next_download_thread.join(timeout=30)
+
+            # Show download progress in the UI
+            Clock.schedule_once(lambda dt: self.ui.show_stream_progress())
+            get_ui_update_bus().publish('stream_progress', self.ui.update_stream_progress, 0, f"Downloading: {entry.get('title', 'Unknown')[:30]}...")
+
+            filename = fetch(entry)
 
-            self.queue = entries
+            # Hide stream progress when done
+            Clock.schedule_once(lambda dt: self.ui.hide_stream_progress())
 
-            for i in range(len(entries)):
-                if self.stop_flag or self.stream_stop_flag:
-                    break
+            if not filename:
+                log_safe(self.ui.log, f"⚠️ Failed to download {entry.get('title')}, skipping...")
+                continue
 
-                self.current_index = i
-                entry = entries[i]
+            # Start background download of next song, arming it once it lands
+            if i + 1 < len(entries):
+                next_entry = entries[i + 1]
+                self.next_download_thread = threading.Thread(
+                    target=self._prefetch_next,
+                    args=(next_entry, fetch),
+                    daemon=True
+                )
+                self.next_download_thread.start()
 
-                # Wait for previous download to finish if it exists
-                if self.next_download_thread and self.next_download_thread.is_alive():
-                    self.next_download_thread.join(timeout=30)
+            # Update queue display
+            get_ui_update_bus().publish('queue', self.ui.update_queue_display, self.queue, self.current_index)
 
-                # Show download progress in the UI
-                Clock.schedule_once(lambda dt: self.ui.show_stream_progress())
-                Clock.schedule_once(lambda dt: self.ui.update_stream_progress(0, f"Downloading: {entry.get('title', 'Unknown')[:30]}..."))
+            # Play the song
+            playback_success = self.play_song(filename, entry)
 
-                filename = self.download_song(entry, speed)
+            # Clean up the played file off the playback path so the next track starts sooner
+            if delete_played:
+                threading.Thread(target=self._cleanup_after_track, args=(filename,), daemon=True).start()
 
-                # Hide stream progress when done
-                Clock.schedule_once(lambda dt: self.ui.hide_stream_progress())
+            if not playback_success and not self.stop_flag and not self.skip_flag and not self.stream_stop_flag:
+                log_safe(self.ui.log, f"⏭️ Skipping unplayable song: {entry.get('title')}")
+                continue
 
-                if not filename:
-                    log_safe(self.ui.log, f"⚠️ Failed to download {entry.get('title')}, skipping...")
-                    continue
+    def _cleanup_after_track(self, filename):
+        """Delete a played file and any other played files"""
+        if filename and os.path.exists(filename):
+            self.safe_delete_file(filename)
+            log_safe(self.ui.log, f"🧹 Deleted: {os.path.basename(filename)}")
+
+        # Clean up any other played files
+        self.cleanup_played_files()
+
+    def _prefetch_next(self, entry, fetch):
+        """Fetch the next entry and, in gapless mode, decode and arm it"""
+        filepath = fetch(entry)
+        if filepath and self.gapless and not self.stream_stop_flag:
+            self.arm_next(filepath)
+
+    def arm_next(self, filepath):
+        """Load the next track ahead of time so it can start the moment the current one ends"""
+        self.disarm_next()
+        # Only backends that can hold a second track alongside the playing one can arm;
+        # the pygame fallback shares one music stream, so it is loaded when its turn comes
+        preload_backends = [b for b in self.backends if b.supports_preload]
+        if not preload_backends:
+            return False
+        sound, backend = load_track(filepath, preload_backends[:1])
+        if not sound:
+            return False
 
-                # Start background download of next song
-                if i + 1 < len(entries):
-                    next_entry = entries[i + 1]
-                    self.next_download_thread = threading.Thread(
-                        target=self.download_song,
-                        args=(next_entry, speed),
-                        daemon=True
-                    )
-                    self.next_download_thread.start()
+        with self._playback_cond:
+            self._armed = {'path': filepath, 'sound': sound, 'backend': backend, 'started': False,
+                           'volume': self.track_volume(filepath), 'trim': self.track_trim(filepath)}
+        return True
 
-                # Update queue display
-                Clock.schedule_once(lambda dt, q=self.queue, idx=self.current_index: self.ui.update_queue_display(q, idx))
+    def disarm_next(self):
+        """Drop a pre-loaded next track that won't be played"""
+        with self._playback_cond:
+            armed, self._armed = self._armed, None
+        if armed:
+            try:
+                armed['sound'].stop()
+                armed['sound'].unload()
+            except Exception:
+                pass
 
-                # Play the song
-                playback_success = self.play_song(filename, entry)
+    def _take_armed(self, filepath):
+        """Return the armed track for filepath (removing it), or None"""
+        with self._playback_cond:
+            armed = self._armed
+            if armed and os.path.abspath(armed['path']) == os.path.abspath(filepath):
+                self._armed = None
+                return armed
+        if armed:
+            self.disarm_next()
+        return None
 
-                # Immediately clean up the played file after playback
-                if filename and os.path.exists(filename):
-                    self.safe_delete_file(filename)
-                    log_safe(self.ui.log, f"🧹 Deleted: {os.path.basename(filename)}")
+    def _schedule_crossfade(self):
+        """Start fading into the armed track crossfade_seconds before the current one ends"""
+        self._cancel_crossfade()
+        if (self.crossfade_seconds <= 0 or not self.sound or
+                not self.backend or not self.backend.supports_preload):
+            return
+        length = self._track_end or getattr(self.sound, 'length', 0) or 0
+        if length <= self.crossfade_seconds * 2:
+            return
+        try:
+            position = self.sound.get_pos() or 0
+        except Exception:
+            position = 0
+        delay = max(0, length - self.crossfade_seconds - position)
+        self._crossfade_event = Clock.schedule_once(self._begin_crossfade, delay)
 
-                # Clean up any other played files
-                self.cleanup_played_files()
+    def _cancel_crossfade(self):
+        if self._crossfade_event:
+            try:
+                self._crossfade_event.cancel()
+            except Exception:
+                pass
+            self._crossfade_event = None
+
+    def _begin_crossfade(self, dt):
+        """Start the armed track silently and hand the current one to the fader"""
+        self._crossfade_event = None
+        with self._playback_cond:
+            armed = self._armed
+            outgoing = self.sound
+            if (not armed or armed['started'] or not outgoing or self.pause_flag or
+                    self.stop_flag or self.stream_stop_flag):
+                return
+            armed['started'] = True
 
-                if not playback_success and not self.stop_flag and not self.skip_flag and not self.stream_stop_flag:
-                    log_safe(self.ui.log, f"⏭️ Skipping unplayable song: {entry.get('title')}")
-                    continue
+        incoming = armed['sound']
+        try:
+            incoming.volume = 0
+            incoming.play_from(armed['trim'][0])
+        except Exception:
+            armed['started'] = False
+            return
 
-            if not self.stop_flag and not self.stream_stop_flag:
-                log_safe(self.ui.log, "✅ Playlist finished.")
+        # The outgoing sound now belongs to the fader; end the current track for play_song
+        try:
+            outgoing.unbind(on_stop=self._on_sound_stop)
+        except Exception:
+            pass
+        self._start_fade(outgoing, incoming, armed['volume'])
+        self.gap_recorder.mark_end()
+        with self._playback_cond:
+            self.sound = None
+            self._track_ended = True
+            self._playback_cond.notify_all()
+
+    def _start_fade(self, outgoing, incoming, target_volume=1.0):
+        """Ramp outgoing down and incoming up to target_volume over crossfade_seconds (equal-power curve)"""
+        self._finish_fade()
+        start = time.monotonic()
+        duration = max(0.05, self.crossfade_seconds)
+        try:
+            outgoing_volume = outgoing.volume
+        except Exception:
+            outgoing_volume = 1.0
 
-        except Exception as e:
-            log_safe(self.ui.log, f"❌ Error in stream_playlist: {e}")
-        finally:
-            # Clear queue display when done
-            Clock.schedule_once(lambda dt: self.ui.clear_queue_display())
-            # Final cleanup - delete all remaining files (except possibly a playing file)
-            self.cleanup_temp_directory()
+        def step(dt):
+            t = min(1.0, (time.monotonic() - start) / duration)
+            try:
+                outgoing.volume = outgoing_volume * (1.0 - t) ** 0.5
+                incoming.volume = target_volume * t ** 0.5
+            except Exception:
+                pass
+            if t >= 1.0:
+                self._finish_fade()
+                return False
+
+        self._fade = {'outgoing': outgoing, 'incoming': incoming, 'target': target_volume,
+                      'event': Clock.schedule_interval(step, 1 / 30.0)}
+
+    def _finish_fade(self):
+        """Stop an in-progress fade, silencing and releasing the outgoing sound"""
+        fade, self._fade = self._fade, None
+        if not fade:
+            return
+        try:
+            fade['event'].cancel()
+        except Exception:
+            pass
+        try:
+            fade['incoming'].volume = fade['target']
+        except Exception:
+            pass
+        try:
+            fade['outgoing'].stop()
+            fade['outgoing'].unload()
+        except Exception:
+            pass
 
     def set_mobile_mode(self, enabled):
         """Set mobile mode on/off"""
         self.mobile_mode = enabled
 
+    def seek_to(self, position):
+        """Jump within the current track (ignored while paused)"""
+        if not self.sound or self.pause_flag:
+            return False
+        try:
+            self.sound.seek(position)
+        except Exception:
+            return False
+        self.playback_clock.seek(position)
+        self._schedule_crossfade()
+        return True
+
+    def track_trim(self, filepath):
+        """(start, end) playback window for a track; (0, None) when trimming is off"""
+        return track_trim(filepath) if self.trim_silence else (0.0, None)
+
+    def track_volume(self, filepath):
+        """Playback volume for a track: its ReplayGain level when enabled, else full volume"""
+        return replaygain_volume(filepath) if self.replaygain else 1.0
+
     def download_song(self, entry, speed):
         """Download full song to temp folder based on speed quality and mode."""
         try:
@@ -1617,6 +6059,12 @@ class StreamPlayer:
             out_path_template = os.path.join(self.temp_dir, f"{safe_title}.%(ext)s")
             os.makedirs(self.temp_dir, exist_ok=True)
 
+            # Play the library copy if this track was downloaded before
+            local_copy = get_library_index().find_source(entry.get("id"))
+            if local_copy:
+                log_safe(self.ui.log, f"📚 Playing library copy: {os.path.basename(local_copy)}")
+                return local_copy
+
             # Check for existing files
             for ext in ['.mp3', '.m4a', '.webm']:
                 expected_file = os.path.join(self.temp_dir, f"{safe_title}{ext}")
@@ -1646,10 +6094,10 @@ class StreamPlayer:
                         total_size = d.get('_total_bytes_str', 'N/A')
                         if not self.stream_stop_flag:
                             status_text = f"Downloading: {speed_str} - {total_size}"
-                            Clock.schedule_once(lambda dt, p=percent, s=status_text: self.ui.update_stream_progress(p, s))
+                            get_ui_update_bus().publish('stream_progress', self.ui.update_stream_progress, percent, status_text)
 
                     elif d.get('status') == 'finished' and not self.stream_stop_flag:
-                        Clock.schedule_once(lambda dt: self.ui.update_stream_progress(100, "Processing..."))
+                        get_ui_update_bus().publish('stream_progress', self.ui.update_stream_progress, 100, "Processing...")
                 except Exception:
                     pass
 
@@ -1706,6 +6154,12 @@ class StreamPlayer:
                 except Exception:
                     pass
 
+                # Measure loudness and waveform peaks while the track waits its turn
+                # (index only, the file is temporary)
+                analyzer = getattr(self.ui, 'library_analyzer', None)
+                if analyzer:
+                    analyzer.submit(actual_path, write_tags=False)
+
                 log_safe(self.ui.log, f"🎵 Downloaded: {safe_title}")
                 return actual_path
             else:
@@ -1732,69 +6186,52 @@ class StreamPlayer:
 
         self.current_file = filepath
         self.current_entry = entry
-        self.using_pygame = False
-
-        # Try to load the sound file with Kivy's SoundLoader first
-        try:
-            self.sound = SoundLoader.load(filepath)
-            if not self.sound:
-                # Kivy failed, try pygame as fallback
-                log_safe(self.ui.log, f"ℹ️ Kivy SoundLoader failed, trying pygame fallback...")
-                is_mobile = self.env_detector.is_mobile if hasattr(self, 'env_detector') and self.env_detector else False
-                pygame_player = PygameAudioPlayer(is_mobile=is_mobile, is_android=self.is_android)
-                if pygame_player.load(filepath):
-                    self.sound = pygame_player
-                    self.using_pygame = True
-                    log_safe(self.ui.log, f"✅ Using pygame fallback for: {entry.get('title')}")
-                else:
-                    log_safe(self.ui.log, f"❌ Could not load audio file with any player: {entry.get('title')}")
-                    self.safe_delete_file(filepath)
-                    return False
 
-            # Test if the sound is playable
-            if not hasattr(self.sound, 'length') or self.sound.length <= 0:
-                log_safe(self.ui.log, f"❌ Invalid audio file: {entry.get('title')}")
-                try:
-                    if hasattr(self.sound, 'unload'):
-                        self.sound.unload()
-                except Exception:
-                    pass
-                self.sound = None
-                self.safe_delete_file(filepath)
-                return False
+        # A track armed ahead of time skips loading and playability tests (and may
+        # already be playing if a crossfade started it)
+        armed = self._take_armed(filepath)
+        if armed:
+            self.sound = armed['sound']
+            self.backend = armed['backend']
+            return self._run_track(filepath, entry, already_playing=armed['started'])
+
+        # Try each backend in order (Kivy SoundLoader first, then the pygame fallback)
+        self.sound, self.backend = load_track(filepath, self.backends, self.ui.log)
+        if not self.sound:
+            log_safe(self.ui.log, f"❌ Could not load audio file with any player: {entry.get('title')}")
+            self.safe_delete_file(filepath)
+            return False
+        if self.backend is not self.backends[0]:
+            log_safe(self.ui.log, f"✅ Using {self.backend.name} fallback for: {entry.get('title')}")
 
-        except Exception as e:
-            # Kivy failed, try pygame as fallback
-            log_safe(self.ui.log, f"ℹ️ Kivy error: {e}, trying pygame fallback...")
-            try:
-                is_mobile = self.env_detector.is_mobile if hasattr(self, 'env_detector') and self.env_detector else False
-                pygame_player = PygameAudioPlayer(is_mobile=is_mobile, is_android=self.is_android)
-                if pygame_player.load(filepath):
-                    self.sound = pygame_player
-                    self.using_pygame = True
-                    log_safe(self.ui.log, f"✅ Using pygame fallback for: {entry.get('title')}")
-                else:
-                    log_safe(self.ui.log, f"❌ Could not load audio file with any player: {entry.get('title')}")
-                    self.safe_delete_file(filepath)
-                    return False
-            except Exception as e2:
-                log_safe(self.ui.log, f"❌ Both Kivy and pygame failed: {e2}")
-                self.safe_delete_file(filepath)
-                return False
+        return self._run_track(filepath, entry)
 
-        # Reset timing variables
-        self.playback_start_time = time.time()
-        self.total_paused_time = 0
-        self.last_pause_time = 0
+    def _run_track(self, filepath, entry, already_playing=False):
+        """Start the loaded self.sound and block until it ends, is skipped or stopped."""
         self.skip_flag = False
+        with self._playback_cond:
+            self._track_ended = False
 
         # Update UI with current track info and cover art
-        Clock.schedule_once(lambda dt, e=entry, fp=filepath: self.ui.update_current_track(e, fp))
+        get_ui_update_bus().publish('current_track', self.ui.update_current_track, entry, filepath)
+
+        # Skip analysed leading/trailing silence
+        trim_start, trim_end = self.track_trim(filepath)
+        self._track_end = trim_end
 
         try:
-            self.sound.play()
+            self.sound.bind(on_stop=self._on_sound_stop)
+            if not already_playing:
+                # Set every track: the shared pygame stream keeps the previous track's volume
+                self.sound.volume = self.track_volume(filepath)
+                if trim_start > 0:
+                    self.sound.play_from(trim_start)
+                else:
+                    self.sound.play()
+            self.playback_clock.start(self.sound, 0.0 if already_playing else trim_start)
+            self.gap_recorder.mark_start()
             # Acquire wake lock for background playback
-            self.wake_lock_manager.acquire()
+            self.wake_lock_manager.acquire("stream")
             log_safe(self.ui.log, f"▶️ Now playing: {entry.get('title', 'Unknown')}")
         except Exception as e:
             log_safe(self.ui.log, f"❌ Error playing {entry.get('title')}: {e}")
@@ -1803,47 +6240,65 @@ class StreamPlayer:
 
         # Start progress updates
         self.start_progress_updates()
+        self._schedule_crossfade()
 
         # Calculate duration (use entry duration or sound length)
-        duration = entry.get('duration', 0) or 0
-        if duration <= 0 and self.sound:
-            duration = self.sound.length or 0
+        duration = track_duration(entry, self.sound)
 
-        # Wait until song ends or user stops/skips
-        start_time = time.time()
-        timeout = duration + 10 if duration > 0 else 300  # default timeout if unknown
+        # Block until the backend reports the end, or the user stops/skips.
+        # The watchdog only counts time spent playing, so long pauses don't end the song.
+        watchdog = duration + 10 if duration > 0 else 300  # default timeout if unknown
 
         playback_success = True
+        ended_at_trim = False
         try:
-            while (self.sound and
-                   not self.stop_flag and not self.skip_flag and not self.stream_stop_flag and
-                   (time.time() - start_time) < timeout):
+            with self._playback_cond:
+                while (self.sound and not self._track_ended and
+                       not self.stop_flag and not self.skip_flag and not self.stream_stop_flag):
+                    if self.pause_flag:
+                        self._playback_cond.wait()
+                        continue
 
-                # Check if sound is still valid and playing (or paused)
-                sound_state = getattr(self.sound, 'state', None)
-                if sound_state != 'play' and not self.pause_flag:
-                    # Song ended naturally (only exit if not paused)
-                    break
+                    # A trimmed track ends at its last audible moment, not the end of the file
+                    timeout = watchdog
+                    if trim_end is not None:
+                        remaining = trim_end - self.playback_clock.position()
+                        if remaining <= 0:
+                            self.gap_recorder.mark_end()
+                            self._track_ended = ended_at_trim = True
+                            break
+                        timeout = min(timeout, remaining)
 
-                if self.pause_flag:
-                    # Wait while paused (sound is stopped but we're waiting to resume)
-                    while self.pause_flag and not self.stop_flag and not self.skip_flag and not self.stream_stop_flag:
-                        time.sleep(0.1)
-                    # After resuming, continue the loop to check if song is still playing
-                else:
-                    time.sleep(0.5)
+                    waited_from = time.monotonic()
+                    self._playback_cond.wait(timeout=timeout)
+                    if not self.pause_flag:
+                        watchdog -= time.monotonic() - waited_from
+                        if watchdog <= 0:
+                            break
         except Exception as e:
             log_safe(self.ui.log, f"❌ Playback error for {entry.get('title')}: {e}")
             playback_success = False
 
         self.stop_progress_updates()
+        self._cancel_crossfade()
+        self.playback_clock.stop()
+        self._track_end = None
+
+        # Tally the dead air skipped for the playlist report
+        removed = trim_start
+        if ended_at_trim:
+            removed += max(0.0, (getattr(self.sound, 'length', 0) or duration) - trim_end)
+        if removed > 0:
+            self.dead_air_removed += removed
+            self.tracks_trimmed += 1
 
         # Release wake lock when playback ends (naturally or stopped/skipped)
         # This ensures wake lock is released for both Kivy SoundLoader and pygame fallback
-        self.wake_lock_manager.release()
+        self.wake_lock_manager.release("stream")
 
         if self.sound:
             try:
+                self.sound.unbind(on_stop=self._on_sound_stop)
                 self.sound.stop()
                 self.sound.unload()
             except Exception:
@@ -1851,7 +6306,7 @@ class StreamPlayer:
             self.sound = None
 
         # Mark file for immediate deletion (no longer keeping in played_files set)
-        if filepath and os.path.exists(filepath):
+        if filepath and os.path.exists(filepath) and self.is_stream_cache_file(filepath):
             filename = os.path.basename(filepath)
             self.played_files.add(filename)
 
@@ -1866,7 +6321,7 @@ class StreamPlayer:
         """Start updating playback progress"""
         self.stop_progress_updates()
         try:
-            self.progress_update_event = Clock.schedule_interval(self.update_playback_progress, 0.5)
+            self.progress_update_event = get_power_scheduler().schedule_interval(self.update_playback_progress, 0.5)
         except Exception:
             self.progress_update_event = None
 
@@ -1880,95 +6335,49 @@ class StreamPlayer:
             self.progress_update_event = None
 
     def update_playback_progress(self, dt):
-        """Update playback progress bar and time using manual timing"""
+        """Update playback progress bar and time from the playback clock"""
         if self.sound and getattr(self.sound, 'state', None) == 'play' and not self.pause_flag:
-            current_time = time.time() - self.playback_start_time - self.total_paused_time
-
-            # Get duration from entry or sound
-            duration = 0
-            if self.current_entry and 'duration' in self.current_entry:
-                try:
-                    duration = float(self.current_entry['duration'] or 0)
-                except Exception:
-                    duration = 0
-            elif self.sound and getattr(self.sound, 'length', 0) > 0:
-                duration = self.sound.length
-
-            # If we don't know duration, use a default (3 minutes)
-            if duration <= 0:
-                duration = 180
+            current_time = self.playback_clock.position()
 
+            # Get duration from entry or sound; leave the bar empty if it is unknown
+            duration = track_duration(self.current_entry, self.sound)
             progress = (current_time / duration) * 100 if duration > 0 else 0
 
-            Clock.schedule_once(lambda dt, p=progress, ct=current_time, d=duration: self.ui.update_playback_progress(p, ct, d))
+            get_ui_update_bus().publish('playback_progress', self.ui.update_playback_progress, progress, current_time, duration)
 
     def pause(self):
-        """Pause current playback (works with both Kivy and pygame)"""
+        """Pause current playback (works with every backend)"""
         if self.sound and getattr(self.sound, 'state', None) == 'play':
             # Save current position before stopping
-            try:
-                self.pause_position = self.sound.get_pos()
-                # If get_pos() returns None or 0, calculate from elapsed time
-                if not self.pause_position or self.pause_position <= 0:
-                    self.pause_position = time.time() - self.playback_start_time - self.total_paused_time
-            except Exception:
-                # Calculate position from elapsed time if get_pos() fails
-                self.pause_position = time.time() - self.playback_start_time - self.total_paused_time
+            self.pause_position = self.playback_clock.pause()
+            self.pause_flag = True
 
-            # Pause the sound (different methods for Kivy vs pygame)
             try:
-                if self.using_pygame:
-                    self.sound.pause()
-                else:
-                    self.sound.stop()
+                self.sound.pause(position=self.pause_position)
             except Exception:
                 pass
 
-            self.pause_flag = True
-            # Record pause time for progress tracking
-            if self.last_pause_time == 0:
-                self.last_pause_time = time.time()
+            self._signal_playback()
             # Release wake lock when paused to save battery
-            self.wake_lock_manager.release()
-            Clock.schedule_once(lambda dt: self.ui.update_playback_state("Paused"))
+            self.wake_lock_manager.release("stream")
+            get_ui_update_bus().publish('playback_state', self.ui.update_playback_state, "Paused")
 
     def resume(self):
         """Resume paused playback (works with both Kivy and pygame)"""
         if self.sound and self.pause_flag:
-            # Update total paused time
-            if self.last_pause_time > 0:
-                self.total_paused_time += time.time() - self.last_pause_time
-                self.last_pause_time = 0
+            self.playback_clock.resume(self.pause_position)
 
-            # Resume playback with proper seek timing
+            # Each track restores its own position (Kivy replays and seeks, pygame unpauses)
             try:
-                if self.using_pygame:
-                    # Pygame has unpause method
-                    self.sound.unpause()
-                else:
-                    # Kivy needs play + seek
-                    self.sound.play()
-                    # CRITICAL: Must delay seek() after play() - Kivy audio pipeline needs time to initialize
-                    # Use Clock.schedule_once with 0.1s delay for reliable seeking
-                    if self.pause_position and self.pause_position > 0:
-                        def do_seek(dt):
-                            try:
-                                if self.sound and getattr(self.sound, 'state', None) == 'play':
-                                    self.sound.seek(self.pause_position)
-                            except Exception as e:
-                                log_safe(self.ui.log, f"⚠️ Seek failed, using timing fallback: {e}")
-                                # Fallback: adjust timing if seek not supported
-                                self.playback_start_time = time.time() - self.pause_position - self.total_paused_time
-
-                        Clock.schedule_once(do_seek, 0.1)
-                        self.pause_position = 0
+                self.sound.resume()
             except Exception as e:
                 log_safe(self.ui.log, f"⚠️ Error resuming playback: {e}")
 
             self.pause_flag = False
+            self._signal_playback()
             # Re-acquire wake lock when resuming
-            self.wake_lock_manager.acquire()
-            Clock.schedule_once(lambda dt: self.ui.update_playback_state("Playing"))
+            self.wake_lock_manager.acquire("stream")
+            get_ui_update_bus().publish('playback_state', self.ui.update_playback_state, "Playing")
 
     def toggle_pause(self):
         """Toggle pause/resume"""
@@ -1981,6 +6390,8 @@ class StreamPlayer:
         """Skip the current song"""
         if self.sound and getattr(self.sound, 'state', None) == 'play':
             self.skip_flag = True
+            self.gap_recorder.mark_end()
+            self._signal_playback()
             try:
                 self.sound.stop()
             except Exception:
@@ -1994,8 +6405,10 @@ class StreamPlayer:
             log_safe(self.ui.log, "📜 No active queue")
 
     def _show_queue(self):
-        """Show queue dialog"""
+        """Show queue dialog; it keeps following the queue until dismissed"""
         dialog = QueueDialog(self.queue, self.current_index)
+        self.queue_dialog = dialog
+        dialog.bind(on_dismiss=lambda *args: setattr(self, 'queue_dialog', None))
         dialog.open()
 
     def stop(self):
@@ -2003,9 +6416,13 @@ class StreamPlayer:
         self.stream_stop_flag = True
         self.skip_flag = False
         self.pause_flag = False
+        self._signal_playback()
         self.stop_progress_updates()
+        self._cancel_crossfade()
+        self._finish_fade()
+        self.disarm_next()
         # Release wake lock when stopping
-        self.wake_lock_manager.release()
+        self.wake_lock_manager.release("stream")
         if self.sound:
             try:
                 self.sound.stop()
@@ -2022,6 +6439,9 @@ class DownloaderUI(BoxLayout):
     def __init__(self, **kwargs):
         super().__init__(orientation='vertical', spacing=0, padding=0, **kwargs)
 
+        # Recent lines for the on-screen log; full history goes to LOG_FILE
+        self.log_buffer = LogBuffer(self._render_log, sink=LogFileSink())
+
         print("\n" + "="*60)
         print("INITIALIZING MUSIC PLAYER APP")
         print("="*60)
@@ -2046,12 +6466,52 @@ class DownloaderUI(BoxLayout):
         self.download_manager.set_mobile_mode(self.mobile_mode)
         self.streamer.set_mobile_mode(self.mobile_mode)
         self.streamer.env_detector = self.env_detector
+        self.streamer.gapless = self.settings.get("gapless", True)
+        self.streamer.set_audio_backend(self.settings.get("audio_backend", "auto"))
+        self.audio_backends = self.streamer.backends
+        self.streamer.crossfade_seconds = float(self.settings.get("crossfade_seconds", 0) or 0)
+        self.streamer.replaygain = self.settings.get("replaygain", True)
+        self.streamer.trim_silence = self.settings.get("trim_silence", True)
+        self.streamer.audio_converter.env_detector = self.env_detector
+
+        # Background loudness analysis for the library and stream downloads
+        self.library_analyzer = LibraryAnalyzer(
+            ffmpeg_path=self.env_detector.ffmpeg_path or getattr(self.audio_converter, 'ffmpeg_path', None),
+            log_callback=self.log
+        )
+        self.library_analyzer.on_analyzed = lambda path, fields: Clock.schedule_once(
+            lambda dt: self._on_file_analyzed(path))
+        self.waveform_file = None
+
+        # Instant search over the library index's tags
+        self.search_query = ""
+        self.search_index = SearchIndex()
+        get_library_index().on_change = self._on_library_index_change
+        threading.Thread(
+            target=lambda: self._on_library_index_change(get_library_index().all_tracks(), []),
+            daemon=True
+        ).start()
+
+        # Library row artwork, extracted in the background into one atlas file
+        self.thumbnail_atlas = ThumbnailAtlas()
+        self.thumbnail_atlas.on_updated = lambda slots: Clock.schedule_once(
+            lambda dt: self.library_view.refresh_thumbnails(slots))
+
+        # Desktop has no app pause; stop UI timers while minimized instead
+        try:
+            from kivy.core.window import Window
+            Window.bind(on_minimize=lambda *args: get_power_scheduler().suspend(),
+                        on_restore=lambda *args: get_power_scheduler().resume())
+        except Exception:
+            pass
 
-        # Track playback time for local files
-        self.local_play_start_time = 0
-        self.local_total_paused_time = 0
-        self.local_last_pause_time = 0
+        # Track playback position for local files
+        self.local_clock = PlaybackClock()
         self.local_is_paused = False
+        self.pending_load = None   # CancelToken for a play_audio load in flight
+        # Loads run one at a time: backends such as the shared pygame player hold one track
+        self._load_queue = queue.Queue()
+        threading.Thread(target=self._load_worker, daemon=True).start()
 
         # Set dark Spotify background
         with self.canvas.before:
@@ -2065,8 +6525,17 @@ class DownloaderUI(BoxLayout):
         # Set default cover art
         self.set_default_cover()
 
+        self.thumbnail_atlas.load_textures()
         self.refresh_file_list()
 
+        # Keep the list and analysis index in step with the library directory
+        self.library_watcher = LibraryWatcher(
+            on_change=lambda added, removed, modified: Clock.schedule_once(
+                lambda dt: self._on_library_change(added, removed, modified)),
+            use_inotify=not self.env_detector.is_android
+        )
+        self.library_watcher.start()
+
     def _update_rect(self, instance, value):
         self.rect.pos = self.pos
         self.rect.size = self.size
@@ -2078,6 +6547,54 @@ class DownloaderUI(BoxLayout):
 
         debug_text = self.env_detector.print_debug_info()
 
+        cache_stats = self.audio_converter.conversion_cache.stats()
+        debug_text += "\n\n=== CONVERSION CACHE ===\n"
+        debug_text += f"Hits: {cache_stats['hits']} | Misses: {cache_stats['misses']} | Evictions: {cache_stats['evictions']}"
+
+        gaps = self.streamer.gap_recorder.summary()
+        debug_text += "\n\n=== TRACK GAPS ===\n"
+        debug_text += f"Transitions: {gaps['count']} | Mean: {gaps['mean_ms']:.1f} ms | P95: {gaps['p95_ms']:.1f} ms | Max: {gaps['max_ms']:.1f} ms"
+
+        drift = self.streamer.playback_clock.drift_stats()
+        debug_text += "\n\n=== PLAYBACK CLOCK ===\n"
+        debug_text += (f"Samples: {drift['samples']} | Mean drift: {drift['mean_drift_ms']:.1f} ms | "
+                       f"Max drift: {drift['max_drift_ms']:.1f} ms | Corrections: {drift['corrections']}")
+
+        bus = get_ui_update_bus().stats()
+        debug_text += "\n\n=== UI UPDATES ===\n"
+        debug_text += (f"Published: {bus['published']} | Delivered: {bus['delivered']} | "
+                       f"Superseded: {bus['superseded']} | Pending: {bus['pending']}")
+
+        covers = get_cover_texture_cache().stats()
+        stored = get_cover_store().stats()
+        debug_text += "\n\n=== COVER ART ===\n"
+        debug_text += (f"Textures: {covers['entries']} ({covers['bytes'] / (1024 * 1024):.1f} MB) | "
+                       f"Hits: {covers['hits']} | Misses: {covers['misses']} | "
+                       f"Pillow: {'yes' if PIL_AVAILABLE else 'no'}\n")
+        debug_text += (f"Cover store: {stored['covers']} image(s) for {stored['tracks']} track(s), "
+                       f"{stored['bytes'] / (1024 * 1024):.1f} MB")
+
+        power = get_power_scheduler().stats()
+        wake = get_wake_lock_manager().stats()
+        debug_text += "\n\n=== POWER ===\n"
+        debug_text += (f"Wakeups/min: {power['wakeups_per_minute']} | Total: {power['total_wakeups']} | "
+                       f"Timers: {power['timers']} on {power['clock_events']} events"
+                       f"{' (suspended)' if power['suspended'] else ''}\n")
+        debug_text += (f"Wake lock: {'held' if wake['held'] else 'released'}"
+                       f"{' (release pending)' if wake['release_pending'] else ''} | "
+                       f"Holders: {', '.join(wake['holders']) or 'none'} | "
+                       f"JNI acquire/release: {wake['jni_acquires']}/{wake['jni_releases']}")
+
+        analysis = self.library_analyzer.stats()
+        debug_text += "\n\n=== TRACK ANALYSIS ===\n"
+        if self.library_analyzer.available():
+            debug_text += (f"Analyzed: {analysis['analyzed']} | Failed: {analysis['failed']} | "
+                           f"Pending: {analysis['pending']} | Indexed: {analysis['indexed']} | "
+                           f"Workers: {self.library_analyzer.max_workers}")
+        else:
+            debug_text += "Unavailable (needs numpy and ffmpeg)"
+        debug_text += f"\nLibrary index: {len(get_library_index())} track(s)"
+
         dialog = ModalView(size_hint=(0.9, 0.8))
         layout = BoxLayout(orientation='vertical', padding=10, spacing=10)
 
@@ -2189,7 +6706,7 @@ class DownloaderUI(BoxLayout):
         # Now Playing Card - larger for mobile
         now_playing_card = MDCard(
             size_hint_y=None,
-            height=dp(480),
+            height=dp(522),
             md_bg_color=[0.09, 0.09, 0.09, 1],
             radius=[dp(15)],
             padding=dp(20)
@@ -2260,12 +6777,13 @@ class DownloaderUI(BoxLayout):
         card_content.add_widget(self.track_duration)
         card_content.add_widget(self.queue_info)
 
-        # Progress bar with Spotify green - thicker for mobile
-        self.progress_bar = MDProgressBar(
+        # Waveform seek bar with Spotify green (flat until the track's peaks are computed)
+        self.progress_bar = WaveformSeekBar(
             value=0,
             size_hint_y=None,
-            height=dp(6),
-            color=[0.11, 0.73, 0.33, 1]
+            height=dp(48),
+            color=[0.11, 0.73, 0.33, 1],
+            on_seek=self.seek_playback
         )
         card_content.add_widget(self.progress_bar)
 
@@ -2317,21 +6835,35 @@ class DownloaderUI(BoxLayout):
         main_content.add_widget(self.stream_download_section)
 
         # File list with Spotify styling - larger for mobile
-        file_list_header = MDLabel(
+        file_list_header = BoxLayout(size_hint_y=None, height=dp(48))
+        file_list_header.add_widget(MDLabel(
             text="Downloaded Songs",
             font_style="H5",
             theme_text_color="Custom",
-            text_color=[1, 1, 1, 1],
+            text_color=[1, 1, 1, 1]
+        ))
+        file_list_header.add_widget(MDIconButton(
+            icon="content-duplicate",
+            theme_text_color="Custom",
+            text_color=[0.7, 0.7, 0.7, 1],
+            icon_size=dp(32),
+            size_hint_x=None,
+            width=dp(56),
+            on_press=self.find_duplicates
+        ))
+        main_content.add_widget(file_list_header)
+
+        self.search_field = MDTextField(
+            hint_text="Search title, artist or album",
             size_hint_y=None,
             height=dp(48)
         )
-        main_content.add_widget(file_list_header)
+        self.search_field.bind(text=lambda instance, text: self.search_library(text))
+        main_content.add_widget(self.search_field)
 
-        self.file_list_layout = GridLayout(cols=1, spacing=dp(12), size_hint_y=None)
-        self.file_list_layout.bind(minimum_height=self.file_list_layout.setter('height'))
-        scroll_files = ScrollView()
-        scroll_files.add_widget(self.file_list_layout)
-        main_content.add_widget(scroll_files)
+        # Recycled rows scroll inside a fixed-height box
+        self.library_view = LibraryListView(ui=self, size_hint_y=None, height=dp(600))
+        main_content.add_widget(self.library_view)
 
         # Logs section - larger for mobile
         log_header = MDLabel(
@@ -2467,29 +6999,27 @@ class DownloaderUI(BoxLayout):
     def set_default_cover(self):
         """Set default cover art when no track is playing"""
         self.cover_art.source = ''
+        self.cover_art.texture = None
         self.cover_art.color = [0.3, 0.3, 0.3, 1]  # Dark gray background
 
-    def update_cover_art(self, file_path=None, thumbnail_url=None):
-        """Update cover art from file or URL"""
-        cover_path = None
-
-        if file_path and os.path.exists(file_path):
-            # Try to extract cover art from audio file
-            cover_path = extract_cover_art(file_path)
+    def update_cover_art(self, file_path=None, thumbnail_url=None, track_id=None):
+        """Update cover art from file or URL; decoded off the UI thread and cached by track ID"""
+        key = track_id or (os.path.abspath(file_path) if file_path else thumbnail_url)
+        self._cover_key = key
+        if not key:
+            self.set_default_cover()
+            return
 
-        if not cover_path and thumbnail_url:
-            # Download cover art from URL
-            cover_path = download_cover_art(thumbnail_url, filename=f"thumbnail_{abs(hash(thumbnail_url))}.jpg")
+        def show(texture):
+            if self._cover_key != key:
+                return  # a newer track's cover was requested meanwhile
+            if texture is not None:
+                self.cover_art.texture = texture
+                self.cover_art.color = [1, 1, 1, 1]
+            else:
+                self.set_default_cover()
 
-        if cover_path and os.path.exists(cover_path):
-            self.cover_art.source = cover_path
-            self.cover_art.color = [1, 1, 1, 1]
-            try:
-                self.cover_art.reload()
-            except Exception:
-                pass
-        else:
-            self.set_default_cover()
+        get_cover_texture_cache().request(key, show, file_path=file_path, url=thumbnail_url)
 
     def update_current_track(self, metadata, file_path=None):
         """Update current track information display and cover art"""
@@ -2509,10 +7039,41 @@ class DownloaderUI(BoxLayout):
 
         # Update cover art
         thumbnail_url = metadata.get('thumbnail')
-        self.update_cover_art(file_path, thumbnail_url)
+        self.update_cover_art(file_path, thumbnail_url, track_id=metadata.get('id'))
+        self.load_waveform(file_path)
+
+    def load_waveform(self, file_path):
+        """Show the precomputed peaks for file_path (one small read; never decodes)"""
+        self.waveform_file = os.path.abspath(file_path) if file_path else None
+        entry = get_analysis_index().get(file_path) if file_path else None
+        peaks = load_peaks(entry['peaks_file']) if entry and entry.get('peaks_file') else None
+        self.progress_bar.set_peaks(peaks)
+
+    def _on_file_analyzed(self, file_path):
+        """Pick up peaks that finished computing after the track started"""
+        if self.waveform_file and os.path.abspath(file_path) == self.waveform_file:
+            self.load_waveform(file_path)
+
+    def seek_playback(self, fraction):
+        """Jump to a point in the current track from a tap on the waveform"""
+        if self.streamer.sound:
+            duration = track_duration(self.streamer.current_entry, self.streamer.sound)
+            if duration > 0:
+                self.streamer.seek_to(fraction * duration)
+        elif self.current_sound and not self.local_is_paused:
+            duration = track_duration(None, self.current_sound)
+            if duration > 0:
+                try:
+                    self.current_sound.seek(fraction * duration)
+                except Exception:
+                    return
+                self.local_clock.seek(fraction * duration)
 
     def update_queue_display(self, queue, current_index):
         """Update queue information display with total file size"""
+        if self.streamer.queue_dialog is not None:
+            self.streamer.queue_dialog.update(queue, current_index)
+
         remaining = max(0, len(queue) - current_index - 1)
 
         # Calculate total size for remaining songs (excluding currently playing track)
@@ -2559,25 +7120,23 @@ class DownloaderUI(BoxLayout):
     def toggle_local_pause(self):
         """Toggle pause for local files"""
         if self.local_is_paused:
-            # Resume
+            # Resume: the track restores its own position
+            self.local_clock.resume()
             try:
-                self.current_sound.play()
+                self.current_sound.resume()
             except Exception:
                 pass
             self.local_is_paused = False
             self.pause_btn.icon = "pause"
-            if self.local_last_pause_time > 0:
-                self.local_total_paused_time += time.time() - self.local_last_pause_time
-                self.local_last_pause_time = 0
         else:
             # Pause
+            position = self.local_clock.pause()
             try:
-                self.current_sound.stop()
+                self.current_sound.pause(position=position)
             except Exception:
                 pass
             self.local_is_paused = True
             self.pause_btn.icon = "play"
-            self.local_last_pause_time = time.time()
 
     def skip_song(self, _):
         """Skip the current song in stream"""
@@ -2593,6 +7152,15 @@ class DownloaderUI(BoxLayout):
     def stop_playback(self, _):
         """Stop both stream and any currently playing audio"""
         self.streamer.stop()
+        self.stop_local_playback()
+        self.log("⏹ Playback stopped")
+
+    def stop_local_playback(self):
+        """Stop (and drop any pending load of) the local track"""
+        if self.pending_load is not None:
+            self.pending_load.cancel()
+            self.pending_load = None
+        self.stop_local_progress_updates()
         if self.current_sound:
             try:
                 self.current_sound.stop()
@@ -2600,25 +7168,23 @@ class DownloaderUI(BoxLayout):
             except Exception:
                 pass
             self.current_sound = None
-        self.log("⏹ Playback stopped")
         self.progress_bar.value = 0
+        self.progress_bar.set_peaks(None)
+        self.waveform_file = None
         self.time_label.text = "00:00 / 00:00"
         self.local_is_paused = False
-        self.local_last_pause_time = 0
-        self.local_total_paused_time = 0
+        self.local_clock.stop()
         self.set_default_cover()
 
     # ----- Logging -----
+    @thread_safe
     def log(self, message):
-        # Keep log from growing too large
-        try:
-            lines = self.log_label.text.split('\n') if self.log_label.text else []
-            if len(lines) > 50:
-                lines = lines[-40:]
-            new_text = '\n'.join(lines) + (message + "\n")
-            self.log_label.text = new_text
-        except Exception:
-            pass
+        """Append to the activity log; safe to call from any thread"""
+        self.log_buffer.write(message)
+
+    def _render_log(self, text):
+        if hasattr(self, 'log_label'):
+            self.log_label.text = text
 
     def _update_log_height(self, instance, size):
         try:
@@ -2629,137 +7195,166 @@ class DownloaderUI(BoxLayout):
 
     # ----- File List -----
     def refresh_file_list(self):
-        self.file_list_layout.clear_widgets()
         try:
             # Support multiple audio formats
-            audio_extensions = ('.mp3', '.m4a', '.webm', '.opus', '.ogg')
-            files = sorted(f for f in os.listdir(".") if f.lower().endswith(audio_extensions))
+            files = list_library_files()
         except Exception:
             files = []
 
-        for f in files:
-            # Song card with Spotify styling - larger for mobile
-            song_card = MDCard(
-                size_hint_y=None,
-                height=dp(88),
-                md_bg_color=[0.09, 0.09, 0.09, 1],
-                radius=[dp(8)],
-                padding=dp(12)
-            )
+        # Only the visible rows are widgets; this just swaps the data model
+        self.library_view.set_files(self.search_results() if self.search_query else files)
+        self.thumbnail_atlas.update(files)
+        get_library_index().scan(files)
 
-            card_layout = BoxLayout(spacing=dp(12))
+        # Measure loudness for new or changed files in the background
+        self.library_analyzer.analyze_library(files)
 
-            # Play button - larger for mobile
-            play_btn = MDIconButton(
-                icon="play-circle",
-                theme_text_color="Custom",
-                text_color=[0.11, 0.73, 0.33, 1],
-                icon_size=dp(40),
-                size_hint_x=None,
-                width=dp(56)
-            )
-            play_btn.bind(on_press=lambda inst, file=f: self.play_audio(file))
-
-            # File info (clickable for metadata)
-            info_layout = BoxLayout(orientation='vertical', size_hint_x=0.7)
-            file_label = MDLabel(
-                text=f[:35] + "..." if len(f) > 35 else f,
-                font_style="Body1",
-                theme_text_color="Custom",
-                text_color=[1, 1, 1, 1],
-                font_size=dp(16)
-            )
-            info_btn = Button(
-                text="",
-                background_color=[0, 0, 0, 0],
-                on_press=lambda inst, file=f: self.show_metadata(file)
-            )
-            info_layout.add_widget(file_label)
-
-            # Convert button for convertible formats (m4a, opus)
-            file_ext = os.path.splitext(f)[1].lower()
-            if file_ext in ['.m4a', '.opus', '.ogg', '.webm']:
-                convert_btn = MDIconButton(
-                    icon="swap-horizontal",
-                    theme_text_color="Custom",
-                    text_color=[0.2, 0.6, 1.0, 1],
-                    icon_size=dp(36),
-                    size_hint_x=None,
-                    width=dp(56)
-                )
-                convert_btn.bind(on_press=lambda inst, file=f: self.convert_audio(file))
-                card_layout.add_widget(play_btn)
-                card_layout.add_widget(info_layout)
-                card_layout.add_widget(convert_btn)
-            else:
-                card_layout.add_widget(play_btn)
-                card_layout.add_widget(info_layout)
-
-            # Delete button - larger for mobile
-            del_btn = MDIconButton(
-                icon="delete",
-                theme_text_color="Custom",
-                text_color=[0.8, 0.2, 0.2, 1],
-                icon_size=dp(36),
-                size_hint_x=None,
-                width=dp(56)
-            )
-            del_btn.bind(on_press=lambda inst, file=f: self.delete_audio(file))
-            card_layout.add_widget(del_btn)
+    def sync_library(self):
+        """Rescan the library after a change, unless the watcher is already reporting it"""
+        watcher = getattr(self, 'library_watcher', None)
+        if watcher is None or not watcher.running:
+            self.refresh_file_list()
 
-            song_card.add_widget(card_layout)
-            self.file_list_layout.add_widget(song_card)
+    def _on_library_change(self, added, removed, modified):
+        """Apply a diff from the library watcher to the list and analysis index"""
+        index = get_analysis_index()
+        for f in removed:
+            self.library_view.remove_file(f)
+            index.discard(f)
+            self.thumbnail_atlas.remove(f)
+            get_cover_store().release(os.path.abspath(f))
+            get_cover_texture_cache().discard(os.path.abspath(f))
+        get_library_index().remove(removed)
+        for f in modified:
+            # Tags may have changed; the cover is re-read on next use
+            get_cover_store().release(os.path.abspath(f))
+            get_cover_texture_cache().discard(os.path.abspath(f))
+        if not self.search_query:
+            for f in added + modified:
+                self.library_view.update_file(f)
+        self.thumbnail_atlas.update(added + modified)
+        get_library_index().update(added + modified)
+        self.library_analyzer.analyze_library(added + modified)
+
+    def search_library(self, query):
+        """Filter the library list to tracks matching query; an empty query shows everything"""
+        self.search_query = query.strip()
+        if self.search_query:
+            self.library_view.set_files(self.search_results())
+        else:
+            self.refresh_file_list()
 
-        self.file_list_layout.height = len(self.file_list_layout.children) * dp(100)
+    def search_results(self):
+        """Library file names matching the current search query"""
+        library_dir = os.path.abspath(".")
+        return [os.path.basename(path) for path in self.search_index.search(self.search_query)
+                if os.path.dirname(path) == library_dir]
+
+    def _on_library_index_change(self, updated, removed):
+        """Scanner thread: keep the search index in step with the library index"""
+        for path in removed:
+            self.search_index.remove(path)
+        for track in updated:
+            self.search_index.add(track['path'], track)
+        if self.search_query:
+            Clock.schedule_once(lambda dt: self.library_view.set_files(self.search_results())
+                                if self.search_query else None)
 
     def play_audio(self, file):
+        """Play a library file; loading, conversion and metadata happen on a worker thread"""
+        # Local playback takes the shared player away from the stream, so end the stream first
+        if self.streamer.streaming:
+            self.streamer.stop()
+            self.log("⏹ Stream stopped for local playback")
+
+        # A newer tap supersedes any load still in flight
+        if self.pending_load is not None:
+            self.pending_load.cancel()
+        token = CancelToken(file)
+        self.pending_load = token
+
         if self.current_sound:
+            self.stop_local_progress_updates()
             try:
                 self.current_sound.stop()
                 self.current_sound.unload()
             except Exception:
                 pass
+            self.current_sound = None
 
-        # Try to load the file, with automatic conversion if needed
+        self._load_queue.put(token)
+
+    def _load_worker(self):
+        """Serial worker for play_audio loads; taps superseded while queued are skipped"""
+        while True:
+            token = self._load_queue.get()
+            if not token.cancelled:
+                self._load_for_playback(token)
+
+    def _load_for_playback(self, token):
+        """Worker: load the file, converting it if no backend can play it, and gather metadata"""
+        file = token.payload
         playable_file = file
-        self.current_sound = SoundLoader.load(file)
+        sound = None
+        metadata = None
+        volume = 1.0
+        try:
+            sound, _ = load_track(file, self.audio_backends)
+
+            # If loading failed, try auto-conversion
+            if not sound and not token.cancelled:
+                self.log(f"⚠️ Cannot play {os.path.basename(file)} directly, attempting conversion...")
+                converted_file = self.audio_converter.auto_convert_if_needed(file, self.log)
+                if converted_file and converted_file != file and not token.cancelled:
+                    playable_file = converted_file
+                    sound, _ = load_track(converted_file, self.audio_backends)
+
+            if sound and not token.cancelled:
+                metadata = get_metadata(playable_file)
+                volume = self.streamer.track_volume(playable_file)
+        except Exception as e:
+            self.log(f"❌ Error loading {os.path.basename(file)}: {e}")
 
-        # If loading failed, try auto-conversion
-        if not self.current_sound:
-            self.log(f"⚠️ Cannot play {os.path.basename(file)} directly, attempting conversion...")
-            converted_file = self.audio_converter.auto_convert_if_needed(file, self.log)
-            if converted_file and converted_file != file:
-                playable_file = converted_file
-                self.current_sound = SoundLoader.load(converted_file)
+        Clock.schedule_once(lambda dt: self._start_loaded_track(token, sound, playable_file, metadata, volume))
 
-        if self.current_sound:
-            # Reset timing variables
-            self.local_play_start_time = time.time()
-            self.local_total_paused_time = 0
-            self.local_last_pause_time = 0
-            self.local_is_paused = False
+    def _start_loaded_track(self, token, sound, playable_file, metadata, volume):
+        """UI thread: start playback unless another track was chosen meanwhile"""
+        if token.cancelled or token is not self.pending_load:
+            # The shared pygame player may already hold the newer tap's track
+            if sound and sound is not _shared_pygame_player:
+                try:
+                    sound.unload()
+                except Exception:
+                    pass
+            return
+        self.pending_load = None
 
-            try:
-                self.current_sound.play()
-            except Exception:
-                pass
+        if not sound:
+            self.log("❌ Failed to play audio. File format may be unsupported.")
+            return
 
-            # Update track info and cover art
-            metadata = get_metadata(playable_file)
-            self.update_current_track(metadata, playable_file)
+        self.current_sound = sound
+        self.local_is_paused = False
+        try:
+            self.current_sound.volume = volume
+            self.current_sound.play()
+        except Exception:
+            pass
+        self.local_clock.start(self.current_sound)
 
-            # Start progress updates
-            self.start_local_progress_updates()
+        # Update track info and cover art
+        self.update_current_track(metadata, playable_file)
 
-            self.log(f"🎧 Now Playing: {os.path.basename(playable_file)}")
-        else:
-            self.log("❌ Failed to play audio. File format may be unsupported.")
+        # Start progress updates
+        self.start_local_progress_updates()
+
+        self.log(f"🎧 Now Playing: {os.path.basename(playable_file)}")
 
     def start_local_progress_updates(self):
         """Start progress updates for locally played files"""
         self.stop_local_progress_updates()
         try:
-            self.local_progress_event = Clock.schedule_interval(self.update_local_progress, 0.5)
+            self.local_progress_event = get_power_scheduler().schedule_interval(self.update_local_progress, 0.5)
         except Exception:
             self.local_progress_event = None
 
@@ -2772,10 +7367,10 @@ class DownloaderUI(BoxLayout):
                 pass
 
     def update_local_progress(self, dt):
-        """Update progress for locally playing files using manual timing"""
+        """Update progress for locally playing files from the playback clock"""
         if self.current_sound and getattr(self.current_sound, 'state', None) == 'play' and not self.local_is_paused:
-            current_time = time.time() - self.local_play_start_time - self.local_total_paused_time
-            duration = self.current_sound.length if getattr(self.current_sound, 'length', 0) > 0 else 1
+            current_time = self.local_clock.position()
+            duration = track_duration(None, self.current_sound)
             progress = (current_time / duration) * 100 if duration > 0 else 0
 
             self.progress_bar.value = progress
@@ -2789,22 +7384,34 @@ class DownloaderUI(BoxLayout):
 
         layout.add_widget(Label(text="[b]Track Metadata[/b]", size_hint_y=0.1, font_size='16sp', markup=True))
 
-        # Cover art in metadata dialog
-        cover_path = extract_cover_art(file)
-        if cover_path and os.path.exists(cover_path):
-            cover_img = Image(
-                source=cover_path,
-                size_hint_y=0.3,
-                allow_stretch=True,
-                keep_ratio=True
-            )
-            layout.add_widget(cover_img)
+        # Cover art in metadata dialog, filled in from the texture cache
+        cover_img = Image(
+            size_hint_y=0.3,
+            allow_stretch=True,
+            keep_ratio=True,
+            opacity=0
+        )
+        layout.add_widget(cover_img)
+
+        def show_cover(texture):
+            if texture is not None:
+                cover_img.texture = texture
+                cover_img.opacity = 1
+
+        get_cover_texture_cache().request(os.path.abspath(file), show_cover, file_path=file)
 
         # Metadata details
         details_layout = BoxLayout(orientation='vertical', size_hint_y=0.4)
         details_layout.add_widget(Label(text=f"Title: {metadata['title']}", size_hint_y=0.25))
         details_layout.add_widget(Label(text=f"Artist: {metadata['artist']}", size_hint_y=0.25))
         details_layout.add_widget(Label(text=f"Album: {metadata['album']}", size_hint_y=0.25))
+        track = get_library_index().get(file)
+        if track:
+            bitrate = f"{track['bitrate'] // 1000} kbps" if track['bitrate'] else "?"
+            details_layout.add_widget(Label(
+                text=f"{format_time(track['duration'] or 0)} | {track['codec'] or '?'} | {bitrate} | "
+                     f"{track['size'] / (1024 * 1024):.1f} MB",
+                size_hint_y=0.25))
         details_layout.add_widget(Label(text=f"File: {file}", size_hint_y=0.25))
         layout.add_widget(details_layout)
 
@@ -2820,7 +7427,7 @@ class DownloaderUI(BoxLayout):
         def do_conversion():
             converted_file = self.audio_converter.convert_to_mp3(file, log_callback=self.log)
             if converted_file and os.path.exists(converted_file):
-                Clock.schedule_once(lambda dt: self.refresh_file_list())
+                Clock.schedule_once(lambda dt: self.sync_library())
             else:
                 Clock.schedule_once(lambda dt: self.log(f"❌ Conversion failed for {os.path.basename(file)}"))
 
@@ -2830,20 +7437,91 @@ class DownloaderUI(BoxLayout):
     def delete_audio(self, file):
         """Delete an audio file"""
         try:
-            # Also delete cached cover art
-            cover_path = extract_cover_art(file)
-            if cover_path and os.path.exists(cover_path):
-                try:
-                    os.remove(cover_path)
-                except Exception:
-                    pass
-
             os.remove(file)
+            get_analysis_index().discard(file)
+            get_cover_store().release(os.path.abspath(file))
+            get_cover_texture_cache().discard(os.path.abspath(file))
+            self.thumbnail_atlas.remove(file)
+            get_library_index().remove([file])
             self.log(f"🗑️ Deleted: {file}")
-            self.refresh_file_list()
+            self.library_view.remove_file(file)
         except Exception as e:
             self.log(f"❌ Error deleting {file}: {e}")
 
+    def find_duplicates(self, instance=None):
+        """Fingerprint the library in the background and report duplicate songs"""
+        if not self.library_analyzer.available():
+            self.log("⚠️ Duplicate detection needs numpy and ffmpeg")
+            return
+        self.log("🔍 Looking for duplicate songs...")
+
+        def worker():
+            try:
+                clusters = find_duplicate_clusters(list_library_files(), self.library_analyzer)
+            except Exception as e:
+                Clock.schedule_once(lambda dt: self.log(f"❌ Duplicate scan failed: {e}"))
+                return
+            Clock.schedule_once(lambda dt: self._show_duplicates(clusters))
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _show_duplicates(self, clusters):
+        """Show duplicate clusters with an option to replace them with hard links"""
+        if not clusters:
+            self.log("✅ No duplicate songs found")
+            return
+        total = sum(c['reclaimable'] for c in clusters)
+        self.log(f"🔁 {len(clusters)} duplicate group(s), {total / (1024 * 1024):.1f} MB reclaimable")
+
+        lines = []
+        for cluster in clusters:
+            lines.append(f"Keep: {cluster['keep']}  ({cluster['reclaimable'] / (1024 * 1024):.1f} MB reclaimable)")
+            lines.extend(f"    = {dup}" for dup in cluster['duplicates'])
+            lines.append("")
+
+        dialog = ModalView(size_hint=(0.9, 0.8))
+        layout = BoxLayout(orientation='vertical', padding=10, spacing=10)
+        layout.add_widget(Label(
+            text=f"[b]Duplicate Songs ({total / (1024 * 1024):.1f} MB reclaimable)[/b]",
+            size_hint_y=0.08,
+            font_size='18sp',
+            markup=True
+        ))
+
+        scroll = ScrollView(size_hint=(1, 0.76))
+        report_label = Label(
+            text="\n".join(lines),
+            size_hint_y=None,
+            font_size='12sp',
+            halign='left',
+            valign='top'
+        )
+        report_label.bind(texture_size=report_label.setter('size'))
+        scroll.add_widget(report_label)
+        layout.add_widget(scroll)
+
+        def link(_):
+            dialog.dismiss()
+
+            def worker():
+                reclaimed = hardlink_duplicates(clusters, self.log)
+                Clock.schedule_once(lambda dt: self.log(f"✅ Reclaimed {reclaimed / (1024 * 1024):.1f} MB with hard links"))
+                Clock.schedule_once(lambda dt: self.sync_library())
+
+            threading.Thread(target=worker, daemon=True).start()
+
+        buttons = BoxLayout(size_hint_y=0.08, spacing=10)
+        link_btn = Button(text="Replace with hard links")
+        link_btn.bind(on_press=link)
+        close_btn = Button(text="Close")
+        close_btn.bind(on_press=lambda x: dialog.dismiss())
+        buttons.add_widget(link_btn)
+        buttons.add_widget(close_btn)
+        layout.add_widget(buttons)
+
+        dialog.add_widget(layout)
+        dialog.open()
+
     # ----- Download -----
     def start_download(self, _):
         url = self.url_input.text.strip()
@@ -2858,10 +7536,254 @@ class DownloaderUI(BoxLayout):
         if not url:
             self.log("⚠️ Please enter a playlist URL.")
             return
+        # The stream takes over the shared player; don't leave a local track fighting it
+        if self.current_sound or self.pending_load is not None:
+            self.stop_local_playback()
+            self.log("⏹ Local playback stopped for the stream")
         self.log("📡 Starting stream...")
         threading.Thread(target=self.streamer.stream_playlist, args=(url,), daemon=True).start()
 
 
+# ------------------- Benchmarks -------------------
+class HeadlessUI:
+    """Minimal stand-in for DownloaderUI so StreamPlayer can run without a window"""
+
+    def __init__(self, verbose=False):
+        self.verbose = verbose
+
+    def log(self, message):
+        if self.verbose:
+            print(message)
+
+    def __getattr__(self, name):
+        # Every show_/hide_/update_/clear_ UI callback is a no-op
+        if name.startswith(('show_', 'hide_', 'update_', 'clear_')):
+            return lambda *args, **kwargs: None
+        raise AttributeError(name)
+
+
+def run_clock_until(thread, timeout):
+    """Tick the Kivy clock on this thread until the worker thread finishes"""
+    deadline = time.monotonic() + timeout
+    while thread.is_alive() and time.monotonic() < deadline:
+        Clock.tick()
+
+
+def make_silent_wavs(count, seconds, directory):
+    """Write `count` silent 16-bit mono WAV files for headless benchmarks"""
+    import wave
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f"bench_{i:03d}.wav")
+        with wave.open(path, 'wb') as w:
+            w.setnchannels(1)
+            w.setsampwidth(2)
+            w.setframerate(8000)
+            w.writeframes(b'\x00\x00' * int(8000 * seconds))
+        paths.append(path)
+    return paths
+
+
+def bench_track_gaps(files, gapless=True, crossfade_seconds=0.0, backend="auto", speed=1.0,
+                     timeout=3600, verbose=False):
+    """
+    Play local files back to back through StreamPlayer and measure inter-track gaps
+
+    Returns:
+        TrackGapRecorder summary dict (milliseconds)
+    """
+    player = StreamPlayer(HeadlessUI(verbose=verbose))
+    player.set_audio_backend(backend, speed=speed)
+    player.gapless = gapless
+    player.crossfade_seconds = crossfade_seconds
+    entries = [{'title': os.path.basename(f), 'path': f} for f in files]
+    player.queue = entries
+
+    worker = threading.Thread(
+        target=player.play_queue,
+        args=(entries, lambda entry: entry['path']),
+        kwargs={'delete_played': False},
+        daemon=True
+    )
+    worker.start()
+    run_clock_until(worker, timeout)
+    return player.gap_recorder.summary()
+
+
+def bench_stream(url, backend="null", speed=50.0, timeout=3600, verbose=True):
+    """Run stream_playlist end to end (download, convert, play) without an audio device"""
+    import tempfile
+    player = StreamPlayer(HeadlessUI(verbose=verbose))
+    player.temp_dir = tempfile.mkdtemp(prefix="bench_stream_")
+    player.set_audio_backend(backend, speed=speed)
+
+    started = time.monotonic()
+    worker = threading.Thread(target=player.stream_playlist, args=(url,), daemon=True)
+    worker.start()
+    run_clock_until(worker, timeout)
+    result = player.gap_recorder.summary()
+    result['wall_s'] = time.monotonic() - started
+    return result
+
+
+def bench_search(tracks=50000, seed=1):
+    """
+    Build a SearchIndex over synthetic tags and time every keystroke of a set of queries
+
+    Returns:
+        Dict with build time, per-keystroke query latency (milliseconds) and
+        incremental add/remove cost
+    """
+    import random
+    rng = random.Random(seed)
+    syllables = ["ka", "lo", "mi", "ra", "ne", "to", "su", "vi", "de", "an", "or", "el", "yu", "bo", "ché"]
+    word = lambda: ''.join(rng.choice(syllables) for _ in range(rng.randint(1, 4)))
+    artists = [f"{word().title()} {word().title()}" for _ in range(tracks // 20 or 1)]
+    albums = [word().title() for _ in range(tracks // 10 or 1)]
+    rows = [(f"/bench/{i:06d}.mp3", {'title': ' '.join(word() for _ in range(rng.randint(1, 5))),
+                                     'artist': rng.choice(artists), 'album': rng.choice(albums)})
+            for i in range(tracks)]
+
+    index = SearchIndex()
+    started = time.perf_counter()
+    for path, fields in rows:
+        index.add(path, fields)
+    build_s = time.perf_counter() - started
+
+    queries = [rows[rng.randrange(tracks)][1][field] for field in SEARCH_FIELDS for _ in range(20)]
+    latencies = []
+    for query in queries:
+        for end in range(1, len(query) + 1):
+            started = time.perf_counter()
+            index.search(query[:end])
+            latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+
+    started = time.perf_counter()
+    for path, fields in rows[:1000]:
+        index.remove(path)
+        index.add(path, fields)
+    update_ms = (time.perf_counter() - started) / 1000 * 1000
+
+    return {
+        'tracks': tracks,
+        'build_s': build_s,
+        'keystrokes': len(latencies),
+        'p50_ms': latencies[len(latencies) // 2],
+        'p95_ms': latencies[int(len(latencies) * 0.95)],
+        'max_ms': latencies[-1],
+        'update_ms': update_ms,
+    }
+
+
+def bench_queue_memory(tracks=1000, formats=25, thumbnails=40):
+    """
+    Measure memory retained per queued track for raw yt-dlp info dicts vs QueueTrack
+
+    The info dicts are synthetic but shaped like yt-dlp's: a formats list with
+    per-format http_headers, a thumbnails list and automatic captions.
+
+    Returns:
+        Dict of bytes per track for each representation
+    """
+    import tracemalloc
+
+    def make_info(i):
+        headers = {'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) ' + 'x' * 80,
+                   'Accept': 'text/html,application/xhtml+xml', 'Accept-Language': 'en-us,en;q=0.5'}
+        return {
+            'id': f"vid{i:08d}", 'title': f"Track {i}", 'uploader': f"Artist {i % 50}",
+            'duration': 180 + i % 120, 'webpage_url': f"https://www.youtube.com/watch?v=vid{i:08d}",
+            'format_id': '251',
+            'thumbnail': f"https://i.ytimg.com/vi/vid{i:08d}/maxresdefault.jpg",
+            'thumbnails': [{'url': f"https://i.ytimg.com/vi/vid{i:08d}/{n}.jpg", 'width': 120 + n, 'height': 90 + n,
+                            'id': str(n), 'preference': -n} for n in range(thumbnails)],
+            'formats': [{'format_id': str(n), 'url': f"https://rr1.googlevideo.com/videoplayback?id={i}&itag={n}&" + 'p' * 600,
+                         'ext': 'webm', 'acodec': 'opus', 'vcodec': 'none', 'abr': 160.0, 'filesize': 3_000_000 + n,
+                         'http_headers': dict(headers), 'protocol': 'https'} for n in range(formats)],
+            'automatic_captions': {lang: [{'ext': 'vtt', 'url': f"https://www.youtube.com/api/timedtext?v={i}&lang={lang}&" + 'c' * 200}]
+                                   for lang in ('en', 'de', 'fr', 'es', 'ja', 'ko', 'pt', 'ru')},
+            'http_headers': dict(headers),
+        }
+
+    def retained(build):
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        queue_items = build()
+        after = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del queue_items
+        return (after - before) / tracks
+
+    raw = retained(lambda: [make_info(i) for i in range(tracks)])
+    compact = retained(lambda: [QueueTrack.from_info(make_info(i)) for i in range(tracks)])
+    return {'tracks': tracks, 'raw_bytes': raw, 'compact_bytes': compact}
+
+
+def run_benchmarks(argv):
+    """
+    Command-line benchmark entry point:
+        python newv2.py --bench gaps [--backend=null] [--speed=N] [--crossfade=SECONDS] [FILE ...]
+        python newv2.py --bench stream [--backend=null] [--speed=N] URL
+        python newv2.py --bench search [--tracks=N]
+        python newv2.py --bench queue-memory [--tracks=N]
+
+    With the null backend and no files, the gap benchmark synthesizes silent tracks.
+    """
+    name = argv[0] if argv else ''
+    options = dict(a[2:].split('=', 1) for a in argv[1:] if a.startswith('--') and '=' in a)
+    args = [a for a in argv[1:] if not a.startswith('--')]
+    backend = options.get('backend', 'auto')
+    speed = float(options.get('speed', 1))
+
+    def print_gaps(label, result):
+        print(f"{label:>10}: {result['count']} transitions | mean {result['mean_ms']:.1f} ms | "
+              f"p95 {result['p95_ms']:.1f} ms | max {result['max_ms']:.1f} ms")
+
+    if name == 'gaps':
+        if not args and backend == 'null':
+            import tempfile
+            args = make_silent_wavs(10, 30, tempfile.mkdtemp(prefix="bench_gaps_"))
+        if len(args) < 2:
+            print("Need at least two audio files to measure gaps")
+            return 2
+        crossfade = float(options.get('crossfade', 0))
+        for label, gapless in (("sequential", False), ("gapless", True)):
+            result = bench_track_gaps(args, gapless=gapless, crossfade_seconds=crossfade if gapless else 0,
+                                      backend=backend, speed=speed)
+            print_gaps(label, result)
+        return 0
+
+    if name == 'stream':
+        if not args:
+            print("Need a playlist URL")
+            return 2
+        result = bench_stream(args[0], backend=options.get('backend', 'null'), speed=float(options.get('speed', 50)))
+        print_gaps("stream", result)
+        print(f"{'wall':>10}: {result['wall_s']:.1f} s")
+        return 0
+
+    if name == 'search':
+        result = bench_search(int(options.get('tracks', 50000)))
+        print(f"{'build':>10}: {result['tracks']} tracks in {result['build_s']:.2f} s")
+        print(f"{'keystroke':>10}: {result['keystrokes']} queries | p50 {result['p50_ms']:.2f} ms | "
+              f"p95 {result['p95_ms']:.2f} ms | max {result['max_ms']:.2f} ms")
+        print(f"{'update':>10}: {result['update_ms']:.3f} ms per re-indexed track")
+        return 0
+
+    if name == 'queue-memory':
+        result = bench_queue_memory(int(options.get('tracks', 1000)))
+        print(f"{'info dict':>10}: {result['raw_bytes'] / 1024:.1f} KB per track "
+              f"({result['raw_bytes'] * result['tracks'] / (1024 * 1024):.1f} MB for {result['tracks']})")
+        print(f"{'QueueTrack':>10}: {result['compact_bytes'] / 1024:.2f} KB per track "
+              f"({result['compact_bytes'] * result['tracks'] / (1024 * 1024):.2f} MB for {result['tracks']})")
+        return 0
+
+    print(run_benchmarks.__doc__)
+    return 2
+
+
 # ------------------- App Entry -------------------
 class AudioApp(MDApp):
     def build(self):
@@ -2872,8 +7794,28 @@ class AudioApp(MDApp):
         self.theme_cls.accent_palette = "Green"
         return DownloaderUI()
 
+    def on_pause(self):
+        # Backgrounded or screen off: audio keeps going, UI timers don't
+        get_power_scheduler().suspend()
+        return True
+
+    def on_resume(self):
+        get_power_scheduler().resume()
+
+    def on_stop(self):
+        # Don't let queued library analysis hold the process open
+        try:
+            self.root.library_analyzer.shutdown()
+            self.root.library_watcher.stop()
+            self.root.log_buffer.sink.close()
+        except Exception:
+            pass
+
 
 if __name__ == "__main__":
+    if '--bench' in sys.argv:
+        sys.exit(run_benchmarks(sys.argv[sys.argv.index('--bench') + 1:]))
+
     try:
         AudioApp().run()
     except Exception as e: